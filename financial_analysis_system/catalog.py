@@ -0,0 +1,217 @@
+'''
+@Desc:   商品与物流目录 (带索引)
+         load_products / load_logistics 每次运行都重新解析 CSV、校验列，且 SKU / ID 没有索引。
+         Catalog：
+         1. 校验列与主键唯一性 (只在构建或写入时做一次)
+         2. 商品表以 SKU、物流表以 ID 为哈希索引，单个查询 O(1)，批量查询向量化 (get_indexer)
+         3. 二进制快照 (pickle，原子写入)，CSV 未修改时直接加载快照，启动只需毫秒级
+         4. 增量 upsert：按主键更新已有行、追加新行 (新行需包含全部必需列且不为空)
+         CostEngine.from_catalog 直接使用目录中以 SKU / ID 为索引的表，不再重新去重、建索引
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from source.utils.paths import PathManager
+
+# CostEngine 计算所需的列 (商品表另需 重量(kg) 计算按kg运费)
+PRODUCT_COLUMNS = ['SKU', '商品名', '供应商名', '单价(CNY)', '重量(kg)']
+LOGISTICS_COLUMNS = ['ID', '物流公司', '运输方式', '单件运费(CNY)', '按kg运费(CNY)']
+# 快照格式版本，结构变化时递增使旧快照失效
+SNAPSHOT_VERSION = 2
+
+
+class Catalog:
+    def __init__(self, products_df: pd.DataFrame, logistics_df: pd.DataFrame):
+        """
+        :param products_df: 商品信息表，需包含 SKU, 商品名, 供应商名, 单价(CNY), 重量(kg)，SKU 唯一
+        :param logistics_df: 物流信息表，需包含 ID, 物流公司, 运输方式, 单件运费(CNY), 按kg运费(CNY)，ID 唯一
+        """
+        self.products = self._validate(products_df, PRODUCT_COLUMNS, 'SKU', '商品表')
+        self.logistics = self._validate(logistics_df, LOGISTICS_COLUMNS, 'ID', '物流表')
+        self.source_mtimes: Dict[str, int] = {}
+        # 单键查询使用的列数组缓存，upsert 后失效
+        self._columns: Dict[str, Dict[str, np.ndarray]] = {}
+
+    @staticmethod
+    def _validate(df: pd.DataFrame, required_cols: List[str], key: str, name: str) -> pd.DataFrame:
+        """校验必需列与主键唯一性，返回以主键为索引的表"""
+        for col in required_cols:
+            if col not in df.columns:
+                raise ValueError(f'{name}缺少列: {col}')
+        df = df.copy()
+        df[key] = df[key].astype(str)
+        duplicated = df[key][df[key].duplicated()].unique()
+        if len(duplicated):
+            raise ValueError(f'{name}中 {key} 重复: {list(duplicated[:10])}')
+        return df.set_index(key)
+
+    # -----------------------------
+    # 构建与快照
+    # -----------------------------
+    @staticmethod
+    def _mtimes(files: List[str]) -> Dict[str, int]:
+        return {os.path.abspath(f): os.stat(f).st_mtime_ns for f in files}
+
+    @classmethod
+    def from_csv(
+            cls,
+            file_products: str,
+            file_logistics: str,
+            file_snapshot: Optional[str] = None
+    ) -> 'Catalog':
+        """
+        从 CSV 构建目录：CSV 未修改时直接加载快照，否则重新解析并写入快照
+        :param file_products: 商品表 CSV
+        :param file_logistics: 物流表 CSV
+        :param file_snapshot: 快照路径，默认为 data/cache/catalog.pkl
+        """
+        if file_snapshot is None:
+            file_snapshot = os.path.join(PathManager().data_dir, 'cache', 'catalog.pkl')
+        mtimes = cls._mtimes([file_products, file_logistics])
+        if os.path.exists(file_snapshot):
+            catalog = cls.load(file_snapshot)
+            if catalog is not None and catalog.source_mtimes == mtimes:
+                return catalog
+        catalog = cls(pd.read_csv(file_products), pd.read_csv(file_logistics))
+        catalog.source_mtimes = mtimes
+        catalog.save(file_snapshot)
+        return catalog
+
+    def save(self, file_snapshot: str):
+        """保存二进制快照 (先写临时文件再原子替换)"""
+        os.makedirs(os.path.dirname(os.path.abspath(file_snapshot)), exist_ok=True)
+        file_tmp = file_snapshot + '.tmp'
+        with open(file_tmp, 'wb') as f:
+            pickle.dump({
+                'version': SNAPSHOT_VERSION,
+                'products': self.products,
+                'logistics': self.logistics,
+                'source_mtimes': self.source_mtimes,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(file_tmp, file_snapshot)
+        print(f'[INFO] 目录快照已保存至：{file_snapshot}')
+
+    @classmethod
+    def load(cls, file_snapshot: str) -> Optional['Catalog']:
+        """加载二进制快照，版本不符或文件损坏时返回 None"""
+        try:
+            with open(file_snapshot, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            print(f'[WARN] 目录快照读取失败 {file_snapshot}: {e}')
+            return None
+        if data.get('version') != SNAPSHOT_VERSION:
+            return None
+        # 快照中的数据写入时已校验，跳过 __init__ 的重复校验
+        catalog = cls.__new__(cls)
+        catalog.products = data['products']
+        catalog.logistics = data['logistics']
+        catalog.source_mtimes = data['source_mtimes']
+        catalog._columns = {}
+        return catalog
+
+    # -----------------------------
+    # 增量更新
+    # -----------------------------
+    @staticmethod
+    def _upsert(current: pd.DataFrame, new: pd.DataFrame, required_cols: List[str], name: str) -> pd.DataFrame:
+        """
+        按主键 upsert：新表中的值覆盖原值，新表缺失的列/空值保留原值
+        已有主键可只给出部分列；新主键必须包含全部必需列且不为空
+        更新与新增的行统一放到末尾 (查询走索引，行顺序无意义)
+        """
+        is_new = ~new.index.isin(current.index)
+        if is_new.any():
+            fields = [col for col in required_cols if col != new.index.name]
+            missing = [col for col in fields if col not in new.columns]
+            if missing:
+                raise ValueError(f'{name}新增 {new.index.name} {list(new.index[is_new][:10])} 缺少列: {missing}')
+            incomplete = new.index[is_new & new[fields].isna().any(axis=1).to_numpy()]
+            if len(incomplete):
+                raise ValueError(f'{name}新增的 {new.index.name} 必需列为空: {list(incomplete[:10])}')
+        updated = new.combine_first(current.reindex(new.index))[current.columns.union(new.columns, sort=False)]
+        return pd.concat([current[~current.index.isin(new.index)], updated])
+
+    def upsert_products(self, df: pd.DataFrame):
+        """按 SKU 更新或新增商品 (需调用 save 持久化)"""
+        new = self._validate(df, ['SKU'], 'SKU', '商品表')
+        self.products = self._upsert(self.products, new, PRODUCT_COLUMNS, '商品表')
+        self.source_mtimes = {}
+        self._columns = {}
+
+    def upsert_logistics(self, df: pd.DataFrame):
+        """按 ID 更新或新增物流方案 (需调用 save 持久化)"""
+        new = self._validate(df, ['ID'], 'ID', '物流表')
+        self.logistics = self._upsert(self.logistics, new, LOGISTICS_COLUMNS, '物流表')
+        self.source_mtimes = {}
+        self._columns = {}
+
+    # -----------------------------
+    # 查询
+    # -----------------------------
+    def _lookup(self, name: str, key: str) -> Optional[Dict]:
+        """
+        单键查询：哈希索引定位行号，再从缓存的列数组取值
+        (避免每次构造 pandas Series，单次查询为微秒级)
+        """
+        df = getattr(self, name)
+        if name not in self._columns:
+            self._columns[name] = {col: df[col].to_numpy() for col in df.columns}
+        try:
+            pos = df.index.get_loc(str(key))
+        except KeyError:
+            return None
+        record = {df.index.name: str(key)}
+        record.update({col: values[pos] for col, values in self._columns[name].items()})
+        return record
+
+    def product(self, sku: str) -> Optional[Dict]:
+        """按 SKU 查询单个商品，不存在返回 None"""
+        return self._lookup('products', sku)
+
+    def logistics_option(self, shipping_id: str) -> Optional[Dict]:
+        """按 ID 查询单个物流方案，不存在返回 None"""
+        return self._lookup('logistics', shipping_id)
+
+    @staticmethod
+    def _take(df: pd.DataFrame, keys, name: str) -> pd.DataFrame:
+        keys = pd.Index(np.asarray(keys).astype(str))
+        positions = df.index.get_indexer(keys)
+        if (positions < 0).any():
+            raise ValueError(f'{name}中不存在的键: {list(keys[positions < 0].unique()[:10])}')
+        return df.iloc[positions]
+
+    def products_for(self, skus) -> pd.DataFrame:
+        """批量按 SKU 取商品行 (顺序与输入一致，可重复)"""
+        return self._take(self.products, skus, '商品表')
+
+    def logistics_for(self, shipping_ids) -> pd.DataFrame:
+        """批量按 ID 取物流行 (顺序与输入一致，可重复)"""
+        return self._take(self.logistics, shipping_ids, '物流表')
+
+    def products_df(self) -> pd.DataFrame:
+        """与 load_products 结构一致的商品表"""
+        return self.products.reset_index()
+
+    def logistics_df(self) -> pd.DataFrame:
+        """与 load_logistics 结构一致的物流表"""
+        return self.logistics.reset_index()
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    from source.financial_analysis_system.cost_engine import CostEngine
+
+    pm = PathManager()
+    catalog = Catalog.from_csv(
+        os.path.join(pm.data_dir, 'products.csv'),
+        os.path.join(pm.data_dir, 'logistics.csv')
+    )
+    print(catalog.product('VC-S-BLK'))
+    engine = CostEngine.from_catalog(catalog)
+    print(engine.cost([{'SKU': 'VC-S-BLK', '数量': 100, '物流SKU': 'LS001'}], 'USD'))
@@ -19,7 +19,9 @@
 
 import os
 import pandas as pd
-from exchange_rate import ExchangeRateManager
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+from source.financial_analysis_system.cost_engine import CostEngine, split_by_currency
+from source.financial_analysis_system.catalog import Catalog
 
 # -----------------------------
 # 文件路径设置
@@ -48,77 +50,54 @@ def load_logistics(file_path):
             raise ValueError(f"物流表缺少列: {col}")
     return df
 
+# -----------------------------
+# 读取目录 (商品表 + 物流表)
+# -----------------------------
+def load_catalog(file_products, file_logistics, file_snapshot=None):
+    """
+    读取商品表与物流表并建立索引，CSV 未修改时直接加载二进制快照
+    :param file_snapshot: 快照路径，默认为 data/cache/catalog.pkl
+    """
+    return Catalog.from_csv(file_products, file_logistics, file_snapshot)
+
 # -----------------------------
 # 计算成本
 # -----------------------------
-def calculate_cost(products_df, logistics_df, order_list, currency='CNY'):
+def calculate_cost(products_df, logistics_df, order_list, currency='CNY', wide=False, catalog=None):
     """
     按 SKU 合并商品表与物流表，计算总成本，并可转换币种
-    :param products_df: 商品信息DataFrame
-    :param logistics_df: 物流信息DataFrame
+    :param products_df: 商品信息DataFrame (传入 catalog 时忽略)
+    :param logistics_df: 物流信息DataFrame (传入 catalog 时忽略)
     :param order_list: 订单列表，每条订单包含: SKU, 数量, 物流SKU
-    :param currency: 输出币种，如 'USD', 'EUR', 默认 'CNY'
+    :param currency: 输出币种，如 'USD', 'EUR', 默认 'CNY'；也可为币种列表，如 ['CNY', 'USD', 'EUR']
+    :param wide: 多币种时 True 输出一张宽表，False 每个币种一个 cost_summary_{currency}.csv
+    :param catalog: load_catalog 的结果，给出时直接使用目录中已建好索引的表
     :return: DataFrame，包含总成本
     """
-    exchange_manager = ExchangeRateManager()
-    results = []
-
-    for order in order_list:
-        sku = order['SKU']
-        quantity = order['数量']
-        shipping_sku = order['物流SKU']
-
-        # 商品信息
-        product = products_df[products_df['SKU'] == sku].iloc[0]
-        unit_price_cny = product['单价(CNY)']
-        weight = product['重量(kg)']
-
-        # 物流信息
-        logistics = logistics_df[logistics_df['ID'] == shipping_sku].iloc[0]
-        cost_per_piece_cny = logistics['单件运费(CNY)']
-        cost_per_kg_cny = logistics['按kg运费(CNY)']
-
-        # 运输成本
-        shipping_cost_cny = max(cost_per_piece_cny * quantity, cost_per_kg_cny * weight)
-
-        # 总成本
-        total_cost_cny = unit_price_cny * quantity + shipping_cost_cny
-
-        # 币种转换 & 保留两位小数
-        unit_price = round(exchange_manager.convert_from_cny(unit_price_cny, currency), 2)
-        shipping_cost = round(exchange_manager.convert_from_cny(shipping_cost_cny, currency), 2)
-        total_cost = round(exchange_manager.convert_from_cny(total_cost_cny, currency), 2)
-        cost_per_piece = round(exchange_manager.convert_from_cny(cost_per_piece_cny, currency), 2)
-        cost_per_kg = round(exchange_manager.convert_from_cny(cost_per_kg_cny, currency), 2)
-
-        results.append({
-            'SKU': sku,
-            '商品名': product['商品名'],
-            '供应商名': product['供应商名'],
-            '数量': quantity,
-            '重量(kg)': weight,
-            '物流SKU': shipping_sku,
-            '物流公司': logistics['物流公司'],
-            '运输方式': logistics['运输方式'],
-            '单价({})'.format(currency): unit_price,
-            '单件运费({})'.format(currency): cost_per_piece,
-            '按kg运费({})'.format(currency): cost_per_kg,
-            '运输成本({})'.format(currency): shipping_cost,
-            '总成本({})'.format(currency): total_cost
-        })
+    # 向量化计算：订单整列按索引关联商品表、物流表，所有币种由同一次计算结果换算
+    if catalog is not None:
+        engine = CostEngine.from_catalog(catalog, ExchangeRateManager())
+    else:
+        engine = CostEngine(products_df, logistics_df, ExchangeRateManager())
+    df = engine.cost(order_list, currency)
 
     path_data = '../../data'
-    file_cost = os.path.join(path_data, f'cost_summary_{currency}.csv')
-    df = pd.DataFrame(results)
-    df.to_csv(file_cost, index=False)
-    print(f'[INFO] 文件以保持至：{file_cost}')
+    currencies = [currency] if isinstance(currency, str) else list(currency)
+    if wide or len(currencies) == 1:
+        reports = {'_'.join(currencies): df}
+    else:
+        reports = split_by_currency(df, currencies)
+    for name, df_report in reports.items():
+        file_cost = os.path.join(path_data, f'cost_summary_{name}.csv')
+        df_report.to_csv(file_cost, index=False)
+        print(f'[INFO] 文件以保持至：{file_cost}')
+    return df
 
 # -----------------------------
 # 主函数示例
 # -----------------------------
 def main():
-    products_df = load_products(PRODUCT_FILE)
-    logistics_df = load_logistics(LOGISTICS_FILE)
+    catalog = load_catalog(PRODUCT_FILE, LOGISTICS_FILE)
 
     # 示例订单列表
     order_list = [
@@ -126,7 +105,7 @@ def main():
         {'SKU': 'VCL-STD', '数量': 200, '物流SKU': 'LS002'},
     ]
 
-    calculate_cost(products_df, logistics_df, order_list, 'CNY')
+    calculate_cost(None, None, order_list, ['CNY', 'USD', 'EUR'], catalog=catalog)
 
 # -----------------------------
 if __name__ == '__main__':
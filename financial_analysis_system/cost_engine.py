@@ -0,0 +1,305 @@
+'''
+@Desc:   订单成本计算引擎 (向量化)
+         calculate_cost 逐条订单在商品表、物流表中做整列布尔筛选，并逐个金额换算币种，
+         复杂度为 O(订单数 x 表行数)。本引擎：
+         1. 商品表按 SKU、物流表按 ID 去重并建立哈希索引，订单整列 get_indexer 定位行号后按位置取值
+            (由 Catalog 构建时直接复用目录中已校验、已建索引的表)
+         2. 运输成本、总成本整列计算，按重量计费使用整票重量 (单件重量 x 数量)
+         3. 币种换算使用 ExchangeRateManager.convert 整列完成
+         4. 大订单文件 (CSV / JSONL) 分块流式计算，结果逐块追加写出，
+            同时累计按 SKU、供应商、物流公司的汇总，内存只与块大小和键数有关
+         5. 多币种一次计算：同一次关联结果换算出多个币种的金额列，
+            输出为一张宽表或按币种拆分的多个文件
+         6. 到岸成本：按 HS编码 与目的国匹配关税、增值税 (见 landed_cost.py)
+         输出列与 calculate_cost 保持一致
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Union
+from source.utils.paths import PathManager
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+# 订单表字段
+ORDER_COLUMNS = ['SKU', '数量', '物流SKU']
+# 流式汇总维度：名称 -> 分组列
+TOTAL_GROUPS = {
+    'sku': ['SKU', '商品名', '供应商名'],
+    'supplier': ['供应商名'],
+    'carrier': ['物流公司', '运输方式'],
+}
+# 汇总的数值列 (CNY)
+TOTAL_COLUMNS = ['数量', '运输成本(CNY)', '总成本(CNY)']
+# 关联到订单上的商品列、物流列 (HS编码 为可选的商品列)
+PRODUCT_FIELDS = ['商品名', '供应商名', '单价(CNY)', '重量(kg)']
+LOGISTICS_FIELDS = ['物流公司', '运输方式', '单件运费(CNY)', '按kg运费(CNY)']
+# 输出的非金额列与需要换算币种的金额列
+BASE_COLUMNS = ['SKU', '商品名', '供应商名', '数量', '重量(kg)', '物流SKU', '物流公司', '运输方式']
+AMOUNT_NAMES = ['单价', '单件运费', '按kg运费', '运输成本', '总成本']
+
+Currencies = Union[str, List[str]]
+
+
+def _currency_list(currency: Currencies) -> List[str]:
+    return [currency] if isinstance(currency, str) else list(currency)
+
+
+def split_by_currency(df: pd.DataFrame, currency: Currencies) -> Dict[str, pd.DataFrame]:
+    """
+    将多币种宽表拆分为每个币种一张表 (非金额列 + 该币种的金额列)
+    :param df: 含有 f'{金额}({币种})' 列的宽表
+    """
+    result = {}
+    for c in _currency_list(currency):
+        base = [col for col in BASE_COLUMNS if col in df.columns]
+        result[c] = df[base + [f'{name}({c})' for name in AMOUNT_NAMES if f'{name}({c})' in df.columns]]
+    return result
+
+
+class CostEngine:
+    def __init__(
+            self,
+            products_df: pd.DataFrame,
+            logistics_df: pd.DataFrame,
+            exchange_manager: Optional[ExchangeRateManager] = None
+    ):
+        """
+        :param products_df: 商品信息表 (load_products)，需包含 SKU, 商品名, 供应商名, 单价(CNY), 重量(kg)
+        :param logistics_df: 物流信息表 (load_logistics)，需包含 ID, 物流公司, 运输方式, 单件运费(CNY), 按kg运费(CNY)
+        :param exchange_manager: 汇率管理器，默认使用共享汇率缓存
+        """
+        self.exchange_manager = exchange_manager or ExchangeRateManager()
+        # 与 calculate_cost 的 .iloc[0] 一致：重复键取第一行
+        self._set_tables(self._index_by(products_df, 'SKU'), self._index_by(logistics_df, 'ID'))
+
+    @staticmethod
+    def _index_by(df: pd.DataFrame, key: str) -> pd.DataFrame:
+        """按主键去重 (保留第一行) 并以字符串主键为索引"""
+        df = df.drop_duplicates(key, keep='first')
+        return df.assign(**{key: df[key].astype(str)}).set_index(key)
+
+    def _set_tables(self, products: pd.DataFrame, logistics: pd.DataFrame):
+        """
+        保存以主键为索引的商品表与物流表 (只保留计算需要的列)
+        :param products: 以 SKU 为索引、无重复键的商品表
+        :param logistics: 以 ID 为索引、无重复键的物流表
+        """
+        product_cols = PRODUCT_FIELDS + [c for c in ['HS编码'] if c in products.columns]
+        for name, df, cols in [('商品表', products, product_cols), ('物流表', logistics, LOGISTICS_FIELDS)]:
+            for col in cols:
+                if col not in df.columns:
+                    raise ValueError(f'{name}缺少列: {col}')
+        self.products = products[product_cols]
+        self.logistics = logistics[LOGISTICS_FIELDS]
+
+    @classmethod
+    def from_catalog(cls, catalog, exchange_manager: Optional[ExchangeRateManager] = None) -> 'CostEngine':
+        """
+        由已校验的目录构建：直接复用目录中以 SKU / ID 为索引的表，不再复制、去重或重建索引
+        :param catalog: source.financial_analysis_system.catalog.Catalog
+        """
+        engine = cls.__new__(cls)
+        engine.exchange_manager = exchange_manager or ExchangeRateManager()
+        engine._set_tables(catalog.products, catalog.logistics)
+        return engine
+
+    @staticmethod
+    def _to_frame(orders: Union[List[Dict], pd.DataFrame]) -> pd.DataFrame:
+        df = pd.DataFrame(orders)
+        if df.empty and len(df.columns) == 0:
+            # 空订单列表：输出只有表头的报表，而不是报缺列
+            df = pd.DataFrame(columns=ORDER_COLUMNS)
+        for col in ORDER_COLUMNS:
+            if col not in df.columns:
+                raise ValueError(f'订单缺少列: {col}')
+        # 目的国 (可选，用于到岸成本)
+        return df[ORDER_COLUMNS + [c for c in ['国家'] if c in df.columns]]
+
+    def compute(self, orders: Union[List[Dict], pd.DataFrame]) -> pd.DataFrame:
+        """
+        关联商品表与物流表并计算人民币成本
+        :param orders: 订单列表或 DataFrame，每条订单包含: SKU, 数量, 物流SKU
+        :return: 每条订单一行，金额列均为 CNY
+        """
+        df = self._to_frame(orders).reset_index(drop=True)
+        # 哈希索引定位行号，按位置取出商品列与物流列
+        sku = df['SKU'].astype(str)
+        pos_product = self.products.index.get_indexer(sku)
+        if (pos_product < 0).any():
+            raise ValueError(f'商品表中不存在的 SKU: {list(sku[pos_product < 0].unique()[:10])}')
+        shipping = df['物流SKU'].astype(str)
+        pos_logistics = self.logistics.index.get_indexer(shipping)
+        if (pos_logistics < 0).any():
+            raise ValueError(f'物流表中不存在的物流SKU: {list(shipping[pos_logistics < 0].unique()[:10])}')
+        df = pd.concat([
+            df,
+            self.products.iloc[pos_product].reset_index(drop=True),
+            self.logistics.iloc[pos_logistics].reset_index(drop=True),
+        ], axis=1)
+
+        quantity = df['数量'].to_numpy(dtype=float)
+        # 运输成本：按件与按整票重量 (单件重量 * 数量) 取较大者
+        df['运输成本(CNY)'] = np.maximum(
+            df['单件运费(CNY)'].to_numpy(dtype=float) * quantity,
+            df['按kg运费(CNY)'].to_numpy(dtype=float) * df['重量(kg)'].to_numpy(dtype=float) * quantity
+        )
+        df['总成本(CNY)'] = df['单价(CNY)'].to_numpy(dtype=float) * quantity + df['运输成本(CNY)']
+        return df
+
+    def cost(self, orders: Union[List[Dict], pd.DataFrame], currency: Currencies = 'CNY') -> pd.DataFrame:
+        """
+        计算订单成本并换算为目标币种 (保留两位小数)
+        :param orders: 订单列表或 DataFrame，每条订单包含: SKU, 数量, 物流SKU
+        :param currency: 输出币种，如 'USD', 'EUR', 默认 'CNY'；
+                         也可为币种列表，一次输出所有币种的金额列 (宽表，可用 split_by_currency 拆分)
+        :return: 与 calculate_cost 输出相同列的 DataFrame
+        """
+        return self._format(self.compute(orders), currency)
+
+    def _format(self, df: pd.DataFrame, currency: Currencies) -> pd.DataFrame:
+        """将 compute 的结果换算为目标币种并整理为 calculate_cost 的输出列 (多币种时依次追加)"""
+        result = df[BASE_COLUMNS].copy()
+        for c in _currency_list(currency):
+            for name in AMOUNT_NAMES:
+                result[f'{name}({c})'] = self.exchange_manager.convert(
+                    df[f'{name}(CNY)'].to_numpy(dtype=float), 'CNY', c
+                )
+        return result
+
+    def landed(
+            self,
+            orders: Union[List[Dict], pd.DataFrame],
+            tariffs,
+            countries: Optional[List[str]] = None,
+            currency: Currencies = 'CNY'
+    ) -> pd.DataFrame:
+        """
+        计算订单的到岸成本 (货值 + 运费 + 关税 + 增值税)
+        :param orders: 订单，包含 SKU, 数量, 物流SKU，可包含 国家
+        :param tariffs: source.financial_analysis_system.landed_cost.TariffTable
+        :param countries: 目的国列表，给出时每条订单与每个国家交叉，便于比较各市场
+        :param currency: 输出币种或币种列表
+        :return: 每个 (订单, 国家) 一行
+        """
+        from source.financial_analysis_system.landed_cost import landed_cost
+
+        if 'HS编码' not in self.products.columns:
+            raise ValueError('商品表缺少列: HS编码')
+        df = landed_cost(self.compute(orders), tariffs, countries)
+        for c in _currency_list(currency):
+            if c == 'CNY':
+                continue
+            for name in ['货值', '关税', '增值税', '到岸成本']:
+                df[f'{name}({c})'] = self.exchange_manager.convert(df[f'{name}(CNY)'].to_numpy(), 'CNY', c)
+        return df
+
+    @staticmethod
+    def read_orders(file_orders: str, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """
+        分块读取订单文件
+        :param file_orders: .csv 或 .jsonl 文件
+        :param chunksize: 每块行数
+        """
+        dtype = {'SKU': str, '物流SKU': str}
+        if file_orders.endswith(('.jsonl', '.json')):
+            reader = pd.read_json(file_orders, lines=True, chunksize=chunksize, dtype=dtype)
+        else:
+            # 只读订单字段，可选的 国家 列存在时一并保留 (到岸成本使用)
+            usecols = set(ORDER_COLUMNS + ['国家'])
+            reader = pd.read_csv(file_orders, chunksize=chunksize, usecols=lambda c: c in usecols, dtype=dtype)
+        with reader:
+            yield from reader
+
+    def cost_file(
+            self,
+            file_orders: str,
+            file_out: str,
+            currency: Currencies = 'CNY',
+            chunksize: int = 100_000,
+            split_currency: bool = False
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        流式计算大订单文件的成本
+        - 每块订单计算后立即追加写入输出文件 (先写临时文件，全部完成后原子替换，
+          中途出错 (如未知 SKU) 时删除临时文件，已有的输出文件保持不变)
+        - 同时累计按 SKU / 供应商 / 物流公司的汇总
+        :param file_orders: 订单文件 (.csv / .jsonl)，包含: SKU, 数量, 物流SKU
+        :param file_out: 明细输出 CSV；split_currency 时为含 {currency} 的文件名模板
+        :param currency: 输出币种或币种列表
+        :param chunksize: 每块行数
+        :param split_currency: False 输出一张多币种宽表，True 每个币种一个文件
+        :return: {'sku' | 'supplier' | 'carrier': 汇总 DataFrame}，金额列为目标币种
+        """
+        currencies = _currency_list(currency)
+        if split_currency:
+            if '{currency}' not in file_out:
+                raise ValueError('split_currency=True 时 file_out 需包含 {currency}')
+            files_out = {c: file_out.format(currency=c) for c in currencies}
+        else:
+            files_out = {None: file_out}
+        handles = {c: open(f + '.tmp', 'w', encoding='utf-8-sig', newline='') for c, f in files_out.items()}
+        totals = {name: None for name in TOTAL_GROUPS}
+        n_rows = 0
+        completed = False
+        try:
+            for i, chunk in enumerate(self.read_orders(file_orders, chunksize)):
+                df = self.compute(chunk)
+                # 所有币种共用一次关联与计算
+                df_out = self._format(df, currencies)
+                parts = split_by_currency(df_out, currencies) if split_currency else {None: df_out}
+                for c, part in parts.items():
+                    part.to_csv(handles[c], index=False, header=(i == 0))
+                for name, keys in TOTAL_GROUPS.items():
+                    part = df.groupby(keys, dropna=False)[TOTAL_COLUMNS].sum()
+                    totals[name] = part if totals[name] is None else totals[name].add(part, fill_value=0)
+                n_rows += len(df)
+                print(f'[INFO] 已计算 {n_rows} 条订单')
+            completed = True
+        finally:
+            for f in handles.values():
+                f.close()
+            if not completed:
+                for f in files_out.values():
+                    if os.path.exists(f + '.tmp'):
+                        os.remove(f + '.tmp')
+        for c, f in files_out.items():
+            os.replace(f + '.tmp', f)
+            print(f'[INFO] 成本明细已保存至：{f}')
+
+        result = {}
+        for name, df in totals.items():
+            if df is None:
+                df = pd.DataFrame(columns=TOTAL_GROUPS[name] + TOTAL_COLUMNS).set_index(TOTAL_GROUPS[name])
+            df = df.reset_index()
+            # 汇总在 CNY 下累加，最后统一换算，避免逐块舍入误差累积
+            amounts = {col: df.pop(f'{col}(CNY)').to_numpy(dtype=float) for col in ['运输成本', '总成本']}
+            for c in currencies:
+                for col, values in amounts.items():
+                    df[f'{col}({c})'] = self.exchange_manager.convert(values, 'CNY', c)
+            result[name] = df.sort_values(f'总成本({currencies[0]})', ascending=False, ignore_index=True)
+        return result
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    from source.financial_analysis_system.cost_analysis import load_products, load_logistics
+
+    pm = PathManager()
+    engine = CostEngine(
+        load_products(os.path.join(pm.data_dir, 'products.csv')),
+        load_logistics(os.path.join(pm.data_dir, 'logistics.csv'))
+    )
+    df_orders = pd.DataFrame([
+        {'SKU': 'VC-S-BLK', '数量': 100, '物流SKU': 'LS001'},
+        {'SKU': 'VCL-STD', '数量': 200, '物流SKU': 'LS002'},
+    ])
+    print(engine.cost(df_orders, 'USD'))
+    # 大订单文件流式计算
+    file_orders = os.path.join(pm.data_dir, 'orders.csv')
+    if os.path.exists(file_orders):
+        totals = engine.cost_file(file_orders, os.path.join(pm.data_dir, 'cost_detail_USD.csv'), 'USD')
+        for name, df_total in totals.items():
+            df_total.to_csv(os.path.join(pm.data_dir, f'cost_total_by_{name}_USD.csv'), index=False)
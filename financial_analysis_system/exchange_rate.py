@@ -3,28 +3,81 @@
          实时汇率网址：
          1.ExchangeRate-API，支持 160 多种货币，https://www.exchangerate-api.com/?utm_source
          2.CurrencyAPI.com，免费额度 + 实时更新，简单易用，https://currencyapi.com/?utm_source
+         共享汇率缓存：
+         默认所有进程读写同一位置 data/cache/exchange_rates.csv (不再依赖当前工作目录)，
+         写入为临时文件 + 原子替换，读取方无需加锁；元数据 (获取时间、最近一次失败原因)
+         保存在同目录 exchange_rates.meta.json。后台线程按间隔刷新，API 不可用时继续使用上一次成功的快照
+         构造 ExchangeRateManager 不访问文件系统：默认缓存路径的确定、目录创建与初始快照复制
+         推迟到第一次读取或刷新时进行
 @Author: Dysin
 @Time:   2025/9/16
 @Email:  dysinqiu@163.com
 '''
 import os
+import json
+import time
+import shutil
+import threading
 import requests
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Dict, Optional, Union
+from source.utils.paths import PathManager
 
 # 从环境变量读取 API Key（推荐做法）
 exchange_api_key = os.getenv("EXCHANGE_RATE_API_KEY", "49fd6c05ddce9d3a359410f1")
+# 随代码提供的汇率文件，共享缓存不存在时作为初始快照
+BUNDLED_RATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exchange_rates.csv")
+
+
+def default_rates_file() -> str:
+    """共享汇率缓存的固定位置"""
+    return os.path.join(PathManager().data_dir, "cache", "exchange_rates.csv")
+
 
 class ExchangeRateManager:
-    def __init__(self, api_key: str = exchange_api_key, csv_path: str = "exchange_rates.csv"):
+    def __init__(self, api_key: str = exchange_api_key, csv_path: Optional[str] = None):
         """
         汇率管理器，基于 ExchangeRate-API
         :param api_key: 在 https://www.exchangerate-api.com/ 注册获取的 API key
-        :param csv_path: 本地存储汇率的 CSV 文件路径
+        :param csv_path: 本地存储汇率的 CSV 文件路径，默认为共享缓存 data/cache/exchange_rates.csv
         """
         self.api_key = api_key
-        self.csv_path = csv_path
+        # 默认共享缓存在第一次使用 csv_path 时才确定并用随代码的汇率文件初始化
+        self._csv_path = csv_path
+        self._seeded = csv_path is not None
         self.base_currency = "CNY"  # 固定人民币作为基准
+        # 内存中的汇率表 {币种: 汇率}，仅在 CSV 文件修改时间变化时重新读取
+        self._rates: Optional[Dict[str, float]] = None
+        self._rates_mtime: Optional[int] = None
+        # 后台刷新线程
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_stop = threading.Event()
+
+    @property
+    def csv_path(self) -> str:
+        """汇率 CSV 路径，默认共享缓存首次访问时才创建目录并复制初始快照"""
+        if self._csv_path is None:
+            self._csv_path = default_rates_file()
+        if not self._seeded:
+            self._seeded = True
+            self._seed_from_bundled(self._csv_path)
+        return self._csv_path
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.splitext(self.csv_path)[0] + ".meta.json"
+
+    @staticmethod
+    def _seed_from_bundled(csv_path: str):
+        """共享缓存不存在时，用随代码提供的汇率文件作为初始快照 (离线也可使用)"""
+        if os.path.exists(csv_path) or not os.path.exists(BUNDLED_RATES_FILE):
+            return
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+        file_tmp = f"{csv_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        # copy2 保留修改时间，新鲜度按原文件计算
+        shutil.copy2(BUNDLED_RATES_FILE, file_tmp)
+        os.replace(file_tmp, csv_path)
 
     def fetch_rates(self) -> Optional[pd.DataFrame]:
         """
@@ -49,11 +102,118 @@ class ExchangeRateManager:
             print(f"[Error] 获取汇率失败: {e}")
             return None
 
+    def _write_atomic(self, path: str, write):
+        """写入临时文件后原子替换，并发读取的进程只会看到完整的旧文件或新文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        file_tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(file_tmp)
+        os.replace(file_tmp, path)
+
     def save_rates(self, df: pd.DataFrame):
         """保存汇率到CSV"""
-        df.to_csv(self.csv_path, index=False, encoding="utf-8-sig")
+        self._write_atomic(self.csv_path, lambda f: df.to_csv(f, index=False, encoding="utf-8-sig"))
+        self._rates = None
         print(f"[Info] 汇率已保存到 {self.csv_path}")
 
+    # -----------------------------
+    # 共享缓存：新鲜度与定时刷新
+    # -----------------------------
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_meta(self, meta: Dict):
+        def write(file_tmp):
+            with open(file_tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+        self._write_atomic(self.meta_path, write)
+
+    def freshness(self) -> Dict:
+        """
+        汇率缓存的新鲜度
+        :return: {fetched_at, age_seconds, source, last_attempt, last_error, currencies}
+                 fetched_at 为最近一次成功获取的时间戳；没有元数据时取文件修改时间
+        """
+        meta = self._read_meta()
+        fetched_at = meta.get("fetched_at")
+        if fetched_at is None and os.path.exists(self.csv_path):
+            fetched_at = os.stat(self.csv_path).st_mtime
+            meta.setdefault("source", "file")
+        rates = self.get_rates() if os.path.exists(self.csv_path) else None
+        return {
+            "fetched_at": fetched_at,
+            "age_seconds": time.time() - fetched_at if fetched_at is not None else None,
+            "source": meta.get("source"),
+            "last_attempt": meta.get("last_attempt"),
+            "last_error": meta.get("last_error"),
+            "currencies": len(rates) if rates else 0,
+        }
+
+    def refresh(self) -> bool:
+        """
+        拉取最新汇率写入共享缓存
+        失败时保留上一次成功的快照，只在元数据中记录失败原因
+        :return: 是否刷新成功
+        """
+        meta = self._read_meta()
+        meta["last_attempt"] = time.time()
+        df = self.fetch_rates()
+        if df is None:
+            meta["last_error"] = "fetch_rates failed"
+            self._write_meta(meta)
+            print(f"[WARN] 汇率刷新失败，继续使用上一次的快照 {self.csv_path}")
+            return False
+        self.save_rates(df)
+        meta.update({"fetched_at": meta["last_attempt"], "source": "api", "last_error": None})
+        self._write_meta(meta)
+        return True
+
+    def refresh_if_stale(self, max_age_seconds: float, retry_seconds: float = 300) -> bool:
+        """
+        缓存超过 max_age_seconds 才刷新
+        多个进程共用缓存时，其它进程刚刷新过 (或刚失败过 retry_seconds 内) 则跳过，避免重复请求
+        :return: 本次是否刷新成功
+        """
+        info = self.freshness()
+        if info["age_seconds"] is not None and info["age_seconds"] < max_age_seconds:
+            return False
+        if info["last_attempt"] is not None and time.time() - info["last_attempt"] < retry_seconds:
+            return False
+        return self.refresh()
+
+    def start_auto_refresh(self, interval_seconds: float = 3600, check_seconds: float = 60) -> threading.Thread:
+        """
+        启动后台刷新线程 (守护线程，随主进程退出)
+        :param interval_seconds: 汇率最长使用时间，超过后刷新
+        :param check_seconds: 检查间隔
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return self._refresh_thread
+        self._refresh_stop.clear()
+
+        def loop():
+            while True:
+                try:
+                    self.refresh_if_stale(interval_seconds)
+                except Exception as e:
+                    print(f"[WARN] 汇率后台刷新异常: {e}")
+                if self._refresh_stop.wait(check_seconds):
+                    break
+
+        self._refresh_thread = threading.Thread(target=loop, name="fx-refresh", daemon=True)
+        self._refresh_thread.start()
+        return self._refresh_thread
+
+    def stop_auto_refresh(self):
+        """停止后台刷新线程"""
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
+
     def load_rates(self) -> Optional[pd.DataFrame]:
         """从CSV读取汇率"""
         if not os.path.exists(self.csv_path):
@@ -61,6 +221,35 @@ class ExchangeRateManager:
             return None
         return pd.read_csv(self.csv_path)
 
+    def get_rates(self) -> Optional[Dict[str, float]]:
+        """
+        获取内存中的汇率表 {币种: 汇率}
+        首次调用或 CSV 文件被修改后才重新读取，其余调用直接返回缓存
+        """
+        try:
+            mtime = os.stat(self.csv_path).st_mtime_ns
+        except FileNotFoundError:
+            print("[Error] CSV文件不存在，请先调用 fetch_rates 保存数据")
+            return None
+        if self._rates is None or mtime != self._rates_mtime:
+            df = pd.read_csv(self.csv_path)
+            self._rates = dict(zip(df["Currency"].astype(str).str.upper(), df["Rate"].astype(float)))
+            self._rates_mtime = mtime
+        return self._rates
+
+    def get_rate(self, currency: str) -> Optional[float]:
+        """
+        获取单个币种对人民币的汇率 (1 CNY = rate 外币)
+        :param currency: 币种 (USD, EUR...)
+        """
+        rates = self.get_rates()
+        if rates is None:
+            return None
+        rate = rates.get(currency.upper())
+        if rate is None:
+            print(f"[Error] 不支持的币种: {currency}")
+        return rate
+
     def convert_to_cny(self, amount: float, currency: str) -> Optional[float]:
         """
         将外币转换成人民币
@@ -68,16 +257,9 @@ class ExchangeRateManager:
         :param currency: 外币币种 (USD, EUR...)
         :return: 人民币金额
         """
-        df = self.load_rates()
-        if df is None:
+        rate = self.get_rate(currency)
+        if rate is None:
             return None
-
-        rate_row = df[df["Currency"] == currency.upper()]
-        if rate_row.empty:
-            print(f"[Error] 不支持的币种: {currency}")
-            return None
-
-        rate = float(rate_row["Rate"].values[0])
         return amount / rate  # 因为基准是 CNY，所以外币->CNY = 金额 / 汇率
 
     def convert_from_cny(self, amount: float, currency: str) -> Optional[float]:
@@ -87,17 +269,70 @@ class ExchangeRateManager:
         :param currency: 外币币种 (USD, EUR...)
         :return: 外币金额
         """
-        df = self.load_rates()
-        if df is None:
+        rate = self.get_rate(currency)
+        if rate is None:
             return None
+        return amount * rate
 
-        rate_row = df[df["Currency"] == currency.upper()]
-        if rate_row.empty:
-            print(f"[Error] 不支持的币种: {currency}")
-            return None
+    def rate_array(self, currencies) -> np.ndarray:
+        """
+        向量化获取一组币种的汇率 (1 CNY = rate 外币)
+        :param currencies: 币种数组 / Series，不支持的币种为 NaN
+        :return: float 数组
+        """
+        rates = self.get_rates() or {}
+        # 先 factorize 再转大写：缺失值 (None / NaN) 得到 -1，不会被 astype(str) 变成 "NONE" / "NAN"
+        codes, uniques = pd.factorize(pd.Series(np.asarray(currencies, dtype=object)))
+        uniques = pd.Index(uniques).astype(str).str.upper()
+        unique_rates = np.array([rates.get(c, np.nan) for c in uniques], dtype=float)
+        for c in uniques[np.isnan(unique_rates)]:
+            print(f"[Error] 不支持的币种: {c}")
+        if not len(uniques):
+            return np.full(len(codes), np.nan)
+        return np.where(codes >= 0, unique_rates[codes], np.nan)
 
-        rate = float(rate_row["Rate"].values[0])
-        return amount * rate
+    def _broadcast_rates(self, currencies, shape) -> Union[float, np.ndarray]:
+        """单个币种直接查表 (标量参与广播)，币种数组则逐元素查表"""
+        if np.ndim(currencies) == 0:
+            rate = self.get_rate(str(currencies))
+            return np.nan if rate is None else rate
+        return self.rate_array(np.broadcast_to(np.asarray(currencies, dtype=object), shape).ravel()).reshape(shape)
+
+    @staticmethod
+    def round_half_up(values: np.ndarray, decimals: int = 2) -> np.ndarray:
+        """
+        四舍五入 (0.5 远离零进位)，np.round 为银行家舍入，不适合金额
+        先按 1e-9 量级修正浮点误差，避免 1.005 * 100 = 100.49999... 被舍掉
+        """
+        factor = 10.0 ** decimals
+        scaled = np.round(np.abs(values) * factor, 9 - decimals)
+        return np.sign(values) * np.floor(scaled + 0.5) / factor
+
+    def convert(
+            self,
+            amounts,
+            from_currency,
+            to_currency,
+            decimals: Optional[int] = 2
+    ) -> Union[np.ndarray, pd.Series]:
+        """
+        批量币种转换 (向量化)
+        :param amounts: 金额，标量 / 数组 / Series
+        :param from_currency: 源币种，单个币种或与 amounts 等长的数组
+        :param to_currency: 目标币种，单个币种或与 amounts 等长的数组
+        :param decimals: 保留小数位 (四舍五入)，None 表示不舍入
+        :return: 转换后的金额，输入为 Series 时返回同索引的 Series；不支持的币种为 NaN
+        """
+        values = np.asarray(amounts, dtype=float)
+        # 汇率基准为 CNY：外币A -> CNY -> 外币B = 金额 / rate_A * rate_B
+        rate_from = self._broadcast_rates(from_currency, values.shape)
+        rate_to = self._broadcast_rates(to_currency, values.shape)
+        result = values / rate_from * rate_to
+        if decimals is not None:
+            result = self.round_half_up(result, decimals)
+        if isinstance(amounts, pd.Series):
+            return pd.Series(result, index=amounts.index, name=amounts.name)
+        return result
 
 
 if __name__ == "__main__":
@@ -106,11 +341,12 @@ if __name__ == "__main__":
 
     manager = ExchangeRateManager()
 
-    # 第一次运行时拉取最新汇率并保存
+    # 拉取最新汇率并保存 (失败时保留上一次的快照)
     if bool_get_rates:
-        df_rates = manager.fetch_rates()
-        if df_rates is not None:
-            manager.save_rates(df_rates)
+        manager.refresh()
+    # 常驻进程：后台每小时检查一次，汇率超过 12 小时则刷新
+    # manager.start_auto_refresh(interval_seconds=12 * 3600, check_seconds=3600)
+    print(manager.freshness())
 
     # 示例：读取并转换
     df_loaded = manager.load_rates()
@@ -119,3 +355,5 @@ if __name__ == "__main__":
 
         print("100 USD = ", manager.convert_to_cny(100, "USD"), "CNY")
         print("1000 CNY = ", manager.convert_from_cny(1000, "USD"), "USD")
+        # 批量转换：整列金额一次完成
+        print(manager.convert([100, 200, 300], ["USD", "EUR", "SGD"], "CNY"))
@@ -0,0 +1,275 @@
+'''
+@Desc:   历史汇率库 (按日期查询汇率)
+         ExchangeRateManager 只保存最新一次汇率，用今天的汇率换算历史海关数据 (数据年月)
+         或历史订单会产生偏差。本模块：
+         1. 以 (日期 x 币种) 的稠密矩阵保存每日/每月汇率快照 (npz，原子写入)
+         2. 按 as-of 规则查询：取不晚于给定日期的最近一次快照，快照中缺失的币种沿用更早的值
+         3. 整列向量化换算 (searchsorted 定位日期行，factorize 定位币种列)
+         汇率口径与 ExchangeRateManager 一致：1 CNY = Rate 外币
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional, Union
+from source.utils.paths import PathManager
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+
+class FXHistoryStore:
+    def __init__(self, file_store: str = None, freq: str = 'D'):
+        """
+        :param file_store: 存储文件路径，默认为 data/fx_history/fx_history.npz
+        :param freq: 快照粒度，'D' 按日，'M' 按月 (日期归到当月 1 日)
+        """
+        if freq not in ('D', 'M'):
+            raise ValueError("freq 只支持 'D' 或 'M'")
+        if file_store is None:
+            file_store = os.path.join(PathManager().data_dir, 'fx_history', 'fx_history.npz')
+        self.file_store = file_store
+        self.freq = freq
+        self.dates = np.empty(0, dtype='datetime64[D]')
+        self.currencies = np.empty(0, dtype=str)
+        self.rates = np.empty((0, 0), dtype=float)
+        self._filled = None
+        self.load()
+
+    # -----------------------------
+    # 存储
+    # -----------------------------
+    def load(self):
+        """读取已保存的汇率矩阵"""
+        if not os.path.exists(self.file_store):
+            return
+        with np.load(self.file_store) as data:
+            self.dates = data['dates'].astype('datetime64[D]')
+            self.currencies = data['currencies'].astype(str)
+            self.rates = data['rates'].astype(float)
+        self._filled = None
+
+    def save(self):
+        """先写临时文件再原子替换"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.file_store)), exist_ok=True)
+        file_tmp = self.file_store + '.tmp'
+        with open(file_tmp, 'wb') as f:
+            np.savez_compressed(f, dates=self.dates, currencies=self.currencies, rates=self.rates)
+        os.replace(file_tmp, self.file_store)
+        print(f'[INFO] 历史汇率已保存到 {self.file_store} ({len(self.dates)} 个日期, {len(self.currencies)} 个币种)')
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """返回 (日期 x 币种) 宽表"""
+        return pd.DataFrame(self.rates, index=pd.to_datetime(self.dates), columns=self.currencies)
+
+    # -----------------------------
+    # 日期
+    # -----------------------------
+    def normalize_dates(self, values, by_freq: bool = True) -> np.ndarray:
+        """
+        将日期统一为 datetime64[D]
+        - 支持 YYYYMM / YYYYMMDD 整数/字符串 (海关数据的 数据年月、20200203 这类日期)、
+          YYYY-MM-DD 字符串、datetime
+        - freq='M' 时归到当月 1 日
+        :param by_freq: False 时不按 freq 归并，返回原始日期
+        """
+        values = np.asarray(values, dtype=object)
+        # 不同日期通常很少，只解析唯一值
+        codes, uniques = pd.factorize(values.ravel())
+        s = pd.Series(np.asarray(uniques, dtype=object))
+        # 含缺失值的整数列读入后为 float (202001.0)，去掉末尾的 .0
+        text = s.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+        is_month = text.str.fullmatch(r'\d{6}').fillna(False).to_numpy(dtype=bool)
+        # 整数 20200203 若交给 to_datetime 会被当作纳秒时间戳，需按 YYYYMMDD 单独解析
+        is_day = text.str.fullmatch(r'\d{8}').fillna(False).to_numpy(dtype=bool)
+        is_other = ~(is_month | is_day)
+        parsed = pd.Series(pd.NaT, index=s.index, dtype='datetime64[ns]')
+        if is_month.any():
+            parsed[is_month] = pd.to_datetime(text[is_month], format='%Y%m', errors='coerce')
+        if is_day.any():
+            parsed[is_day] = pd.to_datetime(text[is_day], format='%Y%m%d', errors='coerce')
+        if is_other.any():
+            parsed[is_other] = pd.to_datetime(s[is_other], errors='coerce', format='mixed')
+        parsed = np.append(parsed.to_numpy(dtype='datetime64[D]'), np.datetime64('NaT', 'D'))
+        # factorize 对缺失值返回 -1，正好取到末尾的 NaT
+        dates = parsed[codes].reshape(values.shape)
+        if by_freq:
+            dates = self._truncate(dates)
+        return dates
+
+    def _truncate(self, dates: np.ndarray) -> np.ndarray:
+        """按 freq 归并日期 (freq='M' 归到当月 1 日)"""
+        if self.freq == 'M':
+            return dates.astype('datetime64[M]').astype('datetime64[D]')
+        return dates
+
+    # -----------------------------
+    # 写入快照
+    # -----------------------------
+    def add_rates(
+            self,
+            df: pd.DataFrame,
+            date_col: str = 'Date',
+            currency_col: str = 'Currency',
+            rate_col: str = 'Rate'
+    ):
+        """
+        批量写入历史汇率 (长表：日期, 币种, 汇率)，同一 (日期, 币种) 以新值为准
+        freq='M' 时同月多个日期归到同一行，取当月最晚日期的汇率 (与输入顺序无关)；
+        同一日期重复时以输入中靠后的为准
+        写入后需调用 save() 持久化
+        """
+        raw_dates = self.normalize_dates(df[date_col], by_freq=False)
+        valid = ~np.isnat(raw_dates)
+        df = pd.DataFrame({
+            'raw_date': raw_dates[valid],
+            'date': self._truncate(raw_dates[valid]),
+            'currency': df[currency_col].astype(str).str.upper().to_numpy()[valid],
+            'rate': pd.to_numeric(df[rate_col], errors='coerce').to_numpy()[valid],
+        })
+        # 缺失值不覆盖：先去掉，避免同一 (日期, 币种) 的有效汇率被排在后面的缺失值挤掉
+        df = df[df['rate'].notna()]
+        df = df.sort_values('raw_date', kind='stable').drop_duplicates(['date', 'currency'], keep='last')
+
+        all_dates = np.union1d(self.dates, df['date'].to_numpy(dtype='datetime64[D]'))
+        all_currencies = np.union1d(self.currencies, np.append(df['currency'].to_numpy().astype(str), 'CNY'))
+        rates = np.full((len(all_dates), len(all_currencies)), np.nan)
+        # 旧矩阵整体搬到新位置
+        if self.rates.size:
+            rows = np.searchsorted(all_dates, self.dates)
+            cols = np.searchsorted(all_currencies, self.currencies)
+            rates[np.ix_(rows, cols)] = self.rates
+        # 新值覆盖
+        rows = np.searchsorted(all_dates, df['date'].to_numpy(dtype='datetime64[D]'))
+        cols = np.searchsorted(all_currencies, df['currency'].to_numpy().astype(str))
+        rates[rows, cols] = df['rate'].to_numpy()
+        # 基准币种恒为 1
+        rates[:, np.searchsorted(all_currencies, 'CNY')] = 1.0
+
+        self.dates, self.currencies, self.rates = all_dates, all_currencies, rates
+        self._filled = None
+
+    def add_snapshot(self, df_rates: pd.DataFrame, date=None):
+        """
+        写入一次汇率快照
+        :param df_rates: ExchangeRateManager.fetch_rates / load_rates 的结果 (Currency, Rate)
+        :param date: 快照日期，默认今天
+        """
+        df = df_rates[['Currency', 'Rate']].copy()
+        df['Date'] = pd.Timestamp(date) if date is not None else pd.Timestamp.today().normalize()
+        self.add_rates(df)
+
+    def record_latest(self, manager: Optional[ExchangeRateManager] = None) -> bool:
+        """拉取最新汇率并作为今天的快照保存 (可每日定时运行)"""
+        manager = manager or ExchangeRateManager()
+        df_rates = manager.fetch_rates()
+        if df_rates is None:
+            return False
+        self.add_snapshot(df_rates)
+        self.save()
+        return True
+
+    # -----------------------------
+    # 查询与换算
+    # -----------------------------
+    def _forward_filled(self) -> np.ndarray:
+        """沿日期方向前向填充缺失汇率 (向量化，结果缓存)"""
+        if self._filled is None:
+            valid = ~np.isnan(self.rates)
+            idx = np.where(valid, np.arange(len(self.dates))[:, None], 0)
+            np.maximum.accumulate(idx, axis=0, out=idx)
+            filled = self.rates[idx, np.arange(len(self.currencies))[None, :]]
+            # 某币种首次出现之前仍为 NaN
+            filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+            self._filled = filled
+        return self._filled
+
+    def rates_asof(self, dates, currencies) -> np.ndarray:
+        """
+        向量化 as-of 查询：每个 (日期, 币种) 取不晚于该日期的最近汇率
+        :param dates: 日期数组 (或单个日期)
+        :param currencies: 币种数组 (或单个币种)，与 dates 广播
+        :return: 汇率数组，早于首个快照或未知币种为 NaN
+        """
+        dates = self.normalize_dates(dates)
+        currencies = np.asarray(currencies, dtype=object)
+        dates, currencies = np.broadcast_arrays(dates, currencies)
+        if not self.rates.size:
+            return np.full(dates.shape, np.nan)
+        rows = np.searchsorted(self.dates, dates, side='right') - 1
+        codes, uniques = pd.factorize(pd.Series(currencies.ravel()).astype(str).str.upper())
+        unique_cols = np.searchsorted(self.currencies, np.asarray(uniques, dtype=str))
+        unique_cols = np.minimum(unique_cols, len(self.currencies) - 1)
+        known = self.currencies[unique_cols] == np.asarray(uniques, dtype=str)
+        cols = np.where((codes >= 0) & known[codes], unique_cols[codes], -1).reshape(dates.shape)
+
+        ok = (rows >= 0) & (cols >= 0) & ~np.isnat(dates)
+        result = np.full(dates.shape, np.nan)
+        result[ok] = self._forward_filled()[rows[ok], cols[ok]]
+        return result
+
+    def convert(
+            self,
+            amounts,
+            from_currency,
+            to_currency,
+            dates,
+            decimals: Optional[int] = 2
+    ) -> Union[np.ndarray, pd.Series]:
+        """
+        按日期换算金额 (向量化)
+        :param amounts: 金额，数组 / Series
+        :param from_currency: 源币种，单个或与 amounts 等长
+        :param to_currency: 目标币种，单个或与 amounts 等长
+        :param dates: 日期，单个或与 amounts 等长 (支持 YYYYMM)
+        :param decimals: 保留小数位 (四舍五入)，None 表示不舍入
+        """
+        values = np.asarray(amounts, dtype=float)
+        dates = np.broadcast_to(np.asarray(dates, dtype=object), values.shape)
+        # 汇率基准为 CNY：外币A -> CNY -> 外币B = 金额 / rate_A * rate_B
+        rate_from = self.rates_asof(dates, np.broadcast_to(np.asarray(from_currency, dtype=object), values.shape))
+        rate_to = self.rates_asof(dates, np.broadcast_to(np.asarray(to_currency, dtype=object), values.shape))
+        result = values / rate_from * rate_to
+        if decimals is not None:
+            result = ExchangeRateManager.round_half_up(result, decimals)
+        if isinstance(amounts, pd.Series):
+            return pd.Series(result, index=amounts.index, name=amounts.name)
+        return result
+
+    def convert_frame(
+            self,
+            df: pd.DataFrame,
+            amount_col: str,
+            date_col: str,
+            from_currency: str,
+            to_currency: str,
+            out_col: str = None,
+            decimals: Optional[int] = 2
+    ) -> pd.DataFrame:
+        """
+        整表按日期换算，结果写入新列
+        :param from_currency: 源币种，或 df 中的币种列名
+        :param to_currency: 目标币种，或 df 中的币种列名
+        :param out_col: 输出列名，默认 f'{amount_col}({to_currency})'
+        """
+        source = df[from_currency].to_numpy() if from_currency in df.columns else from_currency
+        target = df[to_currency].to_numpy() if to_currency in df.columns else to_currency
+        out_col = out_col or f'{amount_col}({to_currency})'
+        df = df.copy()
+        df[out_col] = self.convert(df[amount_col].to_numpy(), source, target, df[date_col].to_numpy(), decimals)
+        return df
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    fx = FXHistoryStore(freq='M')
+    # 1. 每日定时运行：保存当天汇率快照
+    # fx.record_latest()
+    # 2. 导入已有的历史汇率 (长表：Date, Currency, Rate)
+    file_history = os.path.join(PathManager().data_dir, 'fx_history', 'history.csv')
+    if os.path.exists(file_history):
+        fx.add_rates(pd.read_csv(file_history))
+        fx.save()
+    # 3. 海关数据按月换算：人民币 -> 美元
+    df_customs = pd.DataFrame({'数据年月': [201501, 202001, 202509], '人民币': [1e6, 2e6, 3e6]})
+    print(fx.convert_frame(df_customs, '人民币', '数据年月', 'CNY', 'USD'))
@@ -0,0 +1,153 @@
+'''
+@Desc:   到岸成本 (关税 + 增值税)
+         成本模型原先只包含货值与运费。本模块按 (HS 编码前缀, 目的国) 维护关税与增值税税率：
+         1. 税率表按 国家|HS前缀 建立哈希索引，查询时从最长前缀到最短前缀逐级匹配
+            (最多 10 次向量化 get_indexer)，取最长匹配，例如 841451 优先于 8414、84
+         2. 计税基础：CIF = 货值 + 运费，FOB = 货值
+            关税 = 计税基础 * 关税率，增值税 = (计税基础 + 关税) * 增值税率
+         3. 订单行可与多个目的国交叉，一次算出各市场的到岸成本，便于横向比较
+
+         税率表 (tariffs.csv)：
+             国家, HS前缀, 关税率, 增值税率 (税率为小数，如 0.05)
+         可选列：计税基础 (CIF / FOB，默认 CIF)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+# 税率表必需列
+TARIFF_COLUMNS = ['国家', 'HS前缀', '关税率', '增值税率']
+
+
+def normalize_hs(codes) -> pd.Series:
+    """HS 编码统一为纯数字字符串 (去掉点、空格；Excel 读成数字时补回前导 0 需自行处理)"""
+    s = pd.Series(np.asarray(codes, dtype=object))
+    text = s.astype(str)
+    # 读成浮点数的编码 (841451.0) 先去掉末尾的 .0，否则去掉非数字后多出一位 0，匹配到错误的税率
+    is_float = s.map(lambda v: isinstance(v, (float, np.floating))).to_numpy(dtype=bool)
+    text[is_float] = text[is_float].str.replace(r'\.0$', '', regex=True)
+    return text.str.replace(r'\D', '', regex=True)
+
+
+class TariffTable:
+    def __init__(self, df: pd.DataFrame):
+        """
+        :param df: 税率表，需包含 国家, HS前缀, 关税率, 增值税率，可包含 计税基础
+        """
+        for col in TARIFF_COLUMNS:
+            if col not in df.columns:
+                raise ValueError(f'税率表缺少列: {col}')
+        df = df.copy()
+        df['国家'] = df['国家'].astype(str).str.upper()
+        df['HS前缀'] = normalize_hs(df['HS前缀']).to_numpy()
+        df['计税基础'] = df['计税基础'].astype(str).str.upper() if '计税基础' in df.columns else 'CIF'
+        df = df.drop_duplicates(['国家', 'HS前缀'], keep='last').reset_index(drop=True)
+        self.table = df
+        # 前缀索引：'国家|前缀' -> 行号
+        self._index = pd.Index(df['国家'] + '|' + df['HS前缀'])
+        lengths = df['HS前缀'].str.len()
+        self._lengths = sorted(lengths.unique(), reverse=True)
+        self._duty = df['关税率'].to_numpy(dtype=float)
+        self._vat = df['增值税率'].to_numpy(dtype=float)
+        self._cif = (df['计税基础'] == 'CIF').to_numpy()
+
+    @classmethod
+    def from_csv(cls, file_tariffs: str) -> 'TariffTable':
+        return cls(pd.read_csv(file_tariffs, dtype={'HS前缀': str}))
+
+    def lookup(self, hs_codes, countries) -> pd.DataFrame:
+        """
+        向量化最长前缀匹配
+        :param hs_codes: HS 编码数组
+        :param countries: 目的国数组 (或单个国家)，与 hs_codes 广播
+        :return: DataFrame[匹配前缀, 关税率, 增值税率, 计税基础]，未匹配的行税率为 NaN
+        """
+        hs_codes = pd.Series(np.asarray(hs_codes, dtype=object)).fillna('').to_numpy(dtype=object)
+        countries = pd.Series(np.broadcast_to(np.asarray(countries, dtype=object), hs_codes.shape)).fillna('')
+        # (HS, 国家) 组合通常远少于行数，只对唯一组合做匹配
+        codes, uniques = pd.MultiIndex.from_arrays([hs_codes, countries.to_numpy(dtype=object)]).factorize()
+        hs = normalize_hs(uniques.get_level_values(0)).to_numpy(dtype=object)
+        country = pd.Series(uniques.get_level_values(1)).astype(str).str.upper().to_numpy(dtype=object)
+        rows = np.full(len(hs), -1, dtype=np.int64)
+        hs_series = pd.Series(hs)
+        for length in self._lengths:
+            todo = np.flatnonzero(rows < 0)
+            if len(todo) == 0:
+                break
+            prefix = hs_series.iloc[todo].str[:length]
+            # 编码位数不足的不参与该长度的匹配
+            ok = (hs_series.iloc[todo].str.len() >= length).to_numpy()
+            keys = pd.Index(country[todo] + '|' + prefix.to_numpy(dtype=object))
+            found = self._index.get_indexer(keys)
+            hit = ok & (found >= 0)
+            rows[todo[hit]] = found[hit]
+
+        rows = np.where(codes >= 0, rows[codes], -1)
+        matched = rows >= 0
+        safe = np.where(matched, rows, 0)
+        return pd.DataFrame({
+            '匹配前缀': np.where(matched, self.table['HS前缀'].to_numpy(dtype=object)[safe], None),
+            '关税率': np.where(matched, self._duty[safe], np.nan),
+            '增值税率': np.where(matched, self._vat[safe], np.nan),
+            '计税基础': np.where(matched, np.where(self._cif[safe], 'CIF', 'FOB'), None),
+        })
+
+
+def landed_cost(
+        df: pd.DataFrame,
+        tariffs: TariffTable,
+        countries: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    计算到岸成本
+    :param df: CostEngine.compute 的结果 (含 单价(CNY), 数量, 运输成本(CNY))，需包含 HS编码 列
+    :param tariffs: 税率表
+    :param countries: 目的国列表；给出时每行与每个国家交叉，否则使用 df 中的 国家 列
+    :return: 每个 (订单行, 国家) 一行，附带 货值(CNY), 关税(CNY), 增值税(CNY), 到岸成本(CNY)
+    """
+    if 'HS编码' not in df.columns:
+        raise ValueError('缺少列: HS编码')
+    if countries is not None:
+        df = df.drop(columns=['国家'], errors='ignore').merge(pd.DataFrame({'国家': list(countries)}), how='cross')
+    elif '国家' not in df.columns:
+        raise ValueError('缺少列: 国家 (或传入 countries)')
+    df = df.reset_index(drop=True)
+
+    rates = tariffs.lookup(df['HS编码'].to_numpy(), df['国家'].to_numpy())
+    goods = df['单价(CNY)'].to_numpy(dtype=float) * df['数量'].to_numpy(dtype=float)
+    freight = df['运输成本(CNY)'].to_numpy(dtype=float)
+    base = np.where(rates['计税基础'].to_numpy() == 'FOB', goods, goods + freight)
+    duty = base * rates['关税率'].to_numpy()
+    vat = (base + duty) * rates['增值税率'].to_numpy()
+
+    df = pd.concat([df, rates], axis=1)
+    df['货值(CNY)'] = goods
+    df['关税(CNY)'] = duty
+    df['增值税(CNY)'] = vat
+    df['到岸成本(CNY)'] = goods + freight + duty + vat
+    n_missing = int(np.isnan(duty).sum())
+    if n_missing:
+        print(f'[WARN] {n_missing} 行未匹配到税率 (HS编码 + 国家)，到岸成本为空')
+    return df
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    tariff_table = TariffTable(pd.DataFrame({
+        '国家': ['US', 'US', 'DE', 'DE', 'GB'],
+        'HS前缀': ['8414', '841451', '84', '8518', '84'],
+        '关税率': [0.047, 0.0, 0.017, 0.02, 0.0],
+        '增值税率': [0.0, 0.0, 0.19, 0.19, 0.2],
+        '计税基础': ['FOB', 'FOB', 'CIF', 'CIF', 'CIF'],
+    }))
+    df_lines = pd.DataFrame({
+        'SKU': ['FAN-01', 'SPK-01'],
+        'HS编码': ['8414.51.00', '851830'],
+        '单价(CNY)': [35.0, 120.0],
+        '数量': [100, 50],
+        '运输成本(CNY)': [300.0, 260.0],
+    })
+    print(landed_cost(df_lines, tariff_table, countries=['US', 'DE', 'GB']))
@@ -0,0 +1,161 @@
+'''
+@Desc:   物流报价引擎 (阶梯重量 + 体积重 + 最低收费 + 区域附加费)
+         calculate_cost / CostEngine 的运费公式 max(单件运费 * 数量, 按kg运费 * 单件重量 * 数量)
+         忽略了重量阶梯、体积重、最低收费与区域附加费。本模块：
+         1. 运费表 (rate card) 每个 (物流方案 ID, 区域) 一组重量阶梯，加载为一个全局有序数组
+         2. 一批货件与所有可选方案做向量化连接，searchsorted 一次定位每个 (货件, 方案) 的重量阶梯
+         3. 计费重量 = max(实重, 体积 / 体积重系数)，按计费单位向上取整
+            运费 = max(计费重量 * 每kg运费 + 挂号费, 最低收费) + 区域附加费
+         4. 返回每个货件的最便宜方案
+
+         运费表 (rate_card.csv) 每行为一个重量阶梯：
+             ID, 区域, 起始重量(kg), 每kg运费(CNY), 挂号费(CNY)
+         可选列 (同一 ID + 区域 取第一行)：
+             最高重量(kg), 最低收费(CNY), 区域附加费(CNY), 体积重系数 (默认 6000), 计费单位(kg)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+# 运费表必需列
+RATE_COLUMNS = ['ID', '区域', '起始重量(kg)', '每kg运费(CNY)', '挂号费(CNY)']
+# 可选列及默认值
+RATE_DEFAULTS = {
+    '最高重量(kg)': np.inf,
+    '最低收费(CNY)': 0.0,
+    '区域附加费(CNY)': 0.0,
+    '体积重系数': 6000.0,
+    '计费单位(kg)': 0.0,
+}
+
+
+class LogisticsRateEngine:
+    def __init__(self, rate_card: pd.DataFrame, logistics_df: Optional[pd.DataFrame] = None):
+        """
+        :param rate_card: 运费表，每行为一个重量阶梯 (见模块说明)
+        :param logistics_df: 物流信息表 (load_logistics)，用于在报价结果中附带物流公司、运输方式
+        """
+        for col in RATE_COLUMNS:
+            if col not in rate_card.columns:
+                raise ValueError(f'运费表缺少列: {col}')
+        df = rate_card.copy()
+        df['ID'] = df['ID'].astype(str)
+        df['区域'] = df['区域'].astype(str)
+        for col, default in RATE_DEFAULTS.items():
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(default) if col in df.columns else default
+        df = df.sort_values(['ID', '区域', '起始重量(kg)'], kind='stable').reset_index(drop=True)
+
+        # 每个 (ID, 区域) 一个组；组级参数取组内第一行
+        group_keys = df[['ID', '区域']].drop_duplicates()
+        self.groups = df.loc[group_keys.index, ['ID', '区域'] + list(RATE_DEFAULTS)].reset_index(drop=True)
+        self.groups['gid'] = np.arange(len(self.groups))
+        if logistics_df is not None:
+            info = logistics_df[['ID', '物流公司', '运输方式']].astype({'ID': str}).drop_duplicates('ID')
+            self.groups = self.groups.merge(info, on='ID', how='left')
+        gid = np.repeat(self.groups['gid'].to_numpy(), df.groupby(['ID', '区域'], sort=False).size().to_numpy())
+
+        # 全局有序键：组号 * span + 起始重量，组号为主序，组内按重量有序
+        start = df['起始重量(kg)'].to_numpy(dtype=float)
+        self._span = float(max(start.max(initial=0.0), 1.0)) * 2 + 1
+        self._keys = gid * self._span + start
+        self._gid = gid
+        self._per_kg = df['每kg运费(CNY)'].to_numpy(dtype=float)
+        self._fee = df['挂号费(CNY)'].to_numpy(dtype=float)
+
+    @classmethod
+    def from_csv(cls, file_rate_card: str, logistics_df: Optional[pd.DataFrame] = None) -> 'LogisticsRateEngine':
+        return cls(pd.read_csv(file_rate_card), logistics_df)
+
+    def quote(self, shipments: pd.DataFrame, zone: Optional[str] = None) -> pd.DataFrame:
+        """
+        对一批货件计算所有可选方案的运费
+        :param shipments: 货件表，需包含 重量(kg) (整票实重)，可包含 体积(cm3)、区域
+        :param zone: 货件表没有 区域 列时使用的目的地区域
+        :return: 每个 (货件, 方案) 一行：shipment_idx, ID, 区域, 计费重量(kg), 运费(CNY)；
+                 超出方案重量范围的组合不返回
+        """
+        weight = shipments['重量(kg)'].to_numpy(dtype=float)
+        volume = shipments['体积(cm3)'].to_numpy(dtype=float) if '体积(cm3)' in shipments.columns \
+            else np.zeros(len(shipments))
+        zones = shipments['区域'].astype(str).to_numpy() if '区域' in shipments.columns \
+            else np.full(len(shipments), str(zone))
+
+        # 1. 货件 x 同区域的全部方案 (哈希连接)
+        pairs = pd.DataFrame({'shipment_idx': np.arange(len(shipments)), '区域': zones}).merge(
+            self.groups, on='区域', how='inner'
+        )
+        idx = pairs['shipment_idx'].to_numpy()
+        gid = pairs['gid'].to_numpy()
+
+        # 2. 计费重量
+        volumetric = np.nan_to_num(volume[idx]) / pairs['体积重系数'].to_numpy()
+        chargeable = np.maximum(weight[idx], volumetric)
+        step = pairs['计费单位(kg)'].to_numpy()
+        rounded = np.where(step > 0, np.ceil(np.round(chargeable / np.where(step > 0, step, 1), 9)) * step, chargeable)
+
+        # 3. searchsorted 定位重量阶梯 (起始重量 <= 计费重量 的最后一档)
+        pos = np.searchsorted(self._keys, gid * self._span + np.minimum(rounded, self._span - 1), side='right') - 1
+        valid = (pos >= 0) & (rounded <= pairs['最高重量(kg)'].to_numpy()) & ~np.isnan(rounded)
+        valid[valid] &= self._gid[pos[valid]] == gid[valid]
+        pos = np.where(valid, pos, 0)
+
+        # 4. 运费
+        price = np.maximum(rounded * self._per_kg[pos] + self._fee[pos], pairs['最低收费(CNY)'].to_numpy())
+        price = price + pairs['区域附加费(CNY)'].to_numpy()
+        pairs['计费重量(kg)'] = rounded
+        pairs['运费(CNY)'] = np.round(price, 2)
+        info_cols = [c for c in ('物流公司', '运输方式') if c in pairs.columns]
+        return pairs.loc[valid, ['shipment_idx', 'ID'] + info_cols + ['区域', '计费重量(kg)', '运费(CNY)']] \
+            .reset_index(drop=True)
+
+    def cheapest(self, shipments: pd.DataFrame, zone: Optional[str] = None) -> pd.DataFrame:
+        """
+        每个货件的最便宜方案
+        :return: 货件表附加 ID (物流方案)、计费重量(kg)、运费(CNY)；没有可用方案的货件为空值
+        """
+        quotes = self.quote(shipments, zone)
+        best = quotes.sort_values(['shipment_idx', '运费(CNY)'], kind='stable').drop_duplicates('shipment_idx')
+        best = best.set_index('shipment_idx').drop(columns=['区域']).reindex(np.arange(len(shipments)))
+        result = shipments.reset_index(drop=True).copy()
+        for col in best.columns:
+            result[col] = best[col].to_numpy()
+        return result
+
+
+def shipments_from_orders(orders: pd.DataFrame, products_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    由订单生成货件：整票重量 = 单件重量 * 数量，体积 = 单件长*宽*高 * 数量
+    :param orders: 订单表，包含 SKU, 数量，可包含 区域
+    :param products_df: 商品表，包含 SKU, 重量(kg)，可包含 长(cm), 宽(cm), 高(cm)
+    """
+    cols = ['SKU', '重量(kg)'] + [c for c in ('长(cm)', '宽(cm)', '高(cm)') if c in products_df.columns]
+    df = pd.DataFrame(orders).merge(
+        products_df[cols].drop_duplicates('SKU').rename(columns={'重量(kg)': '单件重量(kg)'}),
+        on='SKU', how='left'
+    )
+    quantity = df['数量'].to_numpy(dtype=float)
+    df['重量(kg)'] = df['单件重量(kg)'].to_numpy(dtype=float) * quantity
+    if {'长(cm)', '宽(cm)', '高(cm)'} <= set(df.columns):
+        df['体积(cm3)'] = df['长(cm)'] * df['宽(cm)'] * df['高(cm)'] * quantity
+    return df
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    rate_card = pd.DataFrame({
+        'ID': ['LS001'] * 3 + ['LS002'] * 2,
+        '区域': ['US'] * 5,
+        '起始重量(kg)': [0, 0.5, 2, 0, 1],
+        '每kg运费(CNY)': [90, 80, 70, 60, 55],
+        '挂号费(CNY)': [18, 18, 15, 25, 25],
+        '最低收费(CNY)': [30, 30, 30, 40, 40],
+        '体积重系数': [8000, 8000, 8000, 6000, 6000],
+        '计费单位(kg)': [0.1, 0.1, 0.1, 0.5, 0.5],
+    })
+    engine = LogisticsRateEngine(rate_card)
+    shipments = pd.DataFrame({'重量(kg)': [0.3, 1.2, 5.0], '体积(cm3)': [1000, 12000, 20000]})
+    print(engine.quote(shipments, zone='US'))
+    print(engine.cheapest(shipments, zone='US'))
@@ -0,0 +1,172 @@
+'''
+@Desc:   毛利率蒙特卡洛模拟 (汇率 + 运费不确定性)
+         calculate_cost 对每条订单只给出一个确定的成本，而跨境订单的毛利会随人民币汇率与运费波动。
+         本模块：
+         1. 汇率情景：各币种对 CNY 的对数收益服从多元正态分布，
+            协方差由历史汇率库 (FXHistoryStore) 估计 (按快照间隔折算为日波动)，无历史时使用默认日波动
+         2. 运费情景：对数正态的运费倍数 (所有线路共用一个冲击)
+         3. 所有 (情景 x SKU-市场) 的毛利率以 NumPy 数组一次计算，按行分块控制内存
+         4. 输出每个 SKU-市场 的毛利率分位数、均值与亏损概率
+
+         输入表每行为一个 SKU 在某个市场的售价与成本：
+             SKU, 市场, 售价, 币种, 单件成本(CNY), 单件运费(CNY)
+         可选列：费率 (平台佣金、支付手续费等按售价计算的比例，默认 0)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+# 输入表必需列
+SIMULATION_COLUMNS = ['SKU', '市场', '售价', '币种', '单件成本(CNY)', '单件运费(CNY)']
+# 每块同时存在的 (情景 x 行) float64 数组个数 (汇率倍数、收入、毛利、毛利率、分位数排序副本等)
+_ARRAYS_PER_CHUNK = 6
+
+
+class MarginSimulator:
+    def __init__(
+            self,
+            exchange_manager: Optional[ExchangeRateManager] = None,
+            fx_history=None,
+            n_scenarios: int = 10000,
+            horizon_days: float = 30,
+            freight_vol: float = 0.15,
+            default_fx_vol: float = 0.004,
+            seed: int = 42
+    ):
+        """
+        :param exchange_manager: 当前汇率，默认使用共享汇率缓存
+        :param fx_history: 历史汇率库 FXHistoryStore (可选)，用于估计汇率波动与相关性
+        :param n_scenarios: 情景数
+        :param horizon_days: 模拟期限 (天)，如从下单到回款的周期
+        :param freight_vol: 运费倍数在模拟期限内的对数波动率
+        :param default_fx_vol: 无历史数据的币种使用的日对数波动率
+        :param seed: 随机种子
+        """
+        self.exchange_manager = exchange_manager or ExchangeRateManager()
+        self.fx_history = fx_history
+        self.n_scenarios = n_scenarios
+        self.horizon_days = horizon_days
+        self.freight_vol = freight_vol
+        self.default_fx_vol = default_fx_vol
+        self.seed = seed
+
+    def fx_covariance(self, currencies: List[str]) -> np.ndarray:
+        """
+        各币种对 CNY 的日对数收益协方差矩阵
+        - 历史快照间隔不等 (日/月)，收益除以 sqrt(间隔天数) 折算为日收益
+        - 缺少历史的币种使用默认日波动且与其它币种不相关；CNY 波动为 0
+        """
+        n = len(currencies)
+        cov = np.diag(np.full(n, self.default_fx_vol ** 2))
+        if self.fx_history is not None and len(self.fx_history.dates) > 2:
+            df = self.fx_history.to_dataframe().reindex(columns=currencies)
+            days = np.diff(df.index.to_numpy(dtype='datetime64[D]').astype(np.int64)).astype(float)
+            returns = np.diff(np.log(df.to_numpy(dtype=float)), axis=0) / np.sqrt(days)[:, None]
+            hist = pd.DataFrame(returns).cov(min_periods=3).to_numpy()
+            # 有历史的币种用历史协方差覆盖
+            known = ~np.isnan(np.diag(hist))
+            block = np.ix_(known, known)
+            cov[block] = np.nan_to_num(hist[block])
+        for i, c in enumerate(currencies):
+            if c == 'CNY':
+                cov[i, :] = 0
+                cov[:, i] = 0
+        return cov
+
+    def _draw_fx(self, rng: np.random.Generator, currencies: List[str]) -> np.ndarray:
+        """(n_scenarios, n_currencies) 的汇率倍数 exp(对数收益)"""
+        cov = self.fx_covariance(currencies) * self.horizon_days
+        # 协方差可能因缺失值或舍入不是严格正定，用特征分解代替 Cholesky
+        eigval, eigvec = np.linalg.eigh(cov)
+        factor = eigvec * np.sqrt(np.clip(eigval, 0, None))
+        z = rng.standard_normal((self.n_scenarios, len(currencies)))
+        log_returns = z @ factor.T
+        # 减去 0.5 * 方差，使汇率倍数期望为 1
+        return np.exp(log_returns - 0.5 * np.diag(cov))
+
+    def simulate(
+            self,
+            df: pd.DataFrame,
+            percentiles: Sequence[float] = (5, 50, 95),
+            chunk_rows: Optional[int] = None,
+            memory_mb: float = 64
+    ) -> pd.DataFrame:
+        """
+        模拟每个 SKU-市场 的毛利率分布
+        :param df: 输入表 (见模块说明)
+        :param percentiles: 输出的毛利率分位数 (0-100)
+        :param chunk_rows: 每次计算的行数，None 时按 memory_mb 推算
+        :param memory_mb: 分块计算的内存预算 (MB)，每块约 n_scenarios * chunk_rows * 8 字节 * 6 个数组
+                          (默认 10000 个情景时每块约 140 行)
+        :return: 输入表附加 毛利率_p{x}, 毛利率_均值, 期望毛利(CNY), 亏损概率
+        """
+        for col in SIMULATION_COLUMNS:
+            if col not in df.columns:
+                raise ValueError(f'输入表缺少列: {col}')
+        rng = np.random.default_rng(self.seed)
+
+        currency = df['币种'].astype(str).str.upper()
+        codes, currencies = pd.factorize(currency)
+        currencies = list(currencies)
+        rate0 = self.exchange_manager.rate_array(currencies)
+        fx = self._draw_fx(rng, currencies)
+        freight_shock = np.exp(
+            rng.standard_normal(self.n_scenarios) * self.freight_vol - 0.5 * self.freight_vol ** 2
+        )[:, None]
+
+        price = df['售价'].to_numpy(dtype=float)
+        unit_cost = df['单件成本(CNY)'].to_numpy(dtype=float)
+        freight = df['单件运费(CNY)'].to_numpy(dtype=float)
+        fee_rate = df['费率'].to_numpy(dtype=float) if '费率' in df.columns else np.zeros(len(df))
+
+        n = len(df)
+        if chunk_rows is None:
+            chunk_rows = int(memory_mb * 2 ** 20 // (self.n_scenarios * 8 * _ARRAYS_PER_CHUNK))
+        chunk_rows = max(1, chunk_rows)
+        q = np.asarray(percentiles, dtype=float)
+        out_pct = np.empty((n, len(q)))
+        out_mean = np.empty(n)
+        out_profit = np.empty(n)
+        out_loss = np.empty(n)
+        for start in range(0, n, chunk_rows):
+            sl = slice(start, start + chunk_rows)
+            # 汇率口径：1 CNY = rate 外币，售价折算 CNY = 售价 / (rate0 * 倍数)
+            revenue = price[sl] / (rate0[codes[sl]] * fx[:, codes[sl]])
+            profit = revenue * (1 - fee_rate[sl]) - unit_cost[sl] - freight[sl] * freight_shock
+            with np.errstate(divide='ignore', invalid='ignore'):
+                margin = profit / revenue
+            out_pct[sl] = np.percentile(margin, q, axis=0).T
+            out_mean[sl] = margin.mean(axis=0)
+            out_profit[sl] = profit.mean(axis=0)
+            out_loss[sl] = (profit < 0).mean(axis=0)
+
+        result = df.copy()
+        for i, p in enumerate(q):
+            result[f'毛利率_p{p:g}'] = out_pct[:, i]
+        result['毛利率_均值'] = out_mean
+        result['期望毛利(CNY)'] = out_profit
+        result['亏损概率'] = out_loss
+        # 不支持的币种没有当前汇率
+        result.loc[np.isnan(rate0[codes]), result.columns[len(df.columns):]] = np.nan
+        return result
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    from source.financial_analysis_system.fx_history import FXHistoryStore
+
+    simulator = MarginSimulator(fx_history=FXHistoryStore(), n_scenarios=20000, horizon_days=45)
+    df_input = pd.DataFrame({
+        'SKU': ['FAN-01', 'FAN-01', 'SPK-01'],
+        '市场': ['US', 'DE', 'SG'],
+        '售价': [19.99, 18.99, 39.9],
+        '币种': ['USD', 'EUR', 'SGD'],
+        '单件成本(CNY)': [35.0, 35.0, 120.0],
+        '单件运费(CNY)': [28.0, 32.0, 18.0],
+        '费率': [0.15, 0.15, 0.12],
+    })
+    print(simulator.simulate(df_input))
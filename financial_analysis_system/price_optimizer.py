@@ -0,0 +1,197 @@
+'''
+@Desc:   售价优化 (向量化价格网格)
+         成本确定后售价仍靠手工设定。本模块在成本引擎的到岸成本基础上，为每个 SKU x 市场：
+         1. 以参考售价为中心生成候选价格网格 (rows x grid 的二维数组)
+         2. 需求采用常弹性模型：日销量 = 参考日销量 * (售价 / 参考售价) ^ 弹性
+            弹性可由平台快照 (ShopeeSnapshotStore.sales_velocity) 按组做 log-log 回归估计
+         3. 单件毛利 = 售价折算 CNY * (1 - 费率) - 单件到岸成本，整张网格一次计算
+         4. 按目标 (日毛利最大 / 毛利率最大) 与约束 (最低毛利率、最低日销量) 取每行最优价格
+
+         输入表每行为一个 SKU 在某个市场：
+             SKU, 市场, 币种, 单件成本(CNY), 参考售价, 参考日销量
+         可选列：弹性 (默认 default_elasticity)、费率 (平台佣金等按售价计算的比例，默认 0)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+# 输入表必需列
+PRICE_COLUMNS = ['SKU', '市场', '币种', '单件成本(CNY)', '参考售价', '参考日销量']
+
+
+def estimate_elasticity(
+        df: pd.DataFrame,
+        group_col: Optional[str] = None,
+        price_col: str = 'price',
+        units_col: str = 'units_per_day',
+        min_obs: int = 5,
+        default: float = -1.5,
+        bounds: Tuple[float, float] = (-5.0, -0.2)
+) -> pd.DataFrame:
+    """
+    按组估计价格弹性：同组商品 log(日销量) 对 log(价格) 的最小二乘斜率 (groupby 求和的闭式解)
+    :param df: ShopeeSnapshotStore.sales_velocity 的结果 (可先合并关键词或 cluster_listings 的簇编号)
+    :param group_col: 分组列，None 表示全部商品为一组
+    :param min_obs: 样本数不足的组使用 default
+    :param default: 默认弹性
+    :param bounds: 弹性上下限 (截断异常估计)
+    :return: DataFrame[group_col, 弹性, 参考售价, 参考日销量, 样本数]
+    """
+    data = df[[price_col, units_col] + ([group_col] if group_col else [])].copy()
+    data = data[(data[price_col] > 0) & (data[units_col] > 0)]
+    data['x'] = np.log(data[price_col].to_numpy(dtype=float))
+    data['y'] = np.log(data[units_col].to_numpy(dtype=float))
+    data['xx'] = data['x'] ** 2
+    data['xy'] = data['x'] * data['y']
+    keys = data[group_col] if group_col else np.zeros(len(data), dtype=int)
+    g = data.groupby(keys)
+    sums = g[['x', 'y', 'xx', 'xy']].sum()
+    n = g.size().to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = sums['xx'].to_numpy() - sums['x'].to_numpy() ** 2 / n
+        cov = sums['xy'].to_numpy() - sums['x'].to_numpy() * sums['y'].to_numpy() / n
+        slope = cov / var
+    ok = (n >= min_obs) & np.isfinite(slope)
+    result = pd.DataFrame({
+        '弹性': np.clip(np.where(ok, slope, default), *bounds),
+        '参考售价': g[price_col].median().to_numpy(),
+        '参考日销量': g[units_col].median().to_numpy(),
+        '样本数': n.astype(int),
+    }, index=sums.index)
+    return result.rename_axis(group_col or 'group').reset_index()
+
+
+def unit_costs_from_landed(df_landed: pd.DataFrame, market_col: str = '国家') -> pd.DataFrame:
+    """
+    由 CostEngine.landed 的结果计算每个 SKU x 市场 的单件到岸成本
+    :return: DataFrame[SKU, 市场, 单件成本(CNY)]
+    """
+    g = df_landed.groupby(['SKU', market_col])
+    df = (g['到岸成本(CNY)'].sum() / g['数量'].sum()).rename('单件成本(CNY)').reset_index()
+    return df.rename(columns={market_col: '市场'})
+
+
+class PriceOptimizer:
+    def __init__(
+            self,
+            exchange_manager: Optional[ExchangeRateManager] = None,
+            grid_size: int = 61,
+            min_multiplier: float = 0.5,
+            max_multiplier: float = 2.0,
+            default_elasticity: float = -1.5
+    ):
+        """
+        :param exchange_manager: 汇率管理器，默认使用共享汇率缓存
+        :param grid_size: 每行候选价格个数
+        :param min_multiplier: 候选价格下限 = 参考售价 * min_multiplier
+        :param max_multiplier: 候选价格上限 = 参考售价 * max_multiplier
+        :param default_elasticity: 输入表没有 弹性 列 (或为空) 时使用
+        """
+        self.exchange_manager = exchange_manager or ExchangeRateManager()
+        self.grid_size = grid_size
+        self.min_multiplier = min_multiplier
+        self.max_multiplier = max_multiplier
+        self.default_elasticity = default_elasticity
+
+    def evaluate(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        在价格网格上计算销量与毛利
+        :return: {'price', 'units', 'unit_profit', 'profit', 'margin'}，均为 (行数, grid_size) 数组，
+                 金额为 CNY，price 为市场币种
+        """
+        for col in PRICE_COLUMNS:
+            if col not in df.columns:
+                raise ValueError(f'输入表缺少列: {col}')
+        ref_price = df['参考售价'].to_numpy(dtype=float)[:, None]
+        ref_units = df['参考日销量'].to_numpy(dtype=float)[:, None]
+        elasticity = df['弹性'].to_numpy(dtype=float) if '弹性' in df.columns else np.full(len(df), np.nan)
+        elasticity = np.where(np.isnan(elasticity), self.default_elasticity, elasticity)[:, None]
+        fee_rate = df['费率'].to_numpy(dtype=float)[:, None] if '费率' in df.columns else 0.0
+        unit_cost = df['单件成本(CNY)'].to_numpy(dtype=float)[:, None]
+        # 汇率口径：1 CNY = rate 外币
+        rate = self.exchange_manager.rate_array(df['币种'].to_numpy())[:, None]
+
+        multipliers = np.linspace(self.min_multiplier, self.max_multiplier, self.grid_size)[None, :]
+        price = ref_price * multipliers
+        units = ref_units * multipliers ** elasticity
+        revenue_cny = price / rate
+        unit_profit = revenue_cny * (1 - fee_rate) - unit_cost
+        return {
+            'price': price,
+            'units': units,
+            'unit_profit': unit_profit,
+            'profit': unit_profit * units,
+            'margin': unit_profit / revenue_cny,
+        }
+
+    def optimize(
+            self,
+            df: pd.DataFrame,
+            objective: str = 'profit',
+            min_margin: Optional[float] = None,
+            min_units: Optional[float] = None
+    ) -> pd.DataFrame:
+        """
+        为每个 SKU x 市场 选出最优售价
+        :param df: 输入表 (见模块说明)
+        :param objective: 'profit' 日毛利最大，'margin' 毛利率最大 (通常需配合 min_units)
+        :param min_margin: 最低毛利率约束
+        :param min_units: 最低日销量约束
+        :return: 输入表附加 最优售价, 预计日销量, 单件毛利(CNY), 毛利率, 日毛利(CNY)；无可行价格的行为空值
+        """
+        if objective not in ('profit', 'margin'):
+            raise ValueError("objective 只支持 'profit' 或 'margin'")
+        grid = self.evaluate(df)
+        score = np.where(np.isnan(grid[objective]), -np.inf, grid[objective])
+        feasible = np.isfinite(score)
+        if min_margin is not None:
+            feasible &= grid['margin'] >= min_margin
+        if min_units is not None:
+            feasible &= grid['units'] >= min_units
+        score = np.where(feasible, score, -np.inf)
+
+        best = np.argmax(score, axis=1)
+        rows = np.arange(len(df))
+        has_solution = feasible[rows, best]
+        result = df.copy()
+        for name, col in [
+            ('最优售价', 'price'),
+            ('预计日销量', 'units'),
+            ('单件毛利(CNY)', 'unit_profit'),
+            ('毛利率', 'margin'),
+            ('日毛利(CNY)', 'profit'),
+        ]:
+            result[name] = np.where(has_solution, grid[col][rows, best], np.nan)
+        result['最优售价'] = result['最优售价'].round(2)
+        return result
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    from source.product_research.shopee_snapshot import ShopeeSnapshotStore
+
+    # 1. 由 Shopee 快照估计弹性 (全部商品一组)
+    df_velocity = ShopeeSnapshotStore().sales_velocity()
+    default_elasticity = -1.5
+    if not df_velocity.empty:
+        df_elasticity = estimate_elasticity(df_velocity, default=default_elasticity)
+        # 没有价格、日销量均为正的样本时结果为空，沿用默认弹性
+        if len(df_elasticity) and np.isfinite(df_elasticity['弹性'].iloc[0]):
+            default_elasticity = float(df_elasticity['弹性'].iloc[0])
+    # 2. 每个 SKU x 市场 的单件到岸成本 (可由 unit_costs_from_landed(CostEngine.landed(...)) 得到)
+    df_input = pd.DataFrame({
+        'SKU': ['FAN-01', 'FAN-01', 'SPK-01'],
+        '市场': ['US', 'DE', 'SG'],
+        '币种': ['USD', 'EUR', 'SGD'],
+        '单件成本(CNY)': [62.0, 70.0, 140.0],
+        '参考售价': [19.99, 18.99, 39.9],
+        '参考日销量': [30, 12, 8],
+        '费率': [0.15, 0.15, 0.12],
+    })
+    optimizer = PriceOptimizer(default_elasticity=default_elasticity)
+    print(optimizer.optimize(df_input, objective='profit', min_margin=0.1))
@@ -10,17 +10,166 @@
 import csv
 import json
 import os.path
+import queue
+import threading
+import time
 import pandas as pd
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import quote_plus
 from amzpy import AmazonScraper
 from source.utils.paths import PathManager
 from source.utils.excel import Excel
-from source.utils.images import ImageUtils
+from source.utils.images import ImageUtils, ImageStore
+from source.utils.disk_cache import DiskTTLCache
+
+# ASIN 缓存保存的字段
+ASIN_CACHE_FIELDS = [
+    'asin',
+    'title',
+    'price',
+    'currency',
+    'rating',
+    'reviews_count',
+    'url',
+    'img_url'
+]
 
 class AmazonUtils:
-    def __init__(self):
+    def __init__(
+            self,
+            sessions_per_market: int = 4,
+            impersonate: str = 'chrome119',
+            cache_ttl_hours: float = 24,
+            file_cache: str = None
+    ):
+        """
+        :param sessions_per_market: 每个站点最多保留的 AmazonScraper 会话数 (并发上限)
+        :param impersonate: curl_cffi 模拟的浏览器指纹
+        :param cache_ttl_hours: ASIN 缓存有效期 (小时)
+        :param file_cache: 缓存数据库路径，默认为 data/cache/cache.sqlite (所有 AmazonUtils 共享)
+        """
         self.pm = PathManager()
         self.path_data = os.path.join(self.pm.data_dir, 'amazon_data')
         self.path_amazon_img = os.path.join(self.path_data, 'images')
+        self.path_image_store = os.path.join(self.path_data, 'image_store')
+        self.sessions_per_market = sessions_per_market
+        self.impersonate = impersonate
+        # 每个站点一个会话池：{country_code: (Queue, 已创建数量)}
+        # curl_cffi 的会话不是线程安全的，同一时刻一个会话只借给一个线程
+        self._scraper_pools = {}
+        self._pool_lock = threading.Lock()
+        if file_cache is None:
+            file_cache = os.path.join(self.pm.data_dir, 'cache', 'cache.sqlite')
+        self.asin_cache = DiskTTLCache(file_cache, namespace='amazon_asin', ttl_seconds=cache_ttl_hours * 3600)
+
+    @contextmanager
+    def scraper(self, country_code: str = 'com'):
+        """
+        从站点会话池借出一个 AmazonScraper，用完归还，复用连接与 Cookie
+        池中会话不足且未达上限时新建，达到上限时等待其它线程归还
+        """
+        with self._pool_lock:
+            pool, created = self._scraper_pools.get(country_code, (queue.Queue(), 0))
+            if pool.empty() and created < self.sessions_per_market:
+                pool.put(AmazonScraper(country_code=country_code, impersonate=self.impersonate))
+                created += 1
+            self._scraper_pools[country_code] = (pool, created)
+        scraper = pool.get()
+        try:
+            yield scraper
+        finally:
+            pool.put(scraper)
+
+    @staticmethod
+    def _asin_key(country_code: str, asin: str) -> str:
+        # 同一 ASIN 在不同站点的价格/币种不同，缓存键带上站点
+        return f'{country_code}:{asin}'
+
+    def cache_products(self, country_code: str, products):
+        """
+        将抓取到的商品写入 ASIN 缓存
+        :param country_code: 站点
+        :param products: 商品字典列表 (需包含 asin)
+        """
+        values = {
+            self._asin_key(country_code, item['asin']): {f: item.get(f) for f in ASIN_CACHE_FIELDS}
+            for item in products
+            if item.get('asin')
+        }
+        self.asin_cache.set_many(values)
+
+    def get_products(
+            self,
+            asins,
+            country_code: str = 'com',
+            refresh_workers: int = 4,
+            refresh_queue_size: int = 100
+    ):
+        """
+        按 ASIN 获取商品信息：未过期的直接读缓存，缺失或过期的通过有界刷新队列重新抓取详情页
+        - 刷新队列满时生产者阻塞，抓取速度由 refresh_workers 控制
+        - 刷新失败的过期 ASIN 仍返回旧数据 (stale=True)
+        :param asins: ASIN 列表
+        :param country_code: 站点
+        :param refresh_workers: 刷新线程数
+        :param refresh_queue_size: 刷新队列容量
+        :return: {asin: 商品字典 (附带 fetched_at、stale)}
+        """
+        asins = list(dict.fromkeys(asins))
+        keys = {asin: self._asin_key(country_code, asin) for asin in asins}
+        cached = self.asin_cache.get_many(keys.values(), include_stale=True)
+        stale_before = time.time() - self.asin_cache.ttl_seconds
+
+        products = {}
+        to_refresh = []
+        for asin in asins:
+            item = cached.get(keys[asin])
+            if item is not None and item['fetched_at'] >= stale_before:
+                products[asin] = dict(item, stale=False)
+            else:
+                to_refresh.append(asin)
+                if item is not None:
+                    products[asin] = dict(item, stale=True)
+        print(f'[INFO] ASIN 共 {len(asins)} 个，缓存命中 {len(asins) - len(to_refresh)} 个，需刷新 {len(to_refresh)} 个')
+        if not to_refresh:
+            return products
+
+        refresh_queue = queue.Queue(maxsize=refresh_queue_size)
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                asin = refresh_queue.get()
+                try:
+                    if asin is None:
+                        return
+                    url = f'https://www.amazon.{country_code}/dp/{asin}'
+                    with self.scraper(country_code) as scraper:
+                        item = scraper.get_product_details(url)
+                    if item:
+                        item = {f: item.get(f) for f in ASIN_CACHE_FIELDS}
+                        item['asin'] = asin
+                        item['url'] = item['url'] or url
+                        self.cache_products(country_code, [item])
+                        with lock:
+                            products[asin] = dict(item, fetched_at=time.time(), stale=False)
+                except Exception as e:
+                    print(f'[Error] ASIN {asin} 刷新失败: {e}')
+                finally:
+                    refresh_queue.task_done()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(refresh_workers)]
+        for t in threads:
+            t.start()
+        for asin in to_refresh:
+            refresh_queue.put(asin)
+        for _ in threads:
+            refresh_queue.put(None)
+        for t in threads:
+            t.join()
+        return products
 
     def search_by_query(
             self,
@@ -33,16 +182,14 @@ class AmazonUtils:
         file_name = f'amazon_products_{search_name}'
         file_csv = os.path.join(self.path_data, f'{file_name}.csv')
         file_json = os.path.join(self.path_data,f'{file_name}.json')
-        # Create a scraper with configuration
-        scraper = AmazonScraper(
-            country_code=country_code,
-            impersonate='chrome119'
-        )
         # Method 1: Search for shoes on Amazon India
         print('\n--- Method 1: Enhanced Search by Keyword ---')
         print(f'Searching for: "{query}" on Amazon')
         # Search with 5 pages of results for demonstration
-        products = scraper.search_products(query=query, max_pages=max_pages)
+        with self.scraper(country_code) as scraper:
+            products = scraper.search_products(query=query, max_pages=max_pages)
+        if products:
+            self.cache_products(country_code, products)
         # Display the enhanced results
         if products:
             print(f'\nFound {len(products)} products:')
@@ -76,6 +223,68 @@ class AmazonUtils:
                 json.dump(products, f, indent=2)
                 print(f"\nFull search results saved to enhanced_search_results_by_url.json")
 
+    def _search_page(self, country_code: str, query: str, page: int):
+        """
+        抓取单个 查询词 x 站点 的第 page 页搜索结果
+        :return: 商品列表，每条附带 query、marketplace、page 字段
+        """
+        search_url = f'https://www.amazon.{country_code}/s?k={quote_plus(query)}&page={page}'
+        with self.scraper(country_code) as scraper:
+            products = scraper.search_products(search_url=search_url, max_pages=1) or []
+        self.cache_products(country_code, products)
+        for item in products:
+            item['query'] = query
+            item['marketplace'] = country_code
+            item['page'] = page
+        return products
+
+    def search_batch(
+            self,
+            queries,
+            country_codes=('com',),
+            max_pages: int = 2,
+            max_workers: int = 8,
+            dataset_name: str = 'amazon_search'
+    ):
+        """
+        批量搜索：查询词 x 站点 矩阵，所有结果页在有界线程池中并发抓取
+        - 每个站点复用会话池中的 AmazonScraper (见 scraper)
+        - 结果写入同一个按 marketplace / query 分区的 parquet 数据集
+        :param queries: 查询词列表
+        :param country_codes: 站点列表，如 ['com', 'com.au', 'de', 'co.uk']
+        :param max_pages: 每个查询抓取的页数
+        :param max_workers: 线程池大小
+        :param dataset_name: 数据集目录名 (位于 amazon_data 下)
+        :return: 所有结果的 DataFrame
+        """
+        tasks = [
+            (country_code, query, page)
+            for country_code in country_codes
+            for query in queries
+            for page in range(1, max_pages + 1)
+        ]
+        print(f'[INFO] 共 {len(queries)} 个查询词 x {len(country_codes)} 个站点，{len(tasks)} 个页面')
+        products = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._search_page, *task): task for task in tasks}
+            for future in as_completed(futures):
+                country_code, query, page = futures[future]
+                try:
+                    products.extend(future.result())
+                except Exception as e:
+                    print(f'[Error] amazon.{country_code} "{query}" 第 {page} 页抓取失败: {e}')
+        if not products:
+            print('[WARN] 没有获取到任何商品')
+            return pd.DataFrame()
+
+        df = pd.DataFrame(products)
+        df['captured_at'] = datetime.now()
+        path_dataset = os.path.join(self.path_data, dataset_name)
+        # 同一分区中每次运行追加新的分片文件，不覆盖历史结果
+        df.to_parquet(path_dataset, partition_cols=['marketplace', 'query'], index=False)
+        print(f'[INFO] {len(df)} 条商品已写入数据集：{path_dataset}')
+        return df
+
     def to_xlsx(self, csv_name):
         # 1. 读取 CSV
         file_csv = os.path.join(self.path_data, csv_name + '.csv')
@@ -121,6 +330,76 @@ class AmazonUtils:
         # 7. 保存 Excel
         excel_utils.save()
 
+    def prefetch_images(
+            self,
+            df: pd.DataFrame,
+            max_workers: int = 16,
+            thumb_size=(120, 120),
+            timeout: float = 10
+    ):
+        """
+        并发下载 img_url 到内容寻址图片库 (amazon_data/image_store)，并生成缩略图
+        - 相同图片只下载/存储一次，别名为 asin_<asin>
+        - 已在图片库中的 ASIN 直接跳过，不重复下载
+        :param df: 包含 asin、img_url 列的 DataFrame
+        :param max_workers: 下载线程数
+        :param thumb_size: 缩略图最大宽高 (像素)
+        :param timeout: 单个请求超时时间 (秒)
+        :return: {asin: 缩略图路径}，下载失败的 ASIN 不在结果中
+        """
+        image_store = ImageStore(self.path_image_store, thumb_sizes=[thumb_size])
+        df_img = df[['asin', 'img_url']].drop_duplicates('asin')
+        items = {f'asin_{asin}': url for asin, url in df_img.itertuples(index=False)}
+        digests = image_store.download_many(items, max_workers=max_workers, timeout=timeout)
+        return {
+            key[len('asin_'):]: image_store.object_path(digest, thumb_size)
+            for key, digest in digests.items()
+        }
+
+    def to_xlsx_fast(
+            self,
+            csv_name,
+            max_workers: int = 16,
+            thumb_size=(120, 120)
+    ):
+        """
+        to_xlsx 的批量版本：
+          1. 先并发下载全部图片并生成缩略图 (prefetch_images)
+          2. 一次性写入全部数据行
+          3. 嵌入缩略图而非原图，减小文件体积与写入时间
+        :param csv_name: amazon_data 目录下的 CSV 文件名 (不含扩展名)
+        :param max_workers: 图片下载线程数
+        :param thumb_size: 缩略图最大宽高 (像素)
+        """
+        # 1. 读取 CSV 并删除所有重复行 (与 to_xlsx 一致)
+        file_csv = os.path.join(self.path_data, csv_name + '.csv')
+        df = pd.read_csv(file_csv)
+        df = df.drop_duplicates(keep=False).reset_index(drop=True)
+        # 2. 并发预取图片
+        thumbs = self.prefetch_images(df, max_workers=max_workers, thumb_size=thumb_size)
+        # 3. 表头与数据
+        df_new = df.drop(columns=['img_url'])
+        headers = list(df_new.columns) + ['image']
+        excel_utils = Excel(
+            path_target=self.path_data,
+            name_target=csv_name,
+            bool_new=True
+        )
+        excel_utils.insert_header(headers)
+        excel_utils.insert_dataframe(df_new, start_row=2)
+        # 4. 嵌入缩略图，行高与缩略图高度匹配 (行高单位约为像素 * 0.75)
+        col_image = len(headers)
+        row_height = thumb_size[1] * 0.75
+        for i, asin in enumerate(df_new['asin']):
+            file_thumb = thumbs.get(asin)
+            if file_thumb is None:
+                continue
+            excel_utils.insert_image(i + 2, col_image, file_thumb)
+            excel_utils.sheet.row_dimensions[i + 2].height = row_height
+        # 5. 保存 Excel
+        excel_utils.save()
+        print(f'[INFO] 已导出 {len(df_new)} 条商品到 {csv_name}.xlsx')
+
 if __name__ == "__main__":
     # Uncomment the examples you want to run
     # example_config()
@@ -132,4 +411,10 @@ if __name__ == "__main__":
         query='men sneakers size 9',
         max_pages=2
     )
-    # amazon_utils.to_xlsx('amazon_products_mini_fan')
\ No newline at end of file
+    # amazon_utils.search_batch(
+    #     queries=['mini fan', 'handheld fan', 'neck fan'],
+    #     country_codes=['com', 'com.au', 'de', 'co.uk'],
+    #     max_pages=3
+    # )
+    # amazon_utils.to_xlsx('amazon_products_mini_fan')
+    # amazon_utils.to_xlsx_fast('amazon_products_mini_fan')
\ No newline at end of file
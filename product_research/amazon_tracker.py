@@ -0,0 +1,292 @@
+'''
+@Desc:   Amazon 价格与评论数跟踪
+         1. 每次观测到的 ASIN 写入只追加、差分压缩的时间序列库 (DeltaSnapshotStore)
+         2. 关注列表 (watchlist) 记录每个 ASIN 的类目、观测间隔与上次观测时间，
+            按间隔调度到期 ASIN 的重新观测
+         3. 向量化查询：按类目统计价格分位数、最近 N 天评论增速
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Union
+from source.utils.paths import PathManager
+from source.utils.delta_store import DeltaSnapshotStore
+from source.utils.number_parser import decimal_separators, parse_numbers
+
+
+class AmazonPriceTracker:
+    # 数值列及其定点缩放倍数
+    value_columns = {
+        'price': 100,
+        'rating': 100,
+        'reviews_count': 1,
+    }
+    # 关注列表字段
+    watch_columns = [
+        'marketplace',
+        'asin',
+        'category',
+        'title',
+        'watched',
+        'interval_hours',
+        'last_observed',
+    ]
+
+    def __init__(self, path_store: str = None):
+        """
+        :param path_store: 存储目录，默认为 data/amazon_data/tracker
+        """
+        if path_store is None:
+            path_store = os.path.join(PathManager().data_dir, 'amazon_data', 'tracker')
+        self.path_store = path_store
+        self.store = DeltaSnapshotStore(
+            os.path.join(path_store, 'series'),
+            key_columns=['marketplace', 'asin'],
+            value_columns=self.value_columns
+        )
+        self.file_watchlist = os.path.join(path_store, 'watchlist.csv')
+        self.watchlist = self._load_watchlist()
+
+    # -----------------------------
+    # 关注列表
+    # -----------------------------
+    def _load_watchlist(self) -> pd.DataFrame:
+        if not os.path.exists(self.file_watchlist):
+            return pd.DataFrame(columns=self.watch_columns).set_index(['marketplace', 'asin'])
+        df = pd.read_csv(self.file_watchlist)
+        df['last_observed'] = pd.to_datetime(df['last_observed'], format='mixed')
+        df['watched'] = df['watched'].astype(bool)
+        return df.set_index(['marketplace', 'asin'])
+
+    def _save_watchlist(self):
+        file_tmp = self.file_watchlist + '.tmp'
+        self.watchlist.reset_index().to_csv(file_tmp, index=False, encoding='utf-8-sig')
+        os.replace(file_tmp, self.file_watchlist)
+
+    def _upsert_watchlist(self, df: pd.DataFrame):
+        """以 (marketplace, asin) 为键更新关注列表，df 中为空的字段不覆盖已有值"""
+        df = df.set_index(['marketplace', 'asin']).reindex(columns=self.watch_columns[2:])
+        df = df[~df.index.duplicated(keep='last')]
+        merged = df.combine_first(self.watchlist) if len(self.watchlist) else df
+        merged['watched'] = merged['watched'].fillna(False).astype(bool)
+        merged['last_observed'] = pd.to_datetime(merged['last_observed'])
+        self.watchlist = merged[self.watch_columns[2:]]
+        self._save_watchlist()
+
+    def watch(
+            self,
+            asins: Sequence[str],
+            marketplace: str = 'com',
+            category: Optional[str] = None,
+            interval_hours: float = 24
+    ):
+        """
+        将 ASIN 加入关注列表，按 interval_hours 定期重新观测
+        :param asins: ASIN 列表
+        :param marketplace: 站点
+        :param category: 类目 (可选)
+        :param interval_hours: 观测间隔 (小时)
+        """
+        df = pd.DataFrame({
+            'marketplace': marketplace,
+            'asin': list(asins),
+            'category': category,
+            'watched': True,
+            'interval_hours': interval_hours,
+        })
+        self._upsert_watchlist(df)
+
+    def unwatch(self, asins: Sequence[str], marketplace: str = 'com'):
+        """取消关注 (历史数据保留)"""
+        index = pd.MultiIndex.from_product([[marketplace], list(asins)])
+        index = index.intersection(self.watchlist.index)
+        self.watchlist.loc[index, 'watched'] = False
+        self._save_watchlist()
+
+    def due(self, now: Optional[str] = None) -> pd.DataFrame:
+        """
+        返回已到期、需要重新观测的关注 ASIN
+        :param now: 当前时间，默认 pd.Timestamp.now()
+        """
+        now = pd.Timestamp(now) if now else pd.Timestamp.now()
+        df = self.watchlist[self.watchlist['watched'].astype(bool)]
+        next_time = df['last_observed'] + pd.to_timedelta(df['interval_hours'], unit='h')
+        mask = df['last_observed'].isna() | (next_time <= now)
+        return df[mask.to_numpy()].reset_index()
+
+    # -----------------------------
+    # 记录观测
+    # -----------------------------
+    def record(
+            self,
+            products: Union[List[Dict], pd.DataFrame],
+            marketplace: Optional[str] = None,
+            category: Optional[str] = None,
+            captured_at: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        记录一批观测 (search_by_query / search_batch / get_products 的结果)
+        :param products: 商品记录，需包含 asin，可包含 marketplace、query
+        :param marketplace: 站点，记录中没有 marketplace 列时使用
+        :param category: 类目，默认使用记录中的 category 或 query 列
+        :param captured_at: 观测时间，默认使用记录中的 captured_at 或当前时间
+        :return: 分段文件路径
+        """
+        df = pd.DataFrame(products)
+        if df.empty:
+            return None
+        df = df[df['asin'].notna() & (df['asin'] != '')].copy()
+        if 'marketplace' not in df.columns:
+            df['marketplace'] = marketplace or 'com'
+        if category is not None:
+            df['category'] = category
+        elif 'category' not in df.columns:
+            df['category'] = df['query'] if 'query' in df.columns else None
+        if 'title' not in df.columns:
+            df['title'] = None
+        if 'captured_at' not in df.columns:
+            df['captured_at'] = pd.Timestamp(captured_at) if captured_at else pd.Timestamp.now()
+        df['captured_at'] = pd.to_datetime(df['captured_at'])
+        # 价格/评论数可能是带千分位或币种符号的文本，按站点的小数点符号解析 ("9,99 €" -> 9.99)
+        decimal = decimal_separators(df['marketplace'])
+        for col in self.value_columns:
+            if col not in df.columns:
+                df[col] = np.nan
+            else:
+                df[col] = parse_numbers(df[col], decimal)
+
+        file_seg = self.store.append(df)
+        # 更新关注列表中的类目、标题与上次观测时间 (不改变是否关注)
+        df_meta = df.groupby(['marketplace', 'asin'], as_index=False).agg(
+            category=('category', 'last'),
+            title=('title', 'last'),
+            last_observed=('captured_at', 'max'),
+        )
+        self._upsert_watchlist(df_meta)
+        print(f'[INFO] 已记录 {len(df)} 条 ASIN 观测')
+        return file_seg
+
+    def observe_due(self, amazon_utils, now: Optional[str] = None) -> int:
+        """
+        重新观测所有到期的关注 ASIN
+        :param amazon_utils: AmazonUtils 实例 (使用其 ASIN 缓存与刷新队列)
+        :return: 观测到的 ASIN 数
+        """
+        df_due = self.due(now)
+        n = 0
+        for marketplace, df_market in df_due.groupby('marketplace'):
+            products = amazon_utils.get_products(df_market['asin'].tolist(), country_code=marketplace)
+            records = [
+                dict(item, captured_at=pd.Timestamp(item['fetched_at'], unit='s'))
+                for item in products.values()
+                if not item.get('stale')
+            ]
+            self.record(records, marketplace=marketplace)
+            n += len(records)
+        return n
+
+    # -----------------------------
+    # 向量化查询
+    # -----------------------------
+    def load(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """读取 [start, end] 内的全部观测，附带类目"""
+        df = self.store.load(start, end)
+        categories = self.watchlist['category']
+        index = pd.MultiIndex.from_arrays([df['marketplace'], df['asin']])
+        df['category'] = categories.reindex(index).to_numpy()
+        return df
+
+    @staticmethod
+    def _group_bounds(df: pd.DataFrame):
+        """按 (marketplace, asin) 的组边界，返回每组首行与末行位置 (df 已按 键 -> 时间 排序)"""
+        marketplace = df['marketplace'].to_numpy()
+        asin = df['asin'].to_numpy()
+        starts = np.ones(len(df), dtype=bool)
+        starts[1:] = (marketplace[1:] != marketplace[:-1]) | (asin[1:] != asin[:-1])
+        first = np.flatnonzero(starts)
+        last = np.append(first[1:] - 1, len(df) - 1)
+        return first, last
+
+    def latest(self) -> pd.DataFrame:
+        """每个 ASIN 最近一次观测"""
+        df = self.load()
+        if df.empty:
+            return df
+        _, last = self._group_bounds(df)
+        return df.iloc[last].reset_index(drop=True)
+
+    def price_percentiles(
+            self,
+            percentiles: Sequence[float] = (10, 25, 50, 75, 90),
+            by: Union[str, List[str]] = 'category'
+    ) -> pd.DataFrame:
+        """
+        按类目 (或其它字段) 统计最新价格的分位数
+        :param percentiles: 分位数 (0-100)
+        :param by: 分组字段，默认 category，可为 ['marketplace', 'category']
+        """
+        df = self.latest()
+        columns = [f'p{int(p)}' for p in percentiles]
+        if not df.empty:
+            df = df[df['price'].notna()]
+        if df.empty:
+            # 没有任何有效价格时返回带输出列的空表
+            by_cols = [by] if isinstance(by, str) else list(by)
+            return pd.DataFrame(columns=by_cols + columns + ['asins'])
+        q = [p / 100 for p in percentiles]
+        result = df.groupby(by)['price'].quantile(q).unstack()
+        result.columns = columns
+        result['asins'] = df.groupby(by).size()
+        return result.reset_index()
+
+    def review_velocity(self, days: int = 30, now: Optional[str] = None) -> pd.DataFrame:
+        """
+        最近 days 天内每个 ASIN 的评论增速与价格变化
+        :param days: 时间窗口 (天)
+        :param now: 窗口结束时间，默认当前时间
+        :return: DataFrame，每个 ASIN 一行：评论增量、日均新增评论、价格变化
+        """
+        end = pd.Timestamp(now) if now else pd.Timestamp.now()
+        df = self.load(start=end - pd.Timedelta(days=days), end=end)
+        if df.empty:
+            return df
+        first, last = self._group_bounds(df)
+        ts = df['captured_at'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+        span_days = (ts[last] - ts[first]) / 86400.0
+        reviews = df['reviews_count'].to_numpy()
+        price = df['price'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reviews_per_day = np.where(span_days > 0, (reviews[last] - reviews[first]) / span_days, np.nan)
+        return pd.DataFrame({
+            'marketplace': df['marketplace'].to_numpy()[first],
+            'asin': df['asin'].to_numpy()[first],
+            'category': df['category'].to_numpy()[first],
+            'observations': last - first + 1,
+            'days': span_days,
+            'reviews_count': reviews[last],
+            'reviews_delta': reviews[last] - reviews[first],
+            'reviews_per_day': reviews_per_day,
+            'price': price[last],
+            'price_change': price[last] - price[first],
+        })
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    from source.product_research.amazon_script import AmazonUtils
+
+    amazon_utils = AmazonUtils()
+    tracker = AmazonPriceTracker()
+    # 1. 记录一次批量搜索的结果 (query 作为类目)
+    df_search = amazon_utils.search_batch(queries=['mini fan', 'neck fan'], country_codes=['com'])
+    tracker.record(df_search)
+    # 2. 关注评论数最多的 ASIN，每 12 小时观测一次
+    top = df_search.sort_values('reviews_count', ascending=False).head(50)
+    tracker.watch(top['asin'], marketplace='com', interval_hours=12)
+    tracker.observe_due(amazon_utils)
+    # 3. 查询
+    print(tracker.price_percentiles())
+    print(tracker.review_velocity(days=30).sort_values('reviews_per_day', ascending=False).head(20))
@@ -0,0 +1,262 @@
+'''
+@Desc:   跨平台相似商品聚类 (Amazon + Shopee)
+         同一工厂产品常以略有不同的标题在多个平台/店铺重复上架，
+         本模块用 MinHash + LSH 在近似线性时间内把相似标题归为同一簇：
+           1. 标题分词 (单词 + 相邻双词)，每个词哈希为 32 位整数
+           2. 向量化计算 MinHash 签名
+           3. LSH 分桶：同一桶内的商品两两为候选对，按签名估计的 Jaccard 相似度过滤
+           4. 候选对做连通分量，得到簇编号
+         最后把价格统一换算为同一币种，输出每个簇的最低价/中位价，用于评估真实竞争深度
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import re
+import zlib
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from source.utils.paths import PathManager
+from source.utils.number_parser import decimal_separators, parse_numbers
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+# Amazon 站点对应币种 (amzpy 返回的 currency 多为货币符号，无法区分 USD/AUD 等)
+AMAZON_MARKET_CURRENCY = {
+    'com': 'USD',
+    'ca': 'CAD',
+    'com.mx': 'MXN',
+    'com.br': 'BRL',
+    'co.uk': 'GBP',
+    'de': 'EUR',
+    'fr': 'EUR',
+    'it': 'EUR',
+    'es': 'EUR',
+    'nl': 'EUR',
+    'com.au': 'AUD',
+    'co.jp': 'JPY',
+    'in': 'INR',
+    'sg': 'SGD',
+    'ae': 'AED',
+    'sa': 'SAR',
+    'se': 'SEK',
+    'pl': 'PLN',
+    'be': 'EUR',
+    'com.be': 'EUR',
+    'com.tr': 'TRY',
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(title: str) -> List[str]:
+    """标题分词：小写单词 + 相邻双词"""
+    words = _TOKEN_RE.findall(str(title).lower())
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+class ListingClusterer:
+    def __init__(
+            self,
+            num_perm: int = 64,
+            bands: int = 16,
+            threshold: float = 0.5,
+            seed: int = 42
+    ):
+        """
+        :param num_perm: MinHash 签名长度
+        :param bands: LSH 分段数 (num_perm 需能被 bands 整除)
+                      同一段完全一致即成为候选对，bands 越多召回越高
+        :param threshold: 估计 Jaccard 相似度阈值，低于该值的候选对丢弃
+        :param seed: 随机种子，保证多次运行签名一致
+        """
+        if num_perm % bands:
+            raise ValueError('num_perm 必须能被 bands 整除')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.default_rng(seed)
+        # multiply-shift 哈希族：h(x) = ((a * x + b) mod 2^64) >> 32，a 取奇数
+        # uint64 运算天然按 2^64 回绕，比取模快得多
+        self._a = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, titles, chunk: int = 16) -> np.ndarray:
+        """
+        计算 MinHash 签名
+        :param titles: 标题序列
+        :param chunk: 每次并行计算的哈希函数个数 (控制内存)
+        :return: (n, num_perm) uint32 数组
+        """
+        token_hashes = []
+        lengths = np.empty(len(titles), dtype=np.int64)
+        for i, title in enumerate(titles):
+            # 空标题给一个唯一的占位词，避免与其它空标题聚在一起
+            tokens = set(tokenize(title)) or {f'__empty_{i}'}
+            token_hashes.extend(zlib.crc32(t.encode('utf-8')) for t in tokens)
+            lengths[i] = len(tokens)
+        x = np.asarray(token_hashes, dtype=np.uint64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        sig = np.empty((len(titles), self.num_perm), dtype=np.uint32)
+        for start in range(0, self.num_perm, chunk):
+            a = self._a[start:start + chunk]
+            b = self._b[start:start + chunk]
+            h = ((x[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)
+            # 每个标题的词在 x 中连续存放，按段取最小值
+            sig[:, start:start + chunk] = np.minimum.reduceat(h, offsets, axis=0)
+        return sig
+
+    def _candidate_pairs(self, sig: np.ndarray) -> np.ndarray:
+        """LSH 分桶，返回相似度达到阈值的候选对 (m, 2)"""
+        n = len(sig)
+        # 签名完全相同 (标题相同) 的商品直接连到第一次出现的那个，桶内只比较不同的签名，避免大桶两两组合
+        _, first, inverse = np.unique(sig, axis=0, return_index=True, return_inverse=True)
+        head = first[inverse.ravel()]
+        dup = head != np.arange(n)
+        rep = np.sort(first)
+        sub = sig[rep]
+        m = len(rep)
+
+        candidates = []
+        for band in range(self.bands):
+            cols = sub[:, band * self.rows:(band + 1) * self.rows]
+            # 将一段签名合并为一个 64 位桶键 (溢出回绕不影响相等性判断)
+            key = np.zeros(m, dtype=np.uint64)
+            for j in range(self.rows):
+                key = key * np.uint64(1000003) ^ cols[:, j].astype(np.uint64)
+            order = np.argsort(key, kind='stable')
+            sorted_key = key[order]
+            starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+            ends = np.repeat(np.append(starts[1:], m), np.diff(np.append(starts, m)))
+            # 同桶内两两组合：排序后位置 p 与 p+1 .. 桶末尾配对
+            # (只连相邻成员时，夹在两个相似商品之间的不相似商品会切断它们)
+            counts = ends - np.arange(m) - 1
+            left = np.repeat(np.arange(m), counts)
+            right = left + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            candidates.append(np.stack([order[left], order[right]], axis=1))
+        pairs = np.unique(np.sort(np.concatenate(candidates), axis=1), axis=0)
+        if len(pairs):
+            similarity = (sub[pairs[:, 0]] == sub[pairs[:, 1]]).mean(axis=1)
+            pairs = rep[pairs[similarity >= self.threshold]]
+        return np.concatenate([np.stack([head[dup], np.flatnonzero(dup)], axis=1), pairs.reshape(-1, 2)])
+
+    @staticmethod
+    def _connected_components(n: int, pairs: np.ndarray) -> np.ndarray:
+        """向量化标签传播求连通分量，返回每个节点的簇编号 (0..k-1)"""
+        labels = np.arange(n)
+        if len(pairs):
+            u, v = pairs[:, 0], pairs[:, 1]
+            while True:
+                low = np.minimum(labels[u], labels[v])
+                new = labels.copy()
+                np.minimum.at(new, u, low)
+                np.minimum.at(new, v, low)
+                # 指针跳跃，加速收敛
+                new = new[new]
+                if np.array_equal(new, labels):
+                    break
+                labels = new
+        return np.unique(labels, return_inverse=True)[1]
+
+    def cluster(self, titles) -> np.ndarray:
+        """
+        对标题聚类
+        :return: 每个标题的簇编号
+        """
+        titles = list(titles)
+        if not titles:
+            return np.empty(0, dtype=np.int64)
+        sig = self.signatures(titles)
+        pairs = self._candidate_pairs(sig)
+        return self._connected_components(len(titles), pairs)
+
+
+def normalize_amazon(df: pd.DataFrame, marketplace: Optional[str] = None) -> pd.DataFrame:
+    """
+    将 Amazon 结果 (search_by_query CSV / search_batch) 转为统一格式
+    :param marketplace: 站点，记录中没有 marketplace 列时使用
+    """
+    market = df['marketplace'] if 'marketplace' in df.columns else pd.Series(marketplace or 'com', index=df.index)
+    out = pd.DataFrame({
+        'platform': 'amazon',
+        'market': market,
+        'listing_id': df['asin'].astype(str),
+        'title': df['title'],
+        # 按站点的小数点符号解析，de/fr/it/es 的 "9,99 €" 为 9.99 而不是 999
+        'price': parse_numbers(df['price'], decimal_separators(market)),
+    })
+    out['currency'] = out['market'].astype(str).str.lower().map(AMAZON_MARKET_CURRENCY)
+    unknown = out.loc[out['currency'].isna(), 'market'].unique()
+    if len(unknown):
+        print(f'[WARN] 未知的 Amazon 站点 {list(unknown)}，价格无法换算')
+    return out
+
+
+def normalize_shopee(df: pd.DataFrame) -> pd.DataFrame:
+    """将 ShopeeScraper 结果转为统一格式"""
+    region = df['region'] if 'region' in df.columns else pd.Series(None, index=df.index)
+    return pd.DataFrame({
+        'platform': 'shopee',
+        'market': region,
+        'listing_id': df['itemid'].astype(str) + '_' + df['shopid'].astype(str),
+        'title': df['title'],
+        'price': pd.to_numeric(df['price'], errors='coerce'),
+        'currency': df['currency'] if 'currency' in df.columns else None,
+    })
+
+
+def cluster_listings(
+        frames: List[pd.DataFrame],
+        target_currency: str = 'USD',
+        clusterer: Optional[ListingClusterer] = None,
+        exchange_manager: Optional[ExchangeRateManager] = None
+):
+    """
+    跨平台聚类并统计每个簇的价格
+    :param frames: 已通过 normalize_amazon / normalize_shopee 统一格式的结果列表
+    :param target_currency: 统一换算的币种
+    :param clusterer: 聚类器，默认 ListingClusterer()
+    :param exchange_manager: 汇率管理器，默认使用共享汇率缓存
+    :return: (listings, clusters)
+             listings: 每条商品附带 cluster_id 与统一币种价格
+             clusters: 每个簇一行：商品数、平台数、站点数、最低价、中位价、示例标题
+    """
+    clusterer = clusterer or ListingClusterer()
+    exchange_manager = exchange_manager or ExchangeRateManager()
+
+    listings = pd.concat(frames, ignore_index=True)
+    listings['cluster_id'] = clusterer.cluster(listings['title'].fillna(''))
+
+    # 每个币种只查一次汇率：外币 -> CNY -> 目标币种
+    to_target = {}
+    target_per_cny = exchange_manager.convert_from_cny(1.0, target_currency)
+    for currency in listings['currency'].dropna().unique():
+        cny = exchange_manager.convert_to_cny(1.0, currency)
+        if cny is not None and target_per_cny is not None:
+            to_target[currency] = cny * target_per_cny
+    price_col = f'price_{target_currency}'
+    listings[price_col] = listings['price'] * listings['currency'].map(to_target)
+
+    clusters = listings.groupby('cluster_id').agg(
+        listings=('listing_id', 'size'),
+        platforms=('platform', 'nunique'),
+        markets=('market', 'nunique'),
+        min_price=(price_col, 'min'),
+        median_price=(price_col, 'median'),
+        sample_title=('title', 'first'),
+    ).reset_index().sort_values('listings', ascending=False)
+    return listings, clusters
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    pm = PathManager()
+    df_amazon = pd.read_csv(os.path.join(pm.data_dir, 'amazon_data', 'amazon_products_mini_fan.csv'))
+    df_shopee = pd.read_csv('shopee_drone.csv')
+    df_listings, df_clusters = cluster_listings(
+        [normalize_amazon(df_amazon, marketplace='com'), normalize_shopee(df_shopee)],
+        target_currency='USD'
+    )
+    print(df_clusters.head(20))
@@ -4,9 +4,137 @@
 @Time:   2025/9/22
 '''
 
+import asyncio
+import os
+import time
 import requests
 import csv
-from typing import List, Dict
+from typing import List, Dict, Optional, Set, Tuple
+
+import aiohttp
+
+from source.utils.http_retry import get_json_with_retry
+
+# 各站点域名与结算币种
+SHOPEE_REGIONS = {
+    "SG": {"domain": "shopee.sg", "currency": "SGD"},
+    "MY": {"domain": "shopee.com.my", "currency": "MYR"},
+    "TH": {"domain": "shopee.co.th", "currency": "THB"},
+    "PH": {"domain": "shopee.ph", "currency": "PHP"},
+    "VN": {"domain": "shopee.vn", "currency": "VND"},
+    "BR": {"domain": "shopee.com.br", "currency": "BRL"},
+}
+
+
+class AsyncRateLimiter:
+    """
+    异步限速器：保证同一站点相邻两次请求的发起间隔不小于 1 / rate 秒
+    """
+
+    def __init__(self, rate: float):
+        """
+        :param rate: 每秒最多发起的请求数，<= 0 表示不限速
+        """
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = asyncio.Lock()
+        self._next_time = 0.0
+
+    async def wait(self):
+        """等待直到允许发起下一次请求"""
+        if self.interval <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ShopeeStreamWriter:
+    """
+    流式输出：每页结果到达后立即去重并写入文件
+      - csv: 追加写入单个文件，每页写完后 flush + fsync
+      - parquet: 每页写一个分片文件 (part-xxxxx.parquet)，目录即数据集
+    程序中途崩溃时，已经写入的页面不会丢失
+    """
+
+    # parquet 字段类型，保证各分片 schema 一致
+    parquet_types = {
+        "region": "string",
+        "currency": "string",
+        "keyword": "string",
+        "itemid": "int64",
+        "shopid": "int64",
+        "title": "string",
+        "price": "float64",
+        "sold": "int64",
+        "rating": "float64",
+        "rating_count": "int64",
+    }
+
+    def __init__(self, filename: str, fieldnames: List[str], file_format: str = "csv"):
+        """
+        :param filename: csv 文件路径，或 parquet 数据集目录
+        :param fieldnames: 输出字段
+        :param file_format: 'csv' 或 'parquet'
+        """
+        if file_format not in ("csv", "parquet"):
+            raise ValueError(f"不支持的输出格式: {file_format}")
+        self.filename = filename
+        self.fieldnames = fieldnames
+        self.file_format = file_format
+        self.rows_written = 0
+        self._part = 0
+        self._file = None
+        self._writer = None
+        if file_format == "csv":
+            self._file = open(filename, "w", newline="", encoding="utf-8-sig")
+            self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction="ignore")
+            self._writer.writeheader()
+            self._file.flush()
+        else:
+            import pyarrow as pa
+            os.makedirs(filename, exist_ok=True)
+            # 与 csv 的 "w" 模式一致：清除上一次运行留下的分片，避免新旧数据混在同一个数据集中
+            for name in os.listdir(filename):
+                if name.startswith("part-") and name.endswith((".parquet", ".parquet.tmp")):
+                    os.remove(os.path.join(filename, name))
+            self._schema = pa.schema([
+                (name, getattr(pa, self.parquet_types.get(name, "string"))())
+                for name in fieldnames
+            ])
+
+    def write(self, items: List[Dict]):
+        """写入一页 (已去重的) 商品数据"""
+        if not items:
+            return
+        if self.file_format == "csv":
+            self._writer.writerows(items)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            columns = {name: [item.get(name) for item in items] for name in self.fieldnames}
+            table = pa.table(columns, schema=self._schema)
+            file_part = os.path.join(self.filename, f"part-{self._part:05d}.parquet")
+            # 先写临时文件再重命名，避免留下不完整的分片
+            pq.write_table(table, file_part + ".tmp")
+            os.replace(file_part + ".tmp", file_part)
+            self._part += 1
+        self.rows_written += len(items)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 
 class ShopeeScraper:
@@ -16,66 +144,241 @@ class ShopeeScraper:
       - 根据关键词搜索商品
       - 获取商品ID, 店铺ID, 标题, 价格, 销量, 评分, 评价数
       - 支持翻页
-      - 保存结果到CSV
+      - 支持 asyncio 并发模式 (连接池复用 + 并发翻页/多关键词 + 失败重试)
+      - 支持多站点 (SG/MY/TH/PH/VN/BR) 并行爬取，每个站点独立限速与 Cookie
+      - 按 itemid + shopid 去重，保存结果到CSV，或边爬边写入 CSV/Parquet
     """
 
-    def __init__(self, keyword: str, pages: int = 1):
+    def __init__(
+            self,
+            keyword: str,
+            pages: int = 1,
+            keywords: Optional[List[str]] = None,
+            concurrency: int = 8,
+            max_retries: int = 3,
+            backoff: float = 0.5,
+            regions: Optional[List[str]] = None,
+            rate_limit: float = 20.0,
+            output: Optional[str] = None,
+            output_format: str = "csv",
+            keep_results: Optional[bool] = None
+    ):
         """
         初始化爬虫
         :param keyword: 搜索关键词 (例如 "drone")
         :param pages: 爬取的页数 (每页50条商品数据)
+        :param keywords: 额外的关键词列表 (并发模式下与 keyword 一起爬取)
+        :param concurrency: 并发模式下同一主机的最大并发请求数
+        :param max_retries: 临时性失败 (超时/429/5xx) 的最大重试次数
+        :param backoff: 指数退避的基础等待时间 (秒)
+        :param regions: 站点列表 (例如 ["SG", "MY"]，见 SHOPEE_REGIONS)，默认仅爬取 shopee.com
+        :param rate_limit: 并发模式下每个站点每秒最多发起的请求数，默认 20：
+                           20 个关键词 x 10 页 (200 次请求) 每个站点约 10 秒完成，各站点并行；
+                           遇到 429 时调低 (<= 0 表示不限速)
+        :param output: 流式输出路径 (csv 文件或 parquet 目录)，为 None 时不流式输出
+        :param output_format: 流式输出格式，'csv' 或 'parquet'
+        :param keep_results: 是否在内存中保留结果，默认在流式输出时不保留以控制内存
         """
         self.keyword = keyword
         self.pages = pages
+        self.keywords = [keyword] + [k for k in (keywords or []) if k != keyword]
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limit = rate_limit
+        self.regions = [r.upper() for r in regions] if regions else []
+        for region in self.regions:
+            if region not in SHOPEE_REGIONS:
+                raise ValueError(f"不支持的 Shopee 站点: {region}")
         self.base_url = "https://shopee.com/api/v4/search/search_items"
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
                           "AppleWebKit/537.36 (KHTML, like Gecko)"
                           "Chrome/140.0.0.0 Safari/537.36"
         }
+        self.fieldnames = ["region", "currency", "keyword", "itemid", "shopid", "title", "price", "sold", "rating", "rating_count"]
+        self.output = output
+        self.output_format = output_format
+        self.keep_results = output is None if keep_results is None else keep_results
         self.results: List[Dict] = []
+        # 本次爬取中已输出的 (itemid, shopid)，用于跨页/跨关键词去重，每次爬取开始时重置
+        self._seen: Set[Tuple] = set()
+        self._writer: Optional[ShopeeStreamWriter] = None
+
+    def _build_params(self, keyword: str, page: int) -> Dict:
+        """构造搜索接口的请求参数"""
+        return {
+            "by": "relevancy",
+            "keyword": keyword,
+            "limit": 50,           # 每页最大50个
+            "newest": page * 50    # 翻页偏移量
+        }
+
+    def _region_url(self, region: Optional[str]) -> str:
+        """返回站点对应的搜索接口地址，region 为 None 时使用 base_url"""
+        if region is None:
+            return self.base_url
+        return f"https://{SHOPEE_REGIONS[region]['domain']}/api/v4/search/search_items"
+
+    def _parse_items(self, data: Dict, keyword: str, region: Optional[str] = None) -> List[Dict]:
+        """将接口返回的 JSON 解析为商品字典列表，并标记站点与币种"""
+        currency = SHOPEE_REGIONS[region]["currency"] if region else None
+        items = []
+        for item in data.get("items") or []:
+            info = item.get("item_basic", {})
+            items.append({
+                "region": region,
+                "currency": info.get("currency") or currency,
+                "keyword": keyword,
+                "itemid": info.get("itemid"),
+                "shopid": info.get("shopid"),
+                "title": info.get("name"),
+                "price": info.get("price", 0) / 100000,  # Shopee价格存储需要除以100000
+                "sold": info.get("historical_sold", 0),
+                "rating": info.get("item_rating", {}).get("rating_star", 0),
+                "rating_count": sum(info.get("item_rating", {}).get("rating_count", []))
+            })
+        return items
+
+    def _open_writer(self):
+        """开始一次爬取：重置去重集合，并按需开启流式输出"""
+        self._seen = set()
+        if self.output is not None and self._writer is None:
+            self._writer = ShopeeStreamWriter(self.output, self.fieldnames, self.output_format)
+
+    def _close_writer(self):
+        """关闭流式输出"""
+        if self._writer is not None:
+            self._writer.close()
+            print(f"[INFO] 已流式写入 {self._writer.rows_written} 条商品数据到 {self.output}")
+            self._writer = None
+
+    def _emit(self, items: List[Dict]):
+        """
+        处理一页结果：按 (itemid, shopid) 去重 (相邻页、不同关键词常有重叠商品)，
+        流式输出时写入文件，并按需保留在内存中
+        """
+        unique = []
+        for item in items:
+            key = (item["itemid"], item["shopid"])
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            unique.append(item)
+        if self._writer is not None:
+            self._writer.write(unique)
+        if self.keep_results:
+            self.results.extend(unique)
 
     def scrape(self) -> List[Dict]:
         """
         执行爬取操作
         :return: 商品信息列表 (字典形式)
         """
-        for page in range(self.pages):
-            params = {
-                "by": "relevancy",
-                "keyword": self.keyword,
-                "limit": 50,           # 每页最大50个
-                "newest": page * 50    # 翻页偏移量
-            }
-
-            try:
-                response = requests.get(self.base_url, params=params, headers=self.headers, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-
-                for item in data.get("items", []):
-                    info = item.get("item_basic", {})
-                    self.results.append({
-                        "itemid": info.get("itemid"),
-                        "shopid": info.get("shopid"),
-                        "title": info.get("name"),
-                        "price": info.get("price", 0) / 100000,  # Shopee价格存储需要除以100000
-                        "sold": info.get("historical_sold", 0),
-                        "rating": info.get("item_rating", {}).get("rating_star", 0),
-                        "rating_count": sum(info.get("item_rating", {}).get("rating_count", []))
-                    })
-
-            except Exception as e:
-                print(f"第 {page+1} 页抓取失败: {e}")
+        self._open_writer()
+        try:
+            for region in self.regions or [None]:
+                url = self._region_url(region)
+                for page in range(self.pages):
+                    params = self._build_params(self.keyword, page)
+
+                    try:
+                        response = requests.get(url, params=params, headers=self.headers, timeout=10)
+                        response.raise_for_status()
+                        data = response.json()
+                        self._emit(self._parse_items(data, self.keyword, region))
+
+                    except Exception as e:
+                        print(f"第 {page+1} 页抓取失败: {e}")
+        finally:
+            self._close_writer()
+
+        return self.results
+
+    # -----------------------------
+    # asyncio 并发模式
+    # -----------------------------
+    async def _fetch_page(
+            self,
+            session: aiohttp.ClientSession,
+            semaphore: asyncio.Semaphore,
+            limiter: AsyncRateLimiter,
+            region: Optional[str],
+            keyword: str,
+            page: int
+    ) -> List[Dict]:
+        """
+        并发抓取单页，临时性失败按指数退避重试
+        :return: 该页商品列表，最终失败时返回空列表
+        """
+        tag = f"[{region}/{keyword}] 第 {page+1} 页" if region else f"[{keyword}] 第 {page+1} 页"
+        data = await get_json_with_retry(
+            session, self._region_url(region), self._build_params(keyword, page), semaphore, limiter,
+            max_retries=self.max_retries, backoff=self.backoff, tag=tag
+        )
+        if data is None:
+            return []
+        return self._parse_items(data, keyword, region)
 
+    async def _scrape_region(self, region: Optional[str]):
+        """
+        爬取单个站点的所有关键词、所有页，每页完成后立即输出
+        - 每个站点独立的 ClientSession (连接池 + Cookie) 与限速器
+        - 每个站点的并发数由 concurrency 限制
+        :param region: 站点代码，None 表示 base_url
+        """
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=10)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = AsyncRateLimiter(self.rate_limit)
+        async with aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers=self.headers,
+                cookie_jar=aiohttp.CookieJar()
+        ) as session:
+            tasks = [
+                self._fetch_page(session, semaphore, limiter, region, keyword, page)
+                for keyword in self.keywords
+                for page in range(self.pages)
+            ]
+            for task in asyncio.as_completed(tasks):
+                self._emit(await task)
+
+    async def scrape_async(self) -> List[Dict]:
+        """
+        asyncio 并发爬取所有站点、所有关键词的所有页
+        各站点并行执行，总耗时取决于最慢的站点而非各站点耗时之和
+        :return: 商品信息列表 (字典形式)
+        """
+        regions = self.regions or [None]
+        self._open_writer()
+        try:
+            await asyncio.gather(*[self._scrape_region(r) for r in regions])
+        finally:
+            self._close_writer()
         return self.results
 
+    def scrape_concurrent(self) -> List[Dict]:
+        """
+        scrape_async 的同步入口，适合在普通脚本中调用
+        :return: 商品信息列表 (字典形式)
+        """
+        return asyncio.run(self.scrape_async())
+
     def save_to_csv(self, filename: str = None):
         """
         将爬取结果保存到CSV文件
         :param filename: 保存文件名 (默认为 'shopee_{keyword}.csv')
         """
         if not self.results:
+            if self.output is not None:
+                print(f"结果已流式写入 {self.output}，无需再次保存。")
+                return
             print("没有数据可保存，请先执行 scrape() 方法。")
             return
 
@@ -85,7 +388,7 @@ class ShopeeScraper:
         with open(filename, "w", newline="", encoding="utf-8-sig") as f:
             writer = csv.DictWriter(
                 f,
-                fieldnames=["itemid", "shopid", "title", "price", "sold", "rating", "rating_count"]
+                fieldnames=self.fieldnames
             )
             writer.writeheader()
             writer.writerows(self.results)
@@ -95,7 +398,22 @@ class ShopeeScraper:
 
 # ========== 使用示例 ==========
 if __name__ == "__main__":
-    scraper = ShopeeScraper(keyword="drone", pages=2)  # 搜索 "drone"，抓取2页
-    products = scraper.scrape()
-    print(f"共获取 {len(products)} 条商品数据")
-    scraper.save_to_csv()
+    # 是否使用并发模式
+    bool_concurrent = False
+
+    if bool_concurrent:
+        # 并发爬取多个站点、多个关键词，每个关键词10页，边爬边写入 parquet 数据集
+        scraper = ShopeeScraper(
+            keyword="drone",
+            pages=10,
+            keywords=["mini fan", "power bank"],
+            regions=["SG", "MY", "TH", "PH", "VN", "BR"],
+            output="shopee_drone_parquet",
+            output_format="parquet"
+        )
+        scraper.scrape_concurrent()
+    else:
+        scraper = ShopeeScraper(keyword="drone", pages=2)  # 搜索 "drone"，抓取2页
+        products = scraper.scrape()
+        print(f"共获取 {len(products)} 条商品数据")
+        scraper.save_to_csv()
@@ -0,0 +1,189 @@
+'''
+@Desc:   Shopee 店铺信息补充
+         对商品结果中的 shopid 去重后并发获取店铺详情 (粉丝数、回复率、所在地、是否官方店铺)，
+         店铺详情缓存在本地磁盘 (带过期时间)，每次运行每个店铺最多请求一次，
+         最后按 (region, shopid) 合并回商品记录，用于评估竞争强度
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import asyncio
+import aiohttp
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Union
+from source.utils.paths import PathManager
+from source.utils.disk_cache import DiskTTLCache
+from source.utils.http_retry import get_json_with_retry
+from source.product_research.shopee import SHOPEE_REGIONS, AsyncRateLimiter
+
+
+class ShopeeShopEnricher:
+    # 合并到商品记录中的店铺字段
+    shop_fields = [
+        "shop_name",
+        "follower_count",
+        "response_rate",
+        "shop_location",
+        "is_official_shop",
+        "shop_rating",
+    ]
+
+    def __init__(
+            self,
+            ttl_hours: float = 24,
+            concurrency: int = 8,
+            rate_limit: float = 5.0,
+            max_retries: int = 3,
+            backoff: float = 0.5,
+            file_cache: str = None
+    ):
+        """
+        :param ttl_hours: 店铺缓存的有效期 (小时)
+        :param concurrency: 每个站点的最大并发请求数
+        :param rate_limit: 每个站点每秒最多发起的请求数
+        :param max_retries: 临时性失败的最大重试次数
+        :param backoff: 指数退避的基础等待时间 (秒)
+        :param file_cache: 缓存数据库路径，默认为 data/cache/cache.sqlite
+        """
+        if file_cache is None:
+            file_cache = os.path.join(PathManager().data_dir, "cache", "cache.sqlite")
+        self.cache = DiskTTLCache(file_cache, namespace="shopee_shop", ttl_seconds=ttl_hours * 3600)
+        self.concurrency = concurrency
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+                          "AppleWebKit/537.36 (KHTML, like Gecko)"
+                          "Chrome/140.0.0.0 Safari/537.36"
+        }
+
+    @staticmethod
+    def _cache_key(region: Optional[str], shopid) -> str:
+        return f"{region or ''}:{int(shopid)}"
+
+    @staticmethod
+    def _shop_url(region: Optional[str]) -> str:
+        domain = SHOPEE_REGIONS[region]["domain"] if region else "shopee.com"
+        return f"https://{domain}/api/v4/shop/get_shop_detail"
+
+    @staticmethod
+    def _parse_shop(data: Dict) -> Dict:
+        """解析店铺详情接口返回的 JSON"""
+        info = data.get("data") or {}
+        return {
+            "shop_name": info.get("name"),
+            "follower_count": info.get("follower_count"),
+            "response_rate": info.get("response_rate"),
+            "shop_location": info.get("shop_location"),
+            "is_official_shop": info.get("is_official_shop"),
+            "shop_rating": info.get("rating_star"),
+        }
+
+    async def _fetch_shop(
+            self,
+            session: aiohttp.ClientSession,
+            semaphore: asyncio.Semaphore,
+            limiter: AsyncRateLimiter,
+            region: Optional[str],
+            shopid: int
+    ) -> Optional[Dict]:
+        """获取单个店铺详情，临时性失败按指数退避重试"""
+        data = await get_json_with_retry(
+            session, self._shop_url(region), {"shopid": shopid}, semaphore, limiter,
+            max_retries=self.max_retries, backoff=self.backoff, tag=f"店铺 {region}/{shopid}"
+        )
+        if data is None:
+            return None
+        return self._parse_shop(data)
+
+    async def _fetch_region(self, region: Optional[str], shopids: List[int]) -> Dict[str, Dict]:
+        """并发获取同一站点的一批店铺"""
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=10)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = AsyncRateLimiter(self.rate_limit)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers) as session:
+            shops = await asyncio.gather(*[
+                self._fetch_shop(session, semaphore, limiter, region, shopid)
+                for shopid in shopids
+            ])
+        # 获取失败的店铺不写入缓存，下次运行时重试
+        return {
+            self._cache_key(region, shopid): shop
+            for shopid, shop in zip(shopids, shops)
+            if shop is not None
+        }
+
+    async def fetch_shops_async(self, shops: List[Tuple[Optional[str], int]]) -> Dict[str, Dict]:
+        """
+        获取一批店铺详情：先批量查缓存，仅对缺失或过期的店铺发起请求
+        :param shops: (region, shopid) 列表
+        :return: 缓存键 -> 店铺详情
+        """
+        shops = list(dict.fromkeys((region, int(shopid)) for region, shopid in shops))
+        keys = [self._cache_key(region, shopid) for region, shopid in shops]
+        cached = self.cache.get_many(keys)
+
+        missing: Dict[Optional[str], List[int]] = {}
+        for (region, shopid), key in zip(shops, keys):
+            if key not in cached:
+                missing.setdefault(region, []).append(shopid)
+
+        n_missing = sum(len(v) for v in missing.values())
+        print(f"[INFO] 店铺共 {len(shops)} 个，缓存命中 {len(shops) - n_missing} 个，需请求 {n_missing} 个")
+        if missing:
+            fetched_list = await asyncio.gather(*[
+                self._fetch_region(region, shopids) for region, shopids in missing.items()
+            ])
+            for fetched in fetched_list:
+                self.cache.set_many(fetched)
+                cached.update(fetched)
+        return cached
+
+    async def enrich_async(self, records: Union[List[Dict], pd.DataFrame]) -> pd.DataFrame:
+        """
+        为商品记录补充店铺字段 (在已运行的事件循环中使用，如 Jupyter 或 ShopeeScraper.scrape_async 之后)
+        :param records: ShopeeScraper.results 或同结构的 DataFrame
+        :return: 合并了店铺字段的 DataFrame
+        """
+        df = pd.DataFrame(records)
+        if df.empty:
+            return df
+        if "region" not in df.columns:
+            df["region"] = None
+        regions = df["region"].where(df["region"].notna(), None)
+        shops = [
+            (region, shopid) if pd.notna(shopid) else None
+            for region, shopid in zip(regions, df["shopid"])
+        ]
+        details = await self.fetch_shops_async([s for s in shops if s is not None])
+
+        df_shops = pd.DataFrame([
+            {"_shop_key": key, **{f: shop.get(f) for f in self.shop_fields}}
+            for key, shop in details.items()
+        ], columns=["_shop_key"] + self.shop_fields)
+        df["_shop_key"] = [self._cache_key(*shop) if shop is not None else None for shop in shops]
+        df = df.merge(df_shops, on="_shop_key", how="left")
+        return df.drop(columns=["_shop_key"])
+
+    def enrich(self, records: Union[List[Dict], pd.DataFrame]) -> pd.DataFrame:
+        """
+        enrich_async 的同步入口，适合在普通脚本中调用 (事件循环中请直接 await enrich_async)
+        :param records: ShopeeScraper.results 或同结构的 DataFrame
+        :return: 合并了店铺字段的 DataFrame
+        """
+        return asyncio.run(self.enrich_async(records))
+
+
+# ========== 使用示例 ==========
+if __name__ == "__main__":
+    from source.product_research.shopee import ShopeeScraper
+
+    scraper = ShopeeScraper(keyword="drone", pages=2, regions=["SG", "MY"])
+    products = scraper.scrape_concurrent()
+    enricher = ShopeeShopEnricher(ttl_hours=24)
+    df_products = enricher.enrich(products)
+    df_products.to_csv("shopee_drone_shops.csv", index=False, encoding="utf-8-sig")
+    print(df_products.head())
@@ -0,0 +1,135 @@
+'''
+@Desc:   Shopee 商品快照存储与销售速度分析
+         每次爬取的结果以 (itemid, shopid, captured_at) 为主键写入差分编码的快照库，
+         通过相邻快照的差值计算：
+           - 日均销量 (historical_sold 的增量 / 天数)
+           - 价格变化
+           - 评分漂移
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+from source.utils.paths import PathManager
+from source.utils.delta_store import DeltaSnapshotStore
+
+
+class ShopeeSnapshotStore:
+    # 数值列及其定点缩放倍数 (价格保留 Shopee 原始精度 1e-5)
+    value_columns = {
+        "price": 100000,
+        "sold": 1,
+        "rating": 10000,
+        "rating_count": 1,
+    }
+
+    def __init__(self, path_store: str = None):
+        """
+        :param path_store: 快照库目录，默认为 data/shopee_data/snapshots
+        """
+        if path_store is None:
+            path_store = os.path.join(PathManager().data_dir, "shopee_data", "snapshots")
+        self.store = DeltaSnapshotStore(
+            path_store,
+            key_columns=["itemid", "shopid"],
+            value_columns=self.value_columns
+        )
+
+    def add_snapshot(
+            self,
+            records: Union[List[Dict], pd.DataFrame],
+            captured_at: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        写入一次爬取结果 (ShopeeScraper.results 或同结构的 DataFrame)
+        :param records: 商品记录
+        :param captured_at: 快照时间，默认为当前时间；记录中已有 captured_at 列时以记录为准
+        :return: 分段文件路径
+        """
+        df = pd.DataFrame(records)
+        if df.empty:
+            print("[WARN] 没有可写入的快照数据")
+            return None
+        if "captured_at" not in df.columns:
+            df["captured_at"] = pd.Timestamp(captured_at) if captured_at else pd.Timestamp.now()
+        df = df.dropna(subset=["itemid", "shopid"])
+        df["itemid"] = df["itemid"].astype(np.int64)
+        df["shopid"] = df["shopid"].astype(np.int64)
+        file_seg = self.store.append(df)
+        print(f"[INFO] 已写入 {len(df)} 条快照: {file_seg}")
+        return file_seg
+
+    def load(self, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """读取 [start, end] 时间范围内的全部快照"""
+        return self.store.load(start, end)
+
+    def sales_velocity(
+            self,
+            start: Optional[str] = None,
+            end: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        向量化计算每个商品在时间窗口内的首末快照差值
+        :param start: 起始时间 (含)，可选
+        :param end: 结束时间 (含)，可选
+        :return: DataFrame，每个 (itemid, shopid) 一行：
+                 快照数、天数、日均销量、价格变化 (绝对值/百分比)、评分漂移、评价数增量
+        """
+        df = self.load(start, end)
+        if df.empty:
+            return pd.DataFrame()
+
+        itemid = df["itemid"].to_numpy()
+        shopid = df["shopid"].to_numpy()
+        # load() 已按 键 -> 时间 排序，组边界即键发生变化的位置
+        starts = np.ones(len(df), dtype=bool)
+        starts[1:] = (itemid[1:] != itemid[:-1]) | (shopid[1:] != shopid[:-1])
+        first = np.flatnonzero(starts)
+        last = np.append(first[1:] - 1, len(df) - 1)
+
+        ts = df["captured_at"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+        days = (ts[last] - ts[first]) / 86400.0
+        sold = df["sold"].to_numpy()
+        price = df["price"].to_numpy()
+        rating = df["rating"].to_numpy()
+        rating_count = df["rating_count"].to_numpy()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            units_per_day = np.where(days > 0, (sold[last] - sold[first]) / days, np.nan)
+            price_change_pct = np.where(
+                price[first] > 0,
+                (price[last] - price[first]) / price[first] * 100,
+                np.nan
+            )
+
+        return pd.DataFrame({
+            "itemid": itemid[first],
+            "shopid": shopid[first],
+            "snapshots": last - first + 1,
+            "first_captured_at": df["captured_at"].to_numpy()[first],
+            "last_captured_at": df["captured_at"].to_numpy()[last],
+            "days": days,
+            "sold": sold[last],
+            "units_per_day": units_per_day,
+            "price": price[last],
+            "price_change": price[last] - price[first],
+            "price_change_pct": price_change_pct,
+            "rating": rating[last],
+            "rating_drift": rating[last] - rating[first],
+            "rating_count_delta": rating_count[last] - rating_count[first],
+        })
+
+
+# ========== 使用示例 ==========
+if __name__ == "__main__":
+    from source.product_research.shopee import ShopeeScraper
+
+    # 每次运行写入一份快照，多次运行后即可计算销售速度
+    scraper = ShopeeScraper(keyword="drone", pages=2)
+    snapshot_store = ShopeeSnapshotStore()
+    snapshot_store.add_snapshot(scraper.scrape())
+    df_velocity = snapshot_store.sales_velocity()
+    print(df_velocity.sort_values("units_per_day", ascending=False).head(20))
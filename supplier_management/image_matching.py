@@ -0,0 +1,276 @@
+'''
+@Desc:   供应商图片与平台商品图片匹配
+         1. 对图片库 (ImageStore) 中的每张图片计算 64 位感知哈希 (pHash / dHash)
+         2. 多索引哈希 (Multi-Index Hashing) 支持汉明距离检索：
+            64 位哈希切成 n_chunks 段，若两哈希汉明距离 <= r，
+            则至少有一段的距离 <= r // n_chunks (鸽巢原理)，
+            因此只需在每段的哈希桶中查找候选，再用 popcount 精确校验
+         3. 批量接口：为每张供应商图片 (Alibaba) 返回最相近的 Amazon / Shopee 商品图片
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 8 位 popcount 查表
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount64(x: np.ndarray) -> np.ndarray:
+    """uint64 数组逐元素 popcount"""
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    return _POPCOUNT8[x.view(np.uint8)].reshape(-1, 8).sum(axis=1).reshape(x.shape)
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """n x n 正交 DCT-II 矩阵"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(64, dtype=np.uint64))
+
+
+def _bits_to_uint64(bits: np.ndarray) -> int:
+    """64 个布尔值打包为一个整数 (各位权重互不相同，求和即按位或)"""
+    return int(_BIT_WEIGHTS[bits.ravel()].sum())
+
+
+def phash(im: Image.Image) -> int:
+    """感知哈希：32x32 灰度图做 DCT，取左上 8x8 低频系数与中位数比较"""
+    pixels = np.asarray(im.convert('L').resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT32 @ pixels @ _DCT32.T)[:8, :8]
+    # 中位数不含直流分量 (0, 0)
+    return _bits_to_uint64(low > np.median(low.ravel()[1:]))
+
+
+def dhash(im: Image.Image) -> int:
+    """差值哈希：9x8 灰度图相邻像素比较"""
+    pixels = np.asarray(im.convert('L').resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_uint64(pixels[:, 1:] > pixels[:, :-1])
+
+
+HASH_FUNCS = {'phash': phash, 'dhash': dhash}
+
+
+def hash_file(file_img: str, method: str = 'phash') -> Optional[int]:
+    """计算单个图片文件的哈希，失败返回 None (供进程池调用)"""
+    try:
+        with Image.open(file_img) as im:
+            # JPEG 在解码阶段直接降采样，哈希只需要很小的图
+            im.draft('L', (64, 64))
+            return HASH_FUNCS[method](im)
+    except Exception as e:
+        print(f'[Error] 图片哈希失败 {file_img}: {e}')
+        return None
+
+
+def hash_files(
+        files: List[str],
+        method: str = 'phash',
+        max_workers: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    多进程批量计算图片哈希
+    :return: (hashes, valid)
+             hashes: uint64 数组，与 files 等长，失败的图片为 0
+             valid: bool 数组，哈希计算成功的图片为 True
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        hashes = list(executor.map(hash_file, files, itertools.repeat(method), chunksize=256))
+    return np.array([h if h is not None else 0 for h in hashes], dtype=np.uint64), \
+        np.array([h is not None for h in hashes], dtype=bool)
+
+
+class PerceptualHashIndex:
+    def __init__(self, n_chunks: int = 4, method: str = 'phash'):
+        """
+        :param n_chunks: 哈希分段数 (64 需能被整除)，段越多单段越短、桶越大、可支持的检索半径越大
+        :param method: 'phash' 或 'dhash'
+        """
+        if 64 % n_chunks:
+            raise ValueError('n_chunks 必须能整除 64')
+        if method not in HASH_FUNCS:
+            raise ValueError(f'不支持的哈希方法: {method}')
+        self.n_chunks = n_chunks
+        self.chunk_bits = 64 // n_chunks
+        self.method = method
+        self.keys = np.empty(0, dtype=object)
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self._tables = None
+
+    # -----------------------------
+    # 构建
+    # -----------------------------
+    def _chunks(self, hashes: np.ndarray) -> np.ndarray:
+        """(n,) uint64 -> (n, n_chunks) 每段的整数值"""
+        mask = np.uint64((1 << self.chunk_bits) - 1)
+        shifts = np.arange(self.n_chunks, dtype=np.uint64) * np.uint64(self.chunk_bits)
+        return ((hashes[:, None] >> shifts) & mask).astype(np.int64)
+
+    def _build_tables(self):
+        """每段按值排序，查找时用 searchsorted 定位桶"""
+        chunks = self._chunks(self.hashes)
+        self._tables = []
+        for c in range(self.n_chunks):
+            order = np.argsort(chunks[:, c], kind='stable')
+            self._tables.append((chunks[order, c], order))
+
+    def add(self, keys: Iterable[str], hashes: np.ndarray):
+        """追加 (key, hash)，重建分段表"""
+        self.keys = np.concatenate([self.keys, np.asarray(list(keys), dtype=object)])
+        self.hashes = np.concatenate([self.hashes, np.asarray(hashes, dtype=np.uint64)])
+        self._build_tables()
+
+    def add_files(self, files: Dict[str, str], max_workers: Optional[int] = None):
+        """
+        计算图片文件的哈希并加入索引
+        :param files: {key: 图片路径}
+        """
+        keys = list(files)
+        hashes, valid = hash_files([files[k] for k in keys], self.method, max_workers)
+        self.add(np.asarray(keys, dtype=object)[valid], hashes[valid])
+
+    def add_image_store(self, image_store, size=None, max_workers: Optional[int] = None):
+        """
+        将图片库中的全部图片加入索引
+        - 同一内容哈希只计算一次感知哈希，再展开到所有别名
+        :param image_store: source.utils.images.ImageStore
+        :param size: 使用的缩略图尺寸 (更快)，None 表示原图
+        """
+        digests = sorted({entry['sha256'] for entry in image_store.index.values()})
+        files = [image_store.object_path(d, size) for d in digests]
+        print(f'[INFO] 图片库共 {len(image_store.index)} 个 key，{len(digests)} 张不同图片')
+        hashes, valid = hash_files(files, self.method, max_workers)
+        digest_hash = {d: h for d, h, ok in zip(digests, hashes, valid) if ok}
+        keys = [k for k, e in image_store.index.items() if e['sha256'] in digest_hash]
+        self.add(keys, np.array([digest_hash[image_store.index[k]['sha256']] for k in keys], dtype=np.uint64))
+
+    def save(self, file_npz: str):
+        """保存索引 (分段表在加载时重建)"""
+        np.savez_compressed(file_npz, keys=self.keys.astype(str), hashes=self.hashes,
+                            n_chunks=self.n_chunks, method=self.method)
+
+    @classmethod
+    def load(cls, file_npz: str) -> 'PerceptualHashIndex':
+        with np.load(file_npz) as data:
+            index = cls(n_chunks=int(data['n_chunks']), method=str(data['method']))
+            index.add(data['keys'].astype(object), data['hashes'])
+        return index
+
+    # -----------------------------
+    # 查询
+    # -----------------------------
+    def _probe_masks(self, radius: int) -> np.ndarray:
+        """单段内汉明距离 <= radius 的全部翻转掩码"""
+        masks = [0]
+        for r in range(1, radius + 1):
+            for bits in itertools.combinations(range(self.chunk_bits), r):
+                masks.append(sum(1 << b for b in bits))
+        return np.array(masks, dtype=np.int64)
+
+    def query(self, query_hash: int, max_distance: int = 10, k: int = 5) -> pd.DataFrame:
+        """单个哈希的近邻查询"""
+        return self.query_batch(np.array([query_hash], dtype=np.uint64), max_distance, k)
+
+    def query_batch(
+            self,
+            query_hashes: np.ndarray,
+            max_distance: int = 10,
+            k: int = 5
+    ) -> pd.DataFrame:
+        """
+        批量近邻查询
+        :param query_hashes: uint64 哈希数组
+        :param max_distance: 最大汉明距离
+        :param k: 每个查询最多返回的结果数
+        :return: DataFrame[query_idx, key, distance]，按 query_idx、distance 排序
+        """
+        query_hashes = np.asarray(query_hashes, dtype=np.uint64)
+        if len(self.hashes) == 0 or len(query_hashes) == 0:
+            return pd.DataFrame(columns=['query_idx', 'key', 'distance'])
+        masks = self._probe_masks(max_distance // self.n_chunks)
+        q_chunks = self._chunks(query_hashes)
+
+        # 1. 所有查询、所有段、所有探测值一次性 searchsorted 得到候选桶区间
+        q_idx, cand = [], []
+        for c, (values, order) in enumerate(self._tables):
+            probes = (q_chunks[:, c][:, None] ^ masks[None, :]).ravel()
+            lo = np.searchsorted(values, probes, side='left')
+            hi = np.searchsorted(values, probes, side='right')
+            counts = hi - lo
+            if counts.sum() == 0:
+                continue
+            # 展开 [lo, hi) 区间为候选位置
+            starts = np.repeat(lo - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+            positions = starts + np.arange(counts.sum())
+            q_idx.append(np.repeat(np.arange(len(probes)) // len(masks), counts))
+            cand.append(order[positions])
+        if not cand:
+            return pd.DataFrame(columns=['query_idx', 'key', 'distance'])
+        q_idx = np.concatenate(q_idx)
+        cand = np.concatenate(cand)
+
+        # 2. 用 popcount 精确计算距离，先过滤再去重 (同一候选可能在多个段命中，过滤后数量小得多)
+        distance = popcount64(query_hashes[q_idx] ^ self.hashes[cand])
+        keep = distance <= max_distance
+        df = pd.DataFrame({
+            'query_idx': q_idx[keep],
+            'cand': cand[keep],
+            'distance': distance[keep].astype(np.int64),
+        }).drop_duplicates(['query_idx', 'cand'])
+        # 3. 每个查询取距离最近的 k 个
+        df = df.sort_values(['query_idx', 'distance'], kind='stable')
+        df = df.groupby('query_idx').head(k).reset_index(drop=True)
+        df.insert(1, 'key', self.keys[df.pop('cand').to_numpy()])
+        return df
+
+
+def match_supplier_images(
+        index: PerceptualHashIndex,
+        supplier_images: Dict[str, str],
+        max_distance: int = 10,
+        k: int = 5,
+        max_workers: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    为每张供应商图片返回最相近的平台商品图片
+    :param index: 平台商品图片的感知哈希索引
+    :param supplier_images: {供应商商品 key: 图片路径}
+    :return: DataFrame[supplier_key, key, distance]
+    """
+    supplier_keys = list(supplier_images)
+    hashes, valid = hash_files([supplier_images[k] for k in supplier_keys], index.method, max_workers)
+    supplier_keys = np.asarray(supplier_keys, dtype=object)[valid]
+    df = index.query_batch(hashes[valid], max_distance=max_distance, k=k)
+    df.insert(0, 'supplier_key', supplier_keys[df['query_idx'].to_numpy(dtype=np.int64)])
+    return df.drop(columns=['query_idx'])
+
+
+if __name__ == '__main__':
+    from source.utils.paths import PathManager
+    from source.utils.images import ImageStore
+
+    pm = PathManager()
+    # 1. 平台商品图片索引 (Amazon / Shopee 图片库)
+    store = ImageStore(os.path.join(pm.data_dir, 'amazon_data', 'image_store'))
+    phash_index = PerceptualHashIndex()
+    phash_index.add_image_store(store, size=(120, 120))
+    phash_index.save(os.path.join(pm.data_dir, 'amazon_data', 'phash_index.npz'))
+    # 2. 供应商图片匹配
+    path_supplier = os.path.join(pm.data_dir, 'alibaba_data', 'images')
+    supplier_images = {
+        os.path.splitext(f)[0]: os.path.join(path_supplier, f)
+        for f in os.listdir(path_supplier)
+    }
+    print(match_supplier_images(phash_index, supplier_images))
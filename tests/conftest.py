@@ -0,0 +1,63 @@
+'''
+@Desc:   测试公共配置
+         项目代码以 source 包导入 (from source.xxx import ...)，
+         仓库没有以 source 目录名检出时，把仓库根目录注册为 source 包
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import sys
+import types
+import threading
+from io import BytesIO
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+try:
+    import source  # noqa: F401
+except ImportError:
+    package = types.ModuleType('source')
+    package.__path__ = [str(ROOT)]
+    sys.modules['source'] = package
+
+
+@pytest.fixture
+def image_server():
+    """
+    本地图片服务：/<颜色>.png 返回 64x48 的纯色 PNG，/<颜色>.jpg 返回 JPEG，其它路径返回 404
+    :return: (base_url, 请求路径列表)
+    """
+    from PIL import Image
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            color, _, ext = self.path.strip('/').split('?')[0].rpartition('.')
+            img_format = {'png': 'PNG', 'jpg': 'JPEG'}.get(ext)
+            if img_format is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            buffer = BytesIO()
+            Image.new('RGB', (64, 48), color).save(buffer, format=img_format)
+            body = buffer.getvalue()
+            self.send_response(200)
+            self.send_header('Content-Type', Image.MIME[img_format])
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', requests_seen
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,130 @@
+'''
+@Desc:   AmazonUtils 测试 (用假的 AmazonScraper 代替真实请求)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import time
+import threading
+import pandas as pd
+import pytest
+from urllib.parse import urlparse, parse_qs
+
+pytest.importorskip('amzpy')
+from source.product_research import amazon_script  # noqa: E402
+
+
+class FakeScraper:
+    """记录调用，按 URL 生成确定的商品"""
+    calls = []
+    details = {}
+    lock = threading.Lock()
+
+    def __init__(self, country_code='com', impersonate=None):
+        self.country_code = country_code
+        self.in_use = False
+
+    def search_products(self, query=None, search_url=None, max_pages=1):
+        assert not self.in_use, '同一会话被多个线程同时使用'
+        self.in_use = True
+        try:
+            with self.lock:
+                FakeScraper.calls.append(search_url)
+            params = parse_qs(urlparse(search_url).query)
+            keyword, page = params['k'][0], int(params['page'][0])
+            if keyword == 'broken':
+                raise RuntimeError('blocked')
+            return [
+                {'asin': f'{keyword[:3].upper()}{self.country_code}{page}{i}', 'title': f'{keyword} {i}',
+                 'price': 9.5 + i, 'currency': 'USD', 'img_url': None}
+                for i in range(2)
+            ]
+        finally:
+            self.in_use = False
+
+    def get_product_details(self, url):
+        with self.lock:
+            FakeScraper.calls.append(url)
+        asin = url.rsplit('/', 1)[1]
+        if asin not in FakeScraper.details:
+            raise RuntimeError('not found')
+        return dict(FakeScraper.details[asin], url=None)
+
+
+class FakePathManager:
+    def __init__(self, data_dir):
+        self.data_dir = str(data_dir)
+
+
+@pytest.fixture
+def amazon_utils(tmp_path, monkeypatch):
+    FakeScraper.calls = []
+    FakeScraper.details = {}
+    monkeypatch.setattr(amazon_script, 'AmazonScraper', FakeScraper)
+    monkeypatch.setattr(amazon_script, 'PathManager', lambda: FakePathManager(tmp_path))
+    os.makedirs(tmp_path / 'amazon_data', exist_ok=True)
+    return amazon_script.AmazonUtils(sessions_per_market=2)
+
+
+def test_search_batch_covers_query_market_matrix(amazon_utils, tmp_path):
+    df = amazon_utils.search_batch(['mini fan', 'broken'], country_codes=['com', 'de'], max_pages=3, max_workers=6)
+    # 2 个查询词 x 2 个站点 x 3 页 全部请求，broken 的页面失败后被跳过
+    assert len(FakeScraper.calls) == 12
+    assert len(df) == 2 * 3 * 2
+    assert set(df['marketplace']) == {'com', 'de'}
+    assert set(df['query']) == {'mini fan'}
+    assert sorted(df['page'].unique()) == [1, 2, 3]
+    dataset = pd.read_parquet(tmp_path / 'amazon_data' / 'amazon_search')
+    assert len(dataset) == len(df)
+    # 每个站点的会话数不超过上限
+    assert all(created <= 2 for _, created in amazon_utils._scraper_pools.values())
+
+
+def test_get_products_serves_cache_and_refreshes_stale(amazon_utils):
+    amazon_utils.cache_products('com', [{'asin': 'A1', 'title': 'cached', 'price': 1.0}])
+    amazon_utils.asin_cache.set('com:A2', {'asin': 'A2', 'title': 'old', 'price': 2.0},
+                                fetched_at=time.time() - 10 * 24 * 3600)
+    amazon_utils.asin_cache.set('com:A3', {'asin': 'A3', 'title': 'old', 'price': 3.0},
+                                fetched_at=time.time() - 10 * 24 * 3600)
+    FakeScraper.details = {
+        'A2': {'title': 'fresh', 'price': 2.5},
+        'A4': {'title': 'new', 'price': 4.0},
+    }
+    products = amazon_utils.get_products(['A1', 'A2', 'A3', 'A4', 'A5', 'A1'], refresh_workers=2, refresh_queue_size=1)
+    assert products['A1']['title'] == 'cached' and products['A1']['stale'] is False
+    assert products['A2']['title'] == 'fresh' and products['A2']['stale'] is False
+    # 刷新失败的过期 ASIN 返回旧数据
+    assert products['A3']['title'] == 'old' and products['A3']['stale'] is True
+    assert products['A4']['url'] == 'https://www.amazon.com/dp/A4'
+    assert 'A5' not in products
+    assert sorted(c.rsplit('/', 1)[1] for c in FakeScraper.calls) == ['A2', 'A3', 'A4', 'A5']
+    # 刷新结果写回缓存，再次读取不再请求
+    FakeScraper.calls = []
+    assert amazon_utils.get_products(['A2', 'A4'])['A4']['price'] == 4.0
+    assert FakeScraper.calls == []
+
+
+def test_cache_is_per_marketplace(amazon_utils):
+    amazon_utils.cache_products('com', [{'asin': 'A1', 'price': 1.0}])
+    amazon_utils.cache_products('de', [{'asin': 'A1', 'price': 2.0}])
+    assert amazon_utils.get_products(['A1'], 'com')['A1']['price'] == 1.0
+    assert amazon_utils.get_products(['A1'], 'de')['A1']['price'] == 2.0
+
+
+def test_to_xlsx_fast_embeds_thumbnails(amazon_utils, tmp_path, image_server):
+    import openpyxl
+    base_url, _ = image_server
+    pd.DataFrame({
+        'asin': ['A1', 'A2', 'A3'],
+        'title': ['a', 'b', 'c'],
+        'price': [1.0, 2.0, None],
+        'img_url': [f'{base_url}/red.png', f'{base_url}/red.png', f'{base_url}/missing'],
+    }).to_csv(tmp_path / 'amazon_data' / 'products.csv', index=False)
+    amazon_utils.to_xlsx_fast('products', thumb_size=(32, 32))
+    sheet = openpyxl.load_workbook(tmp_path / 'amazon_data' / 'products.xlsx').active
+    assert [c.value for c in sheet[1]] == ['asin', 'title', 'price', 'image']
+    assert [sheet.cell(row=r, column=1).value for r in (2, 3, 4)] == ['A1', 'A2', 'A3']
+    assert sheet.cell(row=4, column=3).value is None
+    # 下载失败的图片不嵌入
+    assert len(sheet._images) == 2
@@ -0,0 +1,69 @@
+'''
+@Desc:   AmazonPriceTracker 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from source.product_research.amazon_tracker import AmazonPriceTracker
+
+
+def test_record_parses_text_prices_per_marketplace(tmp_path):
+    tracker = AmazonPriceTracker(str(tmp_path))
+    tracker.record(pd.DataFrame({
+        'asin': ['A1', 'A2', 'A3'],
+        'marketplace': ['com', 'de', 'com'],
+        'query': ['fan', 'fan', 'fan'],
+        'price': pd.Series(['$11.99', '9,99 €', None], dtype='str'),
+        'reviews_count': pd.Series(['1,300', '1.300', '12'], dtype='str'),
+        'rating': ['4.5', '4,2', None],
+    }), captured_at='2026-01-01')
+    df = tracker.latest().set_index('asin')
+    np.testing.assert_allclose(df.loc[['A1', 'A2'], 'price'], [11.99, 9.99])
+    assert np.isnan(df.loc['A3', 'price'])
+    np.testing.assert_allclose(df.loc[['A1', 'A2', 'A3'], 'reviews_count'], [1300, 1300, 12])
+    np.testing.assert_allclose(df.loc[['A1', 'A2'], 'rating'], [4.5, 4.2])
+
+
+def test_watchlist_due_and_velocity(tmp_path):
+    tracker = AmazonPriceTracker(str(tmp_path))
+    tracker.watch(['A1', 'A2'], marketplace='com', category='fan', interval_hours=12)
+    assert sorted(tracker.due('2026-01-01')['asin']) == ['A1', 'A2']
+    tracker.record([{'asin': 'A1', 'price': 10.0, 'reviews_count': 100}], marketplace='com',
+                   captured_at='2026-01-01 00:00')
+    tracker.record([{'asin': 'A1', 'price': 9.0, 'reviews_count': 130}], marketplace='com',
+                   captured_at='2026-01-11 00:00')
+    # A1 刚观测过，未到期；A2 从未观测
+    assert tracker.due('2026-01-11 06:00')['asin'].tolist() == ['A2']
+    assert sorted(tracker.due('2026-01-11 12:00')['asin']) == ['A1', 'A2']
+    tracker.unwatch(['A2'])
+    assert tracker.due('2026-01-11 06:00').empty
+
+    velocity = tracker.review_velocity(days=30, now='2026-01-12').set_index('asin')
+    assert velocity.loc['A1', 'reviews_delta'] == 30
+    assert velocity.loc['A1', 'reviews_per_day'] == 3
+    assert velocity.loc['A1', 'price_change'] == -1
+    assert velocity.loc['A1', 'category'] == 'fan'
+    # 关注列表可从磁盘重新加载
+    assert AmazonPriceTracker(str(tmp_path)).watchlist.loc[('com', 'A1'), 'category'] == 'fan'
+
+
+def test_price_percentiles(tmp_path):
+    tracker = AmazonPriceTracker(str(tmp_path))
+    tracker.record([
+        {'asin': f'A{i}', 'price': float(i), 'category': 'fan'} for i in range(1, 11)
+    ] + [{'asin': 'B1', 'price': 5.0, 'category': 'lamp'}], captured_at='2026-01-01')
+    result = tracker.price_percentiles(percentiles=(50, 90)).set_index('category')
+    assert result.loc['fan', 'p50'] == 5.5
+    assert result.loc['fan', 'asins'] == 10
+    assert result.loc['lamp', 'p90'] == 5.0
+
+
+def test_price_percentiles_without_prices(tmp_path):
+    tracker = AmazonPriceTracker(str(tmp_path))
+    assert tracker.price_percentiles().columns.tolist() == ['category', 'p10', 'p25', 'p50', 'p75', 'p90', 'asins']
+    tracker.record([{'asin': 'A1', 'price': None, 'category': 'fan'}], captured_at='2026-01-01')
+    result = tracker.price_percentiles(percentiles=(50,), by=['marketplace', 'category'])
+    assert result.empty
+    assert result.columns.tolist() == ['marketplace', 'category', 'p50', 'asins']
@@ -0,0 +1,119 @@
+'''
+@Desc:   Catalog 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.catalog import Catalog
+from source.financial_analysis_system.cost_engine import CostEngine
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+
+@pytest.fixture
+def tables():
+    products = pd.DataFrame({
+        'SKU': ['A', 'B'],
+        '商品名': ['风扇', '灯'],
+        '供应商名': ['甲', '乙'],
+        '单价(CNY)': [10.0, 20.0],
+        '重量(kg)': [0.5, 1.0],
+    })
+    logistics = pd.DataFrame({
+        'ID': ['L1'],
+        '物流公司': ['顺丰'],
+        '运输方式': ['空运'],
+        '单件运费(CNY)': [1.0],
+        '按kg运费(CNY)': [30.0],
+    })
+    return products, logistics
+
+
+def test_validate_columns_and_unique_keys(tables):
+    products, logistics = tables
+    with pytest.raises(ValueError, match='单价'):
+        Catalog(products.drop(columns=['单价(CNY)']), logistics)
+    # CostEngine 需要 重量(kg)，目录构建时就要校验
+    with pytest.raises(ValueError, match='重量'):
+        Catalog(products.drop(columns=['重量(kg)']), logistics)
+    with pytest.raises(ValueError, match='重复'):
+        Catalog(pd.concat([products, products]), logistics)
+
+
+def test_lookup_and_batch(tables):
+    catalog = Catalog(*tables)
+    assert catalog.product('A')['单价(CNY)'] == 10.0
+    assert catalog.product('Z') is None
+    assert catalog.logistics_option('L1')['物流公司'] == '顺丰'
+    assert catalog.products_for(['B', 'A', 'B'])['商品名'].tolist() == ['灯', '风扇', '灯']
+    with pytest.raises(ValueError, match='Z'):
+        catalog.products_for(['A', 'Z'])
+
+
+def test_upsert_updates_and_appends(tables):
+    catalog = Catalog(*tables)
+    catalog.product('A')
+    # 已有 SKU 只更新部分列
+    catalog.upsert_products(pd.DataFrame({'SKU': ['A'], '单价(CNY)': [12.0]}))
+    assert catalog.product('A')['单价(CNY)'] == 12.0
+    assert catalog.product('A')['商品名'] == '风扇'
+    # 新 SKU 需包含全部必需列
+    catalog.upsert_products(pd.DataFrame({
+        'SKU': ['C'], '商品名': ['杯'], '供应商名': ['丙'], '单价(CNY)': [3.0], '重量(kg)': [0.2]
+    }))
+    assert catalog.product('C')['供应商名'] == '丙'
+    assert len(catalog.products) == 3
+
+
+def test_upsert_rejects_incomplete_new_keys(tables):
+    catalog = Catalog(*tables)
+    with pytest.raises(ValueError, match='缺少列'):
+        catalog.upsert_products(pd.DataFrame({'SKU': ['A', 'NEW'], '单价(CNY)': [11.0, 5.0]}))
+    with pytest.raises(ValueError, match='为空'):
+        catalog.upsert_products(pd.DataFrame({
+            'SKU': ['NEW'], '商品名': ['x'], '供应商名': [None], '单价(CNY)': [5.0], '重量(kg)': [0.1]
+        }))
+    with pytest.raises(ValueError, match='重量'):
+        catalog.upsert_products(pd.DataFrame({
+            'SKU': ['NEW'], '商品名': ['x'], '供应商名': ['丁'], '单价(CNY)': [5.0]
+        }))
+    with pytest.raises(ValueError, match='缺少列'):
+        catalog.upsert_logistics(pd.DataFrame({'ID': ['L2'], '物流公司': ['云途']}))
+    # 失败的 upsert 不修改目录
+    assert catalog.product('NEW') is None
+    assert catalog.product('A')['单价(CNY)'] == 10.0
+
+
+def test_snapshot_reused_until_csv_changes(tables, tmp_path):
+    products, logistics = tables
+    file_products = str(tmp_path / 'products.csv')
+    file_logistics = str(tmp_path / 'logistics.csv')
+    file_snapshot = str(tmp_path / 'catalog.pkl')
+    products.to_csv(file_products, index=False)
+    logistics.to_csv(file_logistics, index=False)
+    catalog = Catalog.from_csv(file_products, file_logistics, file_snapshot)
+    assert os.path.exists(file_snapshot)
+    mtime = os.stat(file_snapshot).st_mtime_ns
+    assert Catalog.from_csv(file_products, file_logistics, file_snapshot).product('B')['单价(CNY)'] == 20.0
+    assert os.stat(file_snapshot).st_mtime_ns == mtime
+
+    products.assign(**{'单价(CNY)': [10.0, 25.0]}).to_csv(file_products, index=False)
+    os.utime(file_products, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+    assert Catalog.from_csv(file_products, file_logistics, file_snapshot).product('B')['单价(CNY)'] == 25.0
+    assert catalog.product('B')['单价(CNY)'] == 20.0
+
+
+def test_cost_engine_from_catalog_matches_dataframes(tables, tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    pd.DataFrame({'Currency': ['CNY', 'USD'], 'Rate': [1.0, 0.14]}).to_csv(file_csv, index=False)
+    manager = ExchangeRateManager(csv_path=file_csv)
+    catalog = Catalog(*tables)
+    orders = [{'SKU': 'A', '数量': 10, '物流SKU': 'L1'}, {'SKU': 'B', '数量': 1, '物流SKU': 'L1'}]
+    # 直接使用目录中的索引表，不经过 products_df / logistics_df 重建
+    catalog.products_df = catalog.logistics_df = None
+    engine = CostEngine.from_catalog(catalog, manager)
+    pd.testing.assert_frame_equal(engine.cost(orders, 'USD'), CostEngine(*tables, manager).cost(orders, 'USD'))
+    np.testing.assert_allclose(engine.cost(orders)['总成本(CNY)'], CostEngine(*tables, manager).cost(orders)['总成本(CNY)'])
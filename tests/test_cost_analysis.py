@@ -0,0 +1,65 @@
+'''
+@Desc:   cost_analysis 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import pandas as pd
+import pytest
+from source.financial_analysis_system import cost_analysis, cost_engine, exchange_rate
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+
+def test_uses_package_modules():
+    # 与 cost_engine 共用同一份 exchange_rate 模块，不会加载两份
+    assert cost_analysis.ExchangeRateManager is exchange_rate.ExchangeRateManager
+    assert cost_analysis.CostEngine is cost_engine.CostEngine
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """calculate_cost 写入 ../../data，在临时目录下运行"""
+    work = tmp_path / 'a' / 'b'
+    work.mkdir(parents=True)
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(work)
+    file_csv = str(tmp_path / 'rates.csv')
+    pd.DataFrame({'Currency': ['CNY', 'USD', 'EUR'], 'Rate': [1.0, 0.14, 0.12]}).to_csv(file_csv, index=False)
+    monkeypatch.setattr(cost_analysis, 'ExchangeRateManager', lambda: ExchangeRateManager(csv_path=file_csv))
+    pd.DataFrame({
+        'SKU': ['A'], '商品名': ['风扇'], '供应商名': ['甲'], '单价(CNY)': [10.0], '重量(kg)': [0.5],
+    }).to_csv(tmp_path / 'data' / 'products.csv', index=False)
+    pd.DataFrame({
+        'ID': ['L1'], '物流公司': ['顺丰'], '运输方式': ['空运'], '单件运费(CNY)': [1.0], '按kg运费(CNY)': [10.0],
+    }).to_csv(tmp_path / 'data' / 'logistics.csv', index=False)
+    return tmp_path / 'data'
+
+
+ORDERS = [{'SKU': 'A', '数量': 4, '物流SKU': 'L1'}]
+
+
+def test_calculate_cost_split_reports(data_dir):
+    products = cost_analysis.load_products(str(data_dir / 'products.csv'))
+    logistics = cost_analysis.load_logistics(str(data_dir / 'logistics.csv'))
+    df = cost_analysis.calculate_cost(products, logistics, ORDERS, ['CNY', 'USD'])
+    # 运费 max(1 * 4, 10 * 0.5 * 4) = 20
+    assert df['总成本(CNY)'].tolist() == [60.0]
+    assert (data_dir / 'cost_summary_CNY.csv').exists()
+    df_usd = pd.read_csv(data_dir / 'cost_summary_USD.csv')
+    assert df_usd['总成本(USD)'].tolist() == [8.4]
+    assert '总成本(CNY)' not in df_usd.columns
+
+
+def test_calculate_cost_with_catalog(data_dir):
+    catalog = cost_analysis.load_catalog(
+        str(data_dir / 'products.csv'), str(data_dir / 'logistics.csv'), str(data_dir / 'catalog.pkl')
+    )
+    df = cost_analysis.calculate_cost(None, None, ORDERS, ['CNY', 'EUR'], wide=True, catalog=catalog)
+    assert df['总成本(EUR)'].tolist() == [7.2]
+    assert (data_dir / 'cost_summary_CNY_EUR.csv').exists()
+
+
+def test_load_products_requires_columns(tmp_path):
+    pd.DataFrame({'SKU': ['A']}).to_csv(tmp_path / 'p.csv', index=False)
+    with pytest.raises(ValueError, match='商品名'):
+        cost_analysis.load_products(str(tmp_path / 'p.csv'))
@@ -0,0 +1,227 @@
+'''
+@Desc:   CostEngine 测试：与逐条订单计算 (原 calculate_cost 的循环实现) 结果一致
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+from source.financial_analysis_system.cost_engine import CostEngine, split_by_currency
+
+
+@pytest.fixture
+def manager(tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    pd.DataFrame({'Currency': ['CNY', 'USD', 'EUR'], 'Rate': [1.0, 0.1404, 0.1194]}).to_csv(file_csv, index=False)
+    return ExchangeRateManager(csv_path=file_csv)
+
+
+@pytest.fixture
+def products_df():
+    return pd.DataFrame({
+        'SKU': ['VC-S-BLK', 'VCL-STD', 'FAN-01', 'VC-S-BLK'],
+        '商品名': ['吸尘器', '吸尘器配件', '风扇', '重复行'],
+        '供应商名': ['甲', '乙', '甲', '丙'],
+        '单价(CNY)': [35.5, 12.0, 8.8, 99.0],
+        '重量(kg)': [1.2, 0.3, 0.25, 9.0],
+    })
+
+
+@pytest.fixture
+def logistics_df():
+    return pd.DataFrame({
+        'ID': ['LS001', 'LS002', 'LS003'],
+        '物流公司': ['顺丰', '云途', '燕文'],
+        '运输方式': ['空运', '海运', '空运'],
+        '单件运费(CNY)': [0.5, 0.2, 3.0],
+        '按kg运费(CNY)': [60.0, 8.0, 45.0],
+    })
+
+
+def reference_cost(products_df, logistics_df, order_list, manager, currency='CNY'):
+    """逐条订单计算 (原 calculate_cost 的实现，按kg运费使用整票重量)，作为对照"""
+    results = []
+    for order in order_list:
+        product = products_df[products_df['SKU'] == order['SKU']].iloc[0]
+        logistics = logistics_df[logistics_df['ID'] == order['物流SKU']].iloc[0]
+        quantity = order['数量']
+        shipping_cost_cny = max(
+            logistics['单件运费(CNY)'] * quantity,
+            logistics['按kg运费(CNY)'] * product['重量(kg)'] * quantity
+        )
+        total_cost_cny = product['单价(CNY)'] * quantity + shipping_cost_cny
+        amounts = {
+            '单价': product['单价(CNY)'],
+            '单件运费': logistics['单件运费(CNY)'],
+            '按kg运费': logistics['按kg运费(CNY)'],
+            '运输成本': shipping_cost_cny,
+            '总成本': total_cost_cny,
+        }
+        row = {
+            'SKU': order['SKU'],
+            '商品名': product['商品名'],
+            '供应商名': product['供应商名'],
+            '数量': quantity,
+            '重量(kg)': product['重量(kg)'],
+            '物流SKU': order['物流SKU'],
+            '物流公司': logistics['物流公司'],
+            '运输方式': logistics['运输方式'],
+        }
+        for name, value in amounts.items():
+            row[f'{name}({currency})'] = round(manager.convert_from_cny(value, currency), 2)
+        results.append(row)
+    return pd.DataFrame(results)
+
+
+ORDERS = [
+    {'SKU': 'VC-S-BLK', '数量': 100, '物流SKU': 'LS001'},
+    {'SKU': 'VCL-STD', '数量': 200, '物流SKU': 'LS002'},
+    {'SKU': 'FAN-01', '数量': 1, '物流SKU': 'LS003'},
+    {'SKU': 'VC-S-BLK', '数量': 3, '物流SKU': 'LS003'},
+    {'SKU': 'FAN-01', '数量': 500, '物流SKU': 'LS001'},
+]
+
+
+@pytest.mark.parametrize('currency', ['CNY', 'USD', 'EUR'])
+def test_cost_matches_per_order_loop(products_df, logistics_df, manager, currency):
+    engine = CostEngine(products_df, logistics_df, manager)
+    df = engine.cost(ORDERS, currency)
+    expected = reference_cost(products_df, logistics_df, ORDERS, manager, currency)
+    assert df.columns.tolist() == expected.columns.tolist()
+    text_cols = ['SKU', '商品名', '供应商名', '物流SKU', '物流公司', '运输方式']
+    assert df[text_cols].equals(expected[text_cols])
+    amount_cols = [c for c in df.columns if c.endswith(f'({currency})')]
+    # 四舍五入方式不同 (round_half_up 与 round)，只在恰好 .5 时相差 0.01
+    np.testing.assert_allclose(df[amount_cols].to_numpy(float), expected[amount_cols].to_numpy(float), atol=0.01 + 1e-9)
+
+
+def test_multi_currency_equals_single_currency(products_df, logistics_df, manager):
+    engine = CostEngine(products_df, logistics_df, manager)
+    wide = engine.cost(pd.DataFrame(ORDERS), ['CNY', 'USD'])
+    parts = split_by_currency(wide, ['CNY', 'USD'])
+    for c in ['CNY', 'USD']:
+        pd.testing.assert_frame_equal(parts[c].reset_index(drop=True), engine.cost(ORDERS, c))
+
+
+def test_empty_order_list_gives_empty_report(products_df, logistics_df, manager):
+    engine = CostEngine(products_df, logistics_df, manager)
+    for currency in ['USD', ['CNY', 'USD']]:
+        df = engine.cost([], currency)
+        assert df.empty
+        assert df.columns.tolist() == engine.cost(ORDERS, currency).columns.tolist()
+
+
+def test_unknown_keys_raise(products_df, logistics_df, manager):
+    engine = CostEngine(products_df, logistics_df, manager)
+    with pytest.raises(ValueError, match='NOPE'):
+        engine.cost([{'SKU': 'NOPE', '数量': 1, '物流SKU': 'LS001'}])
+    with pytest.raises(ValueError, match='LS999'):
+        engine.cost([{'SKU': 'FAN-01', '数量': 1, '物流SKU': 'LS999'}])
+    with pytest.raises(ValueError, match='数量'):
+        engine.cost([{'SKU': 'FAN-01', '物流SKU': 'LS001'}])
+
+
+def _write_orders(file_orders, orders):
+    pd.DataFrame(orders).to_csv(file_orders, index=False, encoding='utf-8-sig')
+
+
+def test_cost_file_matches_in_memory(products_df, logistics_df, manager, tmp_path):
+    file_orders = str(tmp_path / 'orders.csv')
+    _write_orders(file_orders, ORDERS * 3)
+    engine = CostEngine(products_df, logistics_df, manager)
+    file_out = str(tmp_path / 'cost.csv')
+    totals = engine.cost_file(file_orders, file_out, ['CNY', 'USD'], chunksize=4)
+    df = pd.read_csv(file_out, encoding='utf-8-sig', dtype={'SKU': str, '物流SKU': str})
+    expected = engine.cost(ORDERS * 3, ['CNY', 'USD'])
+    np.testing.assert_allclose(df['总成本(USD)'], expected['总成本(USD)'])
+    assert len(df) == 15
+    # 按 SKU 汇总在 CNY 下累加
+    df_cny = engine.compute(ORDERS * 3)
+    by_sku = df_cny.groupby('SKU')['总成本(CNY)'].sum()
+    got = totals['sku'].set_index('SKU')['总成本(CNY)']
+    np.testing.assert_allclose(got[by_sku.index], by_sku.round(2))
+    assert totals['supplier']['数量'].sum() == sum(o['数量'] for o in ORDERS) * 3
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_cost_file_split_currency(products_df, logistics_df, manager, tmp_path):
+    file_orders = str(tmp_path / 'orders.csv')
+    _write_orders(file_orders, ORDERS)
+    engine = CostEngine(products_df, logistics_df, manager)
+    engine.cost_file(file_orders, str(tmp_path / 'cost_{currency}.csv'), ['CNY', 'EUR'], split_currency=True)
+    df_eur = pd.read_csv(tmp_path / 'cost_EUR.csv', encoding='utf-8-sig')
+    assert '总成本(EUR)' in df_eur.columns and '总成本(CNY)' not in df_eur.columns
+    assert (tmp_path / 'cost_CNY.csv').exists()
+
+
+def test_cost_file_failure_removes_tmp(products_df, logistics_df, manager, tmp_path):
+    file_orders = str(tmp_path / 'orders.csv')
+    _write_orders(file_orders, ORDERS + [{'SKU': 'NOPE', '数量': 1, '物流SKU': 'LS001'}])
+    file_out = tmp_path / 'cost.csv'
+    file_out.write_text('old', encoding='utf-8')
+    engine = CostEngine(products_df, logistics_df, manager)
+    with pytest.raises(ValueError, match='NOPE'):
+        engine.cost_file(file_orders, str(file_out), 'CNY', chunksize=2)
+    assert not list(tmp_path.glob('*.tmp'))
+    # 已有输出不被覆盖
+    assert file_out.read_text(encoding='utf-8') == 'old'
+
+
+def test_read_orders_keeps_country(tmp_path):
+    file_orders = str(tmp_path / 'orders.csv')
+    _write_orders(file_orders, [{'SKU': '001', '数量': 2, '物流SKU': '007', '国家': 'DE', '备注': 'x'}])
+    chunk = next(CostEngine.read_orders(file_orders))
+    assert sorted(chunk.columns) == sorted(['SKU', '数量', '物流SKU', '国家'])
+    assert chunk['SKU'].tolist() == ['001'] and chunk['国家'].tolist() == ['DE']
+
+    _write_orders(file_orders, [{'SKU': '001', '数量': 2, '物流SKU': '007'}])
+    assert sorted(next(CostEngine.read_orders(file_orders)).columns) == sorted(['SKU', '数量', '物流SKU'])
+
+
+def test_wide_report_column_layout(products_df, logistics_df, manager):
+    engine = CostEngine(products_df, logistics_df, manager)
+    df = engine.cost(ORDERS, ['CNY', 'USD', 'EUR'])
+    amounts = ['单价', '单件运费', '按kg运费', '运输成本', '总成本']
+    assert df.columns.tolist()[8:] == [f'{a}({c})' for c in ['CNY', 'USD', 'EUR'] for a in amounts]
+    # 每个币种由同一 CNY 金额换算
+    np.testing.assert_allclose(
+        df['总成本(USD)'],
+        ExchangeRateManager.round_half_up(engine.compute(ORDERS)['总成本(CNY)'].to_numpy() * 0.1404, 2)
+    )
+
+
+def test_split_by_currency_keeps_base_columns(products_df, logistics_df, manager):
+    engine = CostEngine(products_df, logistics_df, manager)
+    parts = split_by_currency(engine.cost(ORDERS, ['USD', 'EUR']), ['USD', 'EUR'])
+    assert set(parts) == {'USD', 'EUR'}
+    for c, part in parts.items():
+        assert part.columns.tolist()[:8] == ['SKU', '商品名', '供应商名', '数量', '重量(kg)', '物流SKU', '物流公司', '运输方式']
+        assert all(col.endswith(f'({c})') for col in part.columns[8:])
+        assert len(part.columns) == 13
+
+
+def test_cost_file_totals_per_currency(products_df, logistics_df, manager, tmp_path):
+    file_orders = str(tmp_path / 'orders.csv')
+    _write_orders(file_orders, ORDERS)
+    engine = CostEngine(products_df, logistics_df, manager)
+    totals = engine.cost_file(file_orders, str(tmp_path / 'cost.csv'), ['USD', 'EUR'])
+    df = totals['carrier']
+    assert {'运输成本(USD)', '总成本(USD)', '运输成本(EUR)', '总成本(EUR)'} <= set(df.columns)
+    assert '总成本(CNY)' not in df.columns
+    # 按第一个币种排序
+    assert df['总成本(USD)'].is_monotonic_decreasing
+    total_cny = engine.compute(ORDERS)['总成本(CNY)'].sum()
+    np.testing.assert_allclose(df['总成本(EUR)'].sum(), total_cny * 0.1194, atol=0.05)
+
+
+def test_weight_based_shipping_scales_with_quantity(products_df, logistics_df, manager):
+    engine = CostEngine(products_df, logistics_df, manager)
+    # VC-S-BLK 1.2kg，LS001 按kg 60 元、单件 0.5 元：按重量计费 = 60 * 1.2 * 数量
+    df = engine.compute([
+        {'SKU': 'VC-S-BLK', '数量': 1, '物流SKU': 'LS001'},
+        {'SKU': 'VC-S-BLK', '数量': 10, '物流SKU': 'LS001'},
+    ])
+    np.testing.assert_allclose(df['运输成本(CNY)'], [72.0, 720.0])
+    np.testing.assert_allclose(df['总成本(CNY)'], [35.5 + 72.0, 355.0 + 720.0])
@@ -0,0 +1,108 @@
+'''
+@Desc:   DeltaSnapshotStore / ShopeeSnapshotStore 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import time
+import threading
+import numpy as np
+import pandas as pd
+from source.utils.delta_store import DeltaSnapshotStore, delta_encode, delta_decode
+from source.product_research.shopee_snapshot import ShopeeSnapshotStore
+
+
+def test_delta_encode_decode_round_trip():
+    values = np.array([5, 7, 10, 100, 90, 3], dtype=np.int64)
+    group_lens = np.array([3, 2, 1])
+    starts = np.zeros(len(values), dtype=bool)
+    starts[[0, 3, 5]] = True
+    deltas = delta_encode(values, starts)
+    assert deltas.tolist() == [5, 2, 3, 100, -10, 3]
+    assert delta_decode(deltas, group_lens).tolist() == values.tolist()
+
+
+def test_round_trip_with_nan_and_string_keys(tmp_path):
+    store = DeltaSnapshotStore(str(tmp_path), key_columns=['asin', 'market'], value_columns={'price': 100, 'n': 1})
+    df = pd.DataFrame({
+        'asin': ['B2', 'B1', 'B1', 'B2', 'B1'],
+        'market': ['us', 'us', 'us', 'us', 'de'],
+        'captured_at': pd.to_datetime(['2026-01-02', '2026-01-03', '2026-01-01', '2026-01-01', '2026-01-05']),
+        'price': [9.99, np.nan, 12.5, 10.01, 8.0],
+        'n': [1, 2, 3, np.nan, 5],
+    })
+    store.append(df)
+    loaded = store.load()
+    expected = df.sort_values(['asin', 'market', 'captured_at']).reset_index(drop=True)
+    assert loaded['asin'].tolist() == expected['asin'].tolist()
+    assert loaded['market'].tolist() == expected['market'].tolist()
+    assert (loaded['captured_at'].to_numpy() == expected['captured_at'].to_numpy()).all()
+    np.testing.assert_allclose(loaded['price'], expected['price'])
+    np.testing.assert_allclose(loaded['n'], expected['n'])
+
+
+def test_segments_time_filter_and_compact(tmp_path):
+    store = DeltaSnapshotStore(str(tmp_path), key_columns=['id'], value_columns={'v': 1})
+    for day in range(1, 4):
+        store.append(pd.DataFrame({'id': [1, 2], 'captured_at': [pd.Timestamp(f'2026-01-0{day}')] * 2, 'v': [day, -day]}))
+    # 同一主键再次写入时以最新分段为准
+    store.append(pd.DataFrame({'id': [1], 'captured_at': [pd.Timestamp('2026-01-03')], 'v': [30]}))
+    assert len(store._segment_files()) == 4
+    window = store.load('2026-01-02', '2026-01-03')
+    assert window['v'].tolist() == [2, 30, -2, -3]
+    full = store.load()
+    store.compact()
+    assert len(store._segment_files()) == 1
+    pd.testing.assert_frame_equal(store.load(), full)
+
+
+def test_concurrent_appends_get_distinct_segments(tmp_path, monkeypatch):
+    store = DeltaSnapshotStore(str(tmp_path), key_columns=['id'], value_columns={'v': 1})
+    next_segment_file = store._next_segment_file
+
+    def slow_next_segment_file():
+        # 拉长 "选编号 -> 落盘" 的间隔，没有锁时各线程会选到同一个编号
+        file_seg = next_segment_file()
+        time.sleep(0.05)
+        return file_seg
+
+    monkeypatch.setattr(store, '_next_segment_file', slow_next_segment_file)
+    threads = [
+        threading.Thread(target=store.append, args=(
+            pd.DataFrame({'id': [i], 'captured_at': [pd.Timestamp('2026-01-01')], 'v': [i]}),
+        ))
+        for i in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(store._segment_files()) == 6
+    assert store.load()['v'].tolist() == list(range(6))
+
+
+def test_empty_store_loads_empty_frame(tmp_path):
+    store = DeltaSnapshotStore(str(tmp_path), key_columns=['id'], value_columns={'v': 1})
+    assert store.load().empty
+    assert store.append(pd.DataFrame()) is None
+
+
+def test_sales_velocity(tmp_path):
+    snapshots = ShopeeSnapshotStore(str(tmp_path))
+    snapshots.add_snapshot([
+        {'itemid': 1, 'shopid': 10, 'price': 10.0, 'sold': 100, 'rating': 4.5, 'rating_count': 20},
+        {'itemid': 2, 'shopid': 10, 'price': 5.0, 'sold': 7, 'rating': 4.0, 'rating_count': 3},
+    ], captured_at='2026-01-01')
+    snapshots.add_snapshot([
+        {'itemid': 1, 'shopid': 10, 'price': 12.0, 'sold': 160, 'rating': 4.6, 'rating_count': 26},
+    ], captured_at='2026-01-11')
+    df = snapshots.sales_velocity().set_index('itemid')
+    assert df.loc[1, 'snapshots'] == 2
+    assert df.loc[1, 'days'] == 10
+    assert df.loc[1, 'units_per_day'] == 6
+    assert df.loc[1, 'price_change'] == 2
+    assert np.isclose(df.loc[1, 'price_change_pct'], 20)
+    assert np.isclose(df.loc[1, 'rating_drift'], 0.1)
+    assert df.loc[1, 'rating_count_delta'] == 6
+    # 只有一份快照的商品没有速度
+    assert np.isnan(df.loc[2, 'units_per_day'])
@@ -0,0 +1,64 @@
+'''
+@Desc:   DiskTTLCache 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import sqlite3
+import time
+from source.utils import disk_cache
+from source.utils.disk_cache import DiskTTLCache
+
+
+def test_set_get_and_ttl(tmp_path):
+    cache = DiskTTLCache(str(tmp_path / 'c.sqlite'), namespace='a', ttl_seconds=60)
+    cache.set_many({'1': {'x': 1}, 2: {'x': 2}})
+    cache.set('old', {'x': 3}, fetched_at=time.time() - 120)
+    assert cache.get('1')['x'] == 1
+    assert cache.get(2)['x'] == 2
+    assert cache.get('old') is None
+    assert cache.get_many(['old'], include_stale=True)['old']['x'] == 3
+    assert cache.stale_keys(['1', 'old', 'missing']) == ['old', 'missing']
+    assert cache.purge_expired() == 1
+    assert cache.get_many(['old'], include_stale=True) == {}
+
+
+def test_namespaces_are_isolated(tmp_path):
+    file_db = str(tmp_path / 'c.sqlite')
+    DiskTTLCache(file_db, namespace='a').set('k', {'v': 'a'})
+    DiskTTLCache(file_db, namespace='b').set('k', {'v': 'b'})
+    assert DiskTTLCache(file_db, namespace='a').get('k')['v'] == 'a'
+    assert DiskTTLCache(file_db, namespace='b').get('k')['v'] == 'b'
+
+
+def test_batched_select(tmp_path):
+    cache = DiskTTLCache(str(tmp_path / 'c.sqlite'), namespace='a')
+    cache.set_many({str(i): {'i': i} for i in range(1200)})
+    values = cache.get_many(str(i) for i in range(1300))
+    assert len(values) == 1200
+    assert values['1199']['i'] == 1199
+
+
+def test_connections_are_closed(tmp_path, monkeypatch):
+    opened = []
+    original_connect = sqlite3.connect
+
+    class TrackedConnection(sqlite3.Connection):
+        closed = False
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    def connect(*args, **kwargs):
+        conn = original_connect(*args, factory=TrackedConnection, **kwargs)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(disk_cache.sqlite3, 'connect', connect)
+    cache = DiskTTLCache(str(tmp_path / 'c.sqlite'), namespace='a')
+    cache.set('k', {'v': 1})
+    cache.get('k')
+    cache.purge_expired()
+    assert len(opened) == 4
+    assert all(conn.closed for conn in opened)
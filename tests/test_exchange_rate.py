@@ -0,0 +1,149 @@
+'''
+@Desc:   ExchangeRateManager 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+
+
+def _write_rates(file_csv, rates, mtime_ns=None):
+    pd.DataFrame(rates.items(), columns=['Currency', 'Rate']).to_csv(file_csv, index=False, encoding='utf-8-sig')
+    if mtime_ns is not None:
+        os.utime(file_csv, ns=(mtime_ns, mtime_ns))
+
+
+def test_rates_are_cached_until_file_changes(tmp_path, monkeypatch):
+    file_csv = str(tmp_path / 'rates.csv')
+    _write_rates(file_csv, {'CNY': 1.0, 'USD': 0.14}, mtime_ns=1_000_000_000)
+    manager = ExchangeRateManager(csv_path=file_csv)
+
+    reads = []
+    read_csv = pd.read_csv
+    monkeypatch.setattr(pd, 'read_csv', lambda *args, **kwargs: reads.append(args) or read_csv(*args, **kwargs))
+
+    assert manager.get_rate('usd') == 0.14
+    assert manager.convert_to_cny(14, 'USD') == pytest.approx(100)
+    assert manager.convert_from_cny(100, 'USD') == pytest.approx(14)
+    assert len(reads) == 1
+
+    # 其它进程更新了文件 (修改时间变化)，下一次调用重新读取
+    _write_rates(file_csv, {'CNY': 1.0, 'USD': 0.2}, mtime_ns=2_000_000_000)
+    assert manager.get_rate('USD') == 0.2
+    assert len(reads) == 2
+    assert manager.get_rate('USD') == 0.2
+    assert len(reads) == 2
+
+
+def test_save_rates_invalidates_cache(tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    _write_rates(file_csv, {'CNY': 1.0, 'USD': 0.14})
+    manager = ExchangeRateManager(csv_path=file_csv)
+    assert manager.get_rate('USD') == 0.14
+    manager.save_rates(pd.DataFrame({'Currency': ['CNY', 'USD'], 'Rate': [1.0, 0.15]}))
+    assert manager.get_rate('USD') == 0.15
+
+
+def test_unknown_currency_and_missing_file(tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    manager = ExchangeRateManager(csv_path=file_csv)
+    assert manager.get_rates() is None
+    assert manager.convert_to_cny(1, 'USD') is None
+    _write_rates(file_csv, {'CNY': 1.0})
+    assert manager.get_rate('XXX') is None
+
+
+def test_rate_array_treats_missing_as_nan(tmp_path, capsys):
+    file_csv = str(tmp_path / 'rates.csv')
+    _write_rates(file_csv, {'CNY': 1.0, 'USD': 0.14, 'EUR': 0.12})
+    manager = ExchangeRateManager(csv_path=file_csv)
+    rates = manager.rate_array(['usd', None, float('nan'), 'EUR', 'XXX'])
+    np.testing.assert_allclose(rates, [0.14, np.nan, np.nan, 0.12, np.nan])
+    # 只有真正不支持的币种才报错，缺失值不报
+    out = capsys.readouterr().out
+    assert 'XXX' in out
+    assert 'NONE' not in out and 'NAN' not in out
+    assert np.isnan(manager.rate_array([None])).all()
+    assert len(manager.rate_array([])) == 0
+
+
+def test_convert_vectorized_matches_scalar(tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    _write_rates(file_csv, {'CNY': 1.0, 'USD': 0.14, 'EUR': 0.12, 'JPY': 20.7})
+    manager = ExchangeRateManager(csv_path=file_csv)
+    amounts = pd.Series([100.0, 250.0, 80.0, 5.0], index=list('abcd'), name='amount')
+    currencies = ['USD', 'EUR', 'JPY', None]
+    result = manager.convert(amounts, currencies, 'CNY', decimals=None)
+    assert isinstance(result, pd.Series)
+    assert result.index.tolist() == list('abcd') and result.name == 'amount'
+    expected = [manager.convert_to_cny(a, c) for a, c in zip(amounts[:3], currencies[:3])]
+    np.testing.assert_allclose(result.iloc[:3], expected)
+    assert np.isnan(result['d'])
+    # 外币 -> 外币
+    np.testing.assert_allclose(manager.convert([14.0], 'USD', 'EUR', decimals=None), [12.0])
+    # 单个币种参与广播
+    np.testing.assert_allclose(manager.convert(np.array([[1.0, 2.0]]), 'CNY', 'USD', decimals=None), [[0.14, 0.28]])
+
+
+def test_round_half_up():
+    values = np.array([1.005, 2.675, -1.005, 0.125, 0.5, 1.5, 2.5])
+    np.testing.assert_allclose(
+        ExchangeRateManager.round_half_up(values, 2),
+        [1.01, 2.68, -1.01, 0.13, 0.5, 1.5, 2.5]
+    )
+    np.testing.assert_allclose(ExchangeRateManager.round_half_up(np.array([0.5, 1.5, 2.5]), 0), [1, 2, 3])
+
+
+@pytest.fixture
+def shared_cache(tmp_path, monkeypatch):
+    """把默认共享缓存与随代码的汇率文件指向临时目录"""
+    from source.financial_analysis_system import exchange_rate
+    bundled = tmp_path / 'bundled.csv'
+    _write_rates(str(bundled), {'CNY': 1.0, 'USD': 0.14})
+    file_csv = tmp_path / 'data' / 'cache' / 'exchange_rates.csv'
+    monkeypatch.setattr(exchange_rate, 'BUNDLED_RATES_FILE', str(bundled))
+    monkeypatch.setattr(exchange_rate, 'default_rates_file', lambda: str(file_csv))
+    return file_csv
+
+
+def test_constructor_does_not_touch_filesystem(shared_cache):
+    manager = ExchangeRateManager()
+    assert not shared_cache.parent.exists()
+    # 第一次读取时才创建目录并复制初始快照
+    assert manager.get_rate('USD') == 0.14
+    assert shared_cache.exists()
+    assert manager.freshness()['source'] == 'file'
+
+
+def test_refresh_failure_keeps_snapshot(shared_cache, monkeypatch):
+    manager = ExchangeRateManager()
+    monkeypatch.setattr(manager, 'fetch_rates', lambda: None)
+    assert manager.refresh() is False
+    assert manager.get_rate('USD') == 0.14
+    info = manager.freshness()
+    assert info['last_error'] == 'fetch_rates failed'
+    assert info['last_attempt'] is not None
+    # 刚失败过，retry_seconds 内不再请求
+    calls = []
+    monkeypatch.setattr(manager, 'fetch_rates', lambda: calls.append(1))
+    assert manager.refresh_if_stale(max_age_seconds=0, retry_seconds=300) is False
+    assert calls == []
+
+
+def test_refresh_shared_between_managers(shared_cache, monkeypatch):
+    writer = ExchangeRateManager()
+    reader = ExchangeRateManager()
+    assert reader.get_rate('USD') == 0.14
+    monkeypatch.setattr(writer, 'fetch_rates', lambda: pd.DataFrame({'Currency': ['CNY', 'USD'], 'Rate': [1.0, 0.15]}))
+    assert writer.refresh() is True
+    info = reader.freshness()
+    assert info['source'] == 'api' and info['last_error'] is None
+    assert info['age_seconds'] < 60
+    # 另一个实例 (进程) 按文件修改时间重新读取
+    assert reader.get_rate('USD') == 0.15
+    # 缓存未过期时不刷新
+    assert reader.refresh_if_stale(max_age_seconds=3600) is False
@@ -0,0 +1,76 @@
+'''
+@Desc:   FXHistoryStore 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.fx_history import FXHistoryStore
+
+
+@pytest.fixture
+def fx(tmp_path):
+    store = FXHistoryStore(str(tmp_path / 'fx.npz'))
+    store.add_rates(pd.DataFrame({
+        'Date': ['2020-01-01', '2020-01-01', '2020-02-01', '2020-03-01'],
+        'Currency': ['USD', 'EUR', 'USD', 'EUR'],
+        'Rate': [0.14, 0.13, 0.15, 0.12],
+    }))
+    return store
+
+
+def test_normalize_dates_formats(fx):
+    dates = fx.normalize_dates([202001, '202002', 20200203, '20200203', 20200203.0, '2020-02-03',
+                                pd.Timestamp('2020-02-03 10:00'), None, 'bad'])
+    expected = np.array(['2020-01-01', '2020-02-01'] + ['2020-02-03'] * 5 + ['NaT', 'NaT'], dtype='datetime64[D]')
+    np.testing.assert_array_equal(dates, expected)
+
+
+def test_normalize_dates_monthly(tmp_path):
+    fx = FXHistoryStore(str(tmp_path / 'fx.npz'), freq='M')
+    np.testing.assert_array_equal(
+        fx.normalize_dates([20200215, '2020-03-31']),
+        np.array(['2020-02-01', '2020-03-01'], dtype='datetime64[D]')
+    )
+
+
+def test_monthly_keeps_latest_date_regardless_of_order(tmp_path):
+    fx = FXHistoryStore(str(tmp_path / 'fx.npz'), freq='M')
+    fx.add_rates(pd.DataFrame({
+        'Date': ['2020-02-28', '2020-02-03', '2020-02-15', '2020-03-02', '2020-03-01', '2020-03-01'],
+        'Currency': ['USD'] * 6,
+        'Rate': [0.15, 0.13, 0.14, np.nan, 0.16, 0.17],
+    }))
+    np.testing.assert_array_equal(fx.dates, np.array(['2020-02-01', '2020-03-01'], dtype='datetime64[D]'))
+    # 2 月取 02-28 的值；3 月 02 日缺失不覆盖，同一日期重复时取后一条
+    np.testing.assert_allclose(fx.rates_asof([202002, 202003], 'USD'), [0.15, 0.17])
+
+
+def test_rates_asof(fx):
+    rates = fx.rates_asof([20200203, 20200203, '2019-12-31', '2020-03-15', '2020-03-15', '2020-03-15'],
+                          ['USD', 'EUR', 'USD', 'usd', 'EUR', 'XXX'])
+    # EUR 在 2020-02-01 缺失，沿用 2020-01-01 的值；USD 在 2020-03-01 缺失，沿用 2020-02-01 的值
+    np.testing.assert_allclose(rates, [0.15, 0.13, np.nan, 0.15, 0.12, np.nan])
+    np.testing.assert_allclose(fx.rates_asof([20200203], 'USD'), [0.15])
+    assert fx.rates_asof('2020-01-10', 'CNY') == 1.0
+
+
+def test_convert_and_save_load(fx, tmp_path):
+    amounts = pd.Series([14.0, 15.0, 13.0], index=['a', 'b', 'c'])
+    result = fx.convert(amounts, 'USD', 'CNY', [20200115, 202002, '2020-01-31'])
+    assert result.tolist() == [100.0, 100.0, 92.86]
+    assert result.index.tolist() == ['a', 'b', 'c']
+    np.testing.assert_allclose(fx.convert([100.0], 'CNY', 'EUR', [202003]), [12.0])
+
+    fx.save()
+    loaded = FXHistoryStore(str(tmp_path / 'fx.npz'))
+    np.testing.assert_array_equal(loaded.dates, fx.dates)
+    pd.testing.assert_frame_equal(loaded.to_dataframe(), fx.to_dataframe())
+
+
+def test_convert_frame_with_currency_column(fx):
+    df = pd.DataFrame({'金额': [14.0, 13.0], '币种': ['USD', 'EUR'], '日期': [20200110, 20200110]})
+    out = fx.convert_frame(df, '金额', '日期', '币种', 'CNY')
+    assert out['金额(CNY)'].tolist() == [100.0, 100.0]
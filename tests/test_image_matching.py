@@ -0,0 +1,132 @@
+'''
+@Desc:   感知哈希索引测试：多索引哈希检索结果与暴力汉明距离搜索一致
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from source.supplier_management.image_matching import (
+    PerceptualHashIndex,
+    dhash,
+    hash_files,
+    match_supplier_images,
+    phash,
+    popcount64,
+)
+
+
+def _random_hashes(rng, n):
+    return rng.integers(0, 2 ** 63, size=n, dtype=np.uint64) * np.uint64(2) + rng.integers(0, 2, size=n, dtype=np.uint64)
+
+
+def _flip_bits(rng, h, n_bits):
+    bits = rng.choice(64, size=n_bits, replace=False)
+    return np.uint64(h) ^ np.uint64(sum(1 << int(b) for b in bits))
+
+
+def _brute_force(hashes, query_hashes, max_distance):
+    result = set()
+    for qi, q in enumerate(query_hashes):
+        for ci, h in enumerate(hashes):
+            d = bin(int(q) ^ int(h)).count('1')
+            if d <= max_distance:
+                result.add((qi, ci, d))
+    return result
+
+
+def test_popcount64_matches_python():
+    rng = np.random.default_rng(0)
+    x = _random_hashes(rng, 100)
+    assert popcount64(x).tolist() == [bin(int(v)).count('1') for v in x]
+
+
+@pytest.mark.parametrize('n_chunks,max_distance', [(4, 10), (8, 12), (2, 5)])
+def test_query_batch_matches_brute_force(n_chunks, max_distance):
+    rng = np.random.default_rng(n_chunks)
+    hashes = _random_hashes(rng, 300)
+    # 查询为库中哈希随机翻转 0..max_distance+3 位，覆盖阈值内外
+    sources = rng.integers(0, len(hashes), size=60)
+    queries = np.array([
+        _flip_bits(rng, hashes[s], int(rng.integers(0, max_distance + 4))) for s in sources
+    ], dtype=np.uint64)
+    index = PerceptualHashIndex(n_chunks=n_chunks)
+    keys = np.array([f'k{i}' for i in range(len(hashes))], dtype=object)
+    index.add(keys, hashes)
+
+    df = index.query_batch(queries, max_distance=max_distance, k=len(hashes))
+    found = {
+        (int(q), int(k[1:]), int(d))
+        for q, k, d in zip(df['query_idx'], df['key'], df['distance'])
+    }
+    assert found == _brute_force(hashes, queries, max_distance)
+    # 每个查询内按距离升序
+    assert (df.groupby('query_idx')['distance'].diff().dropna() >= 0).all()
+
+
+def test_query_batch_keeps_k_nearest():
+    base = np.uint64(0)
+    hashes = np.array([base ^ np.uint64((1 << d) - 1) for d in (5, 1, 3, 0, 7)], dtype=np.uint64)
+    index = PerceptualHashIndex()
+    index.add(['d5', 'd1', 'd3', 'd0', 'd7'], hashes)
+    df = index.query(int(base), max_distance=6, k=3)
+    assert df['key'].tolist() == ['d0', 'd1', 'd3']
+    assert df['distance'].tolist() == [0, 1, 3]
+
+
+def test_empty_index_and_save_load(tmp_path):
+    index = PerceptualHashIndex()
+    assert index.query(123).empty
+
+    rng = np.random.default_rng(1)
+    hashes = _random_hashes(rng, 20)
+    index.add([f'k{i}' for i in range(20)], hashes)
+    file_npz = str(tmp_path / 'index.npz')
+    index.save(file_npz)
+    loaded = PerceptualHashIndex.load(file_npz)
+    assert loaded.keys.tolist() == index.keys.tolist()
+    np.testing.assert_array_equal(loaded.hashes, hashes)
+    assert loaded.query(int(hashes[3]), max_distance=0)['key'].tolist() == ['k3']
+
+
+def _draw(path, shift=0, size=(200, 160)):
+    im = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(im)
+    draw.rectangle([20 + shift, 30, 120 + shift, 140], fill='black')
+    draw.ellipse([100, 10, 190, 90], fill='gray')
+    im.save(path)
+    return im
+
+
+def test_hashes_are_robust_to_resize(tmp_path):
+    im = _draw(tmp_path / 'a.png')
+    resized = im.resize((100, 80))
+    for func in (phash, dhash):
+        assert bin(func(im) ^ func(resized)).count('1') <= 4
+
+
+def test_hash_files_returns_hashes_and_valid_mask(tmp_path):
+    im = _draw(tmp_path / 'a.png')
+    (tmp_path / 'broken.png').write_bytes(b'not an image')
+    hashes, valid = hash_files([str(tmp_path / 'a.png'), str(tmp_path / 'broken.png')], max_workers=1)
+    assert hashes.dtype == np.uint64 and valid.dtype == bool
+    assert valid.tolist() == [True, False]
+    assert hashes.tolist() == [phash(im), 0]
+
+
+def test_match_supplier_images(tmp_path):
+    _draw(tmp_path / 'product.png')
+    _draw(tmp_path / 'other.png', shift=70)
+    Image.new('RGB', (200, 160), 'white').save(tmp_path / 'blank.png')
+    _draw(tmp_path / 'supplier.png', size=(200, 160)).resize((300, 240)).save(tmp_path / 'supplier.png')
+
+    index = PerceptualHashIndex()
+    index.add_files({
+        'product': str(tmp_path / 'product.png'),
+        'other': str(tmp_path / 'other.png'),
+        'blank': str(tmp_path / 'blank.png'),
+    }, max_workers=2)
+    df = match_supplier_images(index, {'s1': str(tmp_path / 'supplier.png')}, max_distance=8, max_workers=2)
+    assert df.iloc[0]['supplier_key'] == 's1'
+    assert df.iloc[0]['key'] == 'product'
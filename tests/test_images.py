@@ -0,0 +1,122 @@
+'''
+@Desc:   ImageStore 测试 (本地图片服务)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import json
+import hashlib
+from io import BytesIO
+from PIL import Image, JpegImagePlugin
+from source.utils.images import ImageStore
+
+
+def _leftover_downloads(path_store):
+    return [name for name in os.listdir(path_store) if name.endswith('.download')]
+
+
+def test_download_many_dedups_by_content(image_server, tmp_path):
+    base_url, requests_seen = image_server
+    store = ImageStore(str(tmp_path), thumb_sizes=[(32, 32)])
+    result = store.download_many({
+        'a': f'{base_url}/red.png',
+        'b': f'{base_url}/red.png?v=2',
+        'c': f'{base_url}/red.png',
+        'd': f'{base_url}/blue.png',
+    })
+    assert result['a'] == result['b'] == result['c'] != result['d']
+    # 相同 URL 只请求一次
+    assert len(requests_seen) == 3
+    with Image.open(store.path('a')) as im:
+        assert im.size == (64, 48)
+    with Image.open(store.path('a', (32, 32))) as im:
+        assert max(im.size) == 32
+    assert _leftover_downloads(tmp_path) == []
+
+    # 再次下载全部命中索引
+    store.download_many({'a': f'{base_url}/red.png'})
+    assert len(requests_seen) == 3
+
+
+def test_download_streams_without_buffering(image_server, tmp_path, monkeypatch):
+    base_url, _ = image_server
+    store = ImageStore(str(tmp_path))
+
+    def fail(content):
+        raise AssertionError('不应整体读入内存')
+
+    monkeypatch.setattr(store, 'store_bytes', fail)
+    result = store.download_many({'a': f'{base_url}/green.png'})
+    assert os.path.exists(store.path('a'))
+    assert result['a'] == store.index['a']['sha256']
+
+
+def test_failed_download_leaves_no_temp_file(image_server, tmp_path):
+    base_url, _ = image_server
+    store = ImageStore(str(tmp_path))
+    result = store.download_many({'missing': f'{base_url}/missing'}, retries=0)
+    assert result == {}
+    assert _leftover_downloads(tmp_path) == []
+
+
+def test_save_index_merges_entries_from_other_stores(image_server, tmp_path):
+    base_url, _ = image_server
+    # 两个实例模拟两个进程：都在对方写回之前读取了索引
+    store_a = ImageStore(str(tmp_path))
+    store_b = ImageStore(str(tmp_path))
+    store_a.download_many({'a': f'{base_url}/red.png'})
+    store_b.download_many({'b': f'{base_url}/blue.png'})
+    with open(tmp_path / 'index.json', 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    assert set(index) == {'a', 'b'}
+    assert set(store_b.index) == {'a', 'b'}
+    # 重新加载后两个 key 都在
+    assert set(ImageStore(str(tmp_path)).index) == {'a', 'b'}
+
+
+def test_original_format_and_bytes_are_kept(image_server, tmp_path):
+    base_url, _ = image_server
+    store = ImageStore(str(tmp_path), thumb_sizes=[(32, 32)])
+    result = store.download_many({'png': f'{base_url}/red.png', 'jpg': f'{base_url}/red.jpg'})
+    for key, ext, img_format in [('png', '.png', 'PNG'), ('jpg', '.jpg', 'JPEG')]:
+        file_img = store.path(key)
+        assert file_img.endswith(ext)
+        # 原图不重新编码：文件内容的哈希就是内容哈希
+        with open(file_img, 'rb') as f:
+            assert hashlib.sha256(f.read()).hexdigest() == result[key]
+        with Image.open(store.path(key, (32, 32))) as im:
+            assert im.format == img_format
+    # 新实例按磁盘上的原图找到扩展名
+    assert ImageStore(str(tmp_path), thumb_sizes=[(32, 32)]).path('jpg') == store.path('jpg')
+
+
+def test_explicit_format_converts(image_server, tmp_path):
+    base_url, _ = image_server
+    store = ImageStore(str(tmp_path), img_format='jpeg')
+    store.download_many({'a': f'{base_url}/red.png'})
+    with Image.open(store.path('a')) as im:
+        assert store.path('a').endswith('.jpg')
+        assert im.format == 'JPEG'
+
+
+def test_jpeg_thumbnails_use_draft_decoding(tmp_path, monkeypatch):
+    buffer = BytesIO()
+    Image.new('RGB', (1600, 1200), 'red').save(buffer, format='JPEG')
+    drafts = []
+    draft = JpegImagePlugin.JpegImageFile.draft
+
+    def spy(self, mode, size):
+        result = draft(self, mode, size)
+        drafts.append(self.size)
+        return result
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, 'draft', spy)
+    store = ImageStore(str(tmp_path), thumb_sizes=[(120, 120)])
+    digest = store.store_bytes(buffer.getvalue())
+    # 解码阶段已降采样到缩略图 2 倍附近，而不是完整的 1600x1200
+    assert drafts and max(drafts[0]) <= 480
+    with Image.open(store.object_path(digest, (120, 120))) as im:
+        assert im.size == (120, 90)
+    with Image.open(store.object_path(digest)) as im:
+        assert im.size == (1600, 1200)
@@ -0,0 +1,121 @@
+'''
+@Desc:   TariffTable 最长前缀匹配与到岸成本测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.cost_engine import CostEngine
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+from source.financial_analysis_system.landed_cost import TariffTable, landed_cost, normalize_hs
+
+
+@pytest.fixture
+def tariffs():
+    return TariffTable(pd.DataFrame({
+        '国家': ['US', 'US', 'de', 'DE', 'GB', 'US'],
+        'HS前缀': ['8414', '8414.51', '84', '8518', '84', '8414'],
+        '关税率': [0.05, 0.0, 0.017, 0.02, 0.0, 0.047],
+        '增值税率': [0.0, 0.0, 0.19, 0.19, 0.2, 0.0],
+        '计税基础': ['FOB', 'FOB', 'CIF', 'CIF', 'cif', 'FOB'],
+    }))
+
+
+def _as_list(s):
+    """缺失值统一为 None"""
+    return [None if pd.isna(v) else v for v in s]
+
+
+def test_normalize_hs():
+    assert normalize_hs(['8414.51.00', ' 8518 30 ', 851830]).tolist() == ['84145100', '851830', '851830']
+    # 读成浮点数的编码不能多出末尾的 0
+    assert normalize_hs([841451.0, np.float64(8518.0), '8414.10']).tolist() == ['841451', '8518', '841410']
+    assert normalize_hs(pd.Series([841451.0, 851830.0])).tolist() == ['841451', '851830']
+
+
+def test_lookup_float_codes():
+    table = TariffTable(pd.DataFrame({
+        '国家': ['US', 'US'], 'HS前缀': ['8414', '84140'], '关税率': [0.047, 0.1], '增值税率': [0.0, 0.0],
+    }))
+    df = table.lookup(pd.Series([8414.0, 841400.0]).to_numpy(), 'US')
+    assert df['匹配前缀'].tolist() == ['8414', '84140']
+    np.testing.assert_allclose(df['关税率'], [0.047, 0.1])
+
+
+def test_lookup_longest_prefix(tariffs):
+    df = tariffs.lookup(['8414.51.00', '841460', '8518.30', '841451', '9999', None, '84'],
+                        ['US', 'us', 'DE', 'DE', 'US', 'US', 'GB'])
+    assert _as_list(df['匹配前缀']) == ['841451', '8414', '8518', '84', None, None, '84']
+    # 同一 (国家, 前缀) 重复时以最后一行为准
+    np.testing.assert_allclose(df['关税率'], [0.0, 0.047, 0.02, 0.017, np.nan, np.nan, 0.0])
+    assert _as_list(df['计税基础']) == ['FOB', 'FOB', 'CIF', 'CIF', None, None, 'CIF']
+
+
+def test_lookup_matches_brute_force():
+    rng = np.random.default_rng(0)
+    prefixes = {''.join(rng.choice(list('0123'), size=n)) for n in (2, 4, 6, 8) for _ in range(40)}
+    table = pd.DataFrame([(c, p, rng.random(), rng.random()) for p in sorted(prefixes) for c in ('US', 'DE')
+                          if rng.random() < 0.7], columns=['国家', 'HS前缀', '关税率', '增值税率'])
+    tariffs = TariffTable(table)
+    codes = [''.join(rng.choice(list('0123'), size=10)) for _ in range(500)]
+    countries = rng.choice(['US', 'DE', 'FR'], size=500)
+    df = tariffs.lookup(codes, countries)
+
+    rates = {(c, p): d for c, p, d in zip(table['国家'], table['HS前缀'], table['关税率'])}
+    for code, country, got_prefix, got_duty in zip(codes, countries, df['匹配前缀'], df['关税率']):
+        candidates = [code[:n] for n in range(len(code), 0, -1) if (country, code[:n]) in rates]
+        if candidates:
+            assert got_prefix == candidates[0]
+            assert got_duty == rates[(country, candidates[0])]
+        else:
+            assert pd.isna(got_prefix) and np.isnan(got_duty)
+
+
+def test_landed_cost_cif_fob(tariffs):
+    lines = pd.DataFrame({
+        'HS编码': ['8414.51.00', '851830', '841460'],
+        '单价(CNY)': [35.0, 120.0, 10.0],
+        '数量': [100, 50, 10],
+        '运输成本(CNY)': [300.0, 260.0, 40.0],
+        '国家': ['US', 'DE', 'US'],
+    })
+    df = landed_cost(lines, tariffs)
+    # US 8414 FOB：关税按货值计算
+    assert df.loc[2, '关税(CNY)'] == pytest.approx(100 * 0.047)
+    # DE 8518 CIF：关税按 货值 + 运费，增值税按 (计税基础 + 关税)
+    base = 6000 + 260
+    assert df.loc[1, '关税(CNY)'] == pytest.approx(base * 0.02)
+    assert df.loc[1, '增值税(CNY)'] == pytest.approx(base * 1.02 * 0.19)
+    assert df.loc[1, '到岸成本(CNY)'] == pytest.approx(6000 + 260 + base * 0.02 + base * 1.02 * 0.19)
+    assert df.loc[0, '到岸成本(CNY)'] == pytest.approx(3500 + 300)
+
+
+def test_landed_cost_cross_countries(tariffs, capsys):
+    lines = pd.DataFrame({'HS编码': ['851830'], '单价(CNY)': [10.0], '数量': [1], '运输成本(CNY)': [2.0]})
+    df = landed_cost(lines, tariffs, countries=['US', 'DE', 'GB'])
+    assert df['国家'].tolist() == ['US', 'DE', 'GB']
+    # 851830 在 US、GB 都没有匹配的前缀
+    assert np.isnan(df.loc[0, '到岸成本(CNY)']) and np.isnan(df.loc[2, '到岸成本(CNY)'])
+    assert df.loc[1, '匹配前缀'] == '8518'
+    assert '2 行未匹配' in capsys.readouterr().out
+    with pytest.raises(ValueError, match='国家'):
+        landed_cost(lines, tariffs)
+
+
+def test_cost_engine_landed(tariffs, tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    pd.DataFrame({'Currency': ['CNY', 'USD'], 'Rate': [1.0, 0.14]}).to_csv(file_csv, index=False)
+    products = pd.DataFrame({
+        'SKU': ['FAN'], '商品名': ['风扇'], '供应商名': ['甲'], '单价(CNY)': [35.0], '重量(kg)': [0.5],
+        'HS编码': ['8414.51.00'],
+    })
+    logistics = pd.DataFrame({
+        'ID': ['L1'], '物流公司': ['顺丰'], '运输方式': ['空运'], '单件运费(CNY)': [1.0], '按kg运费(CNY)': [10.0],
+    })
+    engine = CostEngine(products, logistics, ExchangeRateManager(csv_path=file_csv))
+    df = engine.landed([{'SKU': 'FAN', '数量': 10, '物流SKU': 'L1', '国家': 'GB'}], tariffs, currency=['CNY', 'USD'])
+    # 货值 350 + 运费 max(10, 10 * 0.5 * 10) = 50；GB 增值税 20%
+    assert df.loc[0, '到岸成本(CNY)'] == pytest.approx((350 + 50) * 1.2)
+    assert df.loc[0, '到岸成本(USD)'] == pytest.approx(round(480 * 0.14, 2))
@@ -0,0 +1,127 @@
+'''
+@Desc:   跨平台相似商品聚类测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from source.financial_analysis_system.exchange_rate import BUNDLED_RATES_FILE, ExchangeRateManager
+from source.utils.number_parser import DECIMAL_COMMA_MARKETS
+from source.product_research.listing_clusters import (
+    AMAZON_MARKET_CURRENCY,
+    ListingClusterer,
+    cluster_listings,
+    normalize_amazon,
+    normalize_shopee,
+)
+
+
+def test_normalize_amazon_parses_eu_prices():
+    df = pd.DataFrame({
+        'asin': ['A1', 'A2', 'A3', 'A4'],
+        'marketplace': ['de', 'fr', 'com', 'de'],
+        'title': ['a', 'b', 'c', 'd'],
+        'price': pd.Series(['9,99 €', '1.299,00 €', '$1,299.00', None], dtype='str'),
+    })
+    out = normalize_amazon(df)
+    np.testing.assert_allclose(out['price'].iloc[:3], [9.99, 1299.0, 1299.0])
+    assert np.isnan(out['price'].iloc[3])
+    assert out['currency'].tolist() == ['EUR', 'EUR', 'USD', 'EUR']
+
+
+def test_normalize_amazon_uses_given_marketplace():
+    df = pd.DataFrame({'asin': ['A1'], 'title': ['fan'], 'price': ['12,50 €']})
+    out = normalize_amazon(df, marketplace='de')
+    assert out['market'].tolist() == ['de']
+    assert out['price'].tolist() == [12.5]
+
+
+def test_decimal_comma_markets_have_currency():
+    assert DECIMAL_COMMA_MARKETS <= set(AMAZON_MARKET_CURRENCY)
+    df = pd.DataFrame({
+        'asin': ['A1', 'A2', 'A3', 'A4'],
+        'marketplace': ['se', 'pl', 'com.be', 'com.tr'],
+        'title': ['a', 'b', 'c', 'd'],
+        'price': ['129,00 kr', '49,99 zł', '9,99 €', '1.299,00 TL'],
+    })
+    out = normalize_amazon(df)
+    assert out['currency'].tolist() == ['SEK', 'PLN', 'EUR', 'TRY']
+    np.testing.assert_allclose(out['price'], [129.0, 49.99, 9.99, 1299.0])
+
+
+def test_cluster_near_duplicate_titles():
+    titles = [
+        'Portable Mini Neck Fan USB Rechargeable 3 Speeds',
+        'Portable Mini Neck Fan USB Rechargeable 3 Speed',
+        'portable mini neck fan usb rechargeable 3 speeds black',
+        'Stainless Steel Water Bottle 1L Insulated',
+        'Stainless Steel Water Bottle 1L Insulated Vacuum',
+        'Wireless Gaming Mouse RGB',
+    ]
+    labels = ListingClusterer(seed=1).cluster(titles)
+    assert labels[0] == labels[1] == labels[2]
+    assert labels[3] == labels[4]
+    assert len({labels[0], labels[3], labels[5]}) == 3
+
+
+def test_dissimilar_bucket_member_does_not_split_similar_pair():
+    # 三者第一段签名相同 (同桶)，B 排在 A、C 之间；A-C 相似度 0.75，A-B、B-C 只有 0.5
+    sig = np.array([
+        [1, 1, 1, 1, 2, 2, 2, 2],
+        [1, 1, 1, 1, 7, 7, 7, 7],
+        [1, 1, 1, 1, 2, 2, 9, 9],
+    ], dtype=np.uint32)
+    clusterer = ListingClusterer(num_perm=8, bands=2, threshold=0.6)
+    pairs = clusterer._candidate_pairs(sig)
+    assert sorted(map(tuple, pairs.tolist())) == [(0, 2)]
+    labels = clusterer._connected_components(3, pairs)
+    assert labels[0] == labels[2] != labels[1]
+
+
+def test_identical_signatures_are_linked():
+    sig = np.repeat(np.arange(8, dtype=np.uint32)[None, :], 5, axis=0)
+    sig[3] += 100
+    pairs = ListingClusterer(num_perm=8, bands=2)._candidate_pairs(sig)
+    labels = ListingClusterer._connected_components(5, pairs)
+    assert len(set(labels[[0, 1, 2, 4]])) == 1
+    assert labels[3] != labels[0]
+
+
+def test_connected_components_are_transitive():
+    pairs = np.array([[0, 1], [1, 2], [4, 5]])
+    labels = ListingClusterer._connected_components(6, pairs)
+    assert labels[0] == labels[1] == labels[2]
+    assert labels[4] == labels[5]
+    assert len(set(labels)) == 3
+
+
+def test_cluster_listings_converts_eu_prices():
+    title = 'Portable Mini Neck Fan USB Rechargeable'
+    df_amazon = pd.DataFrame({
+        'asin': ['A1', 'A2'],
+        'marketplace': ['de', 'com'],
+        'title': [title, title],
+        'price': ['9,99 €', '$12.00'],
+    })
+    df_shopee = pd.DataFrame({
+        'itemid': [1],
+        'shopid': [2],
+        'region': ['SG'],
+        'title': [title],
+        'price': [20.0],
+        'currency': ['SGD'],
+    })
+    manager = ExchangeRateManager(csv_path=BUNDLED_RATES_FILE)
+    listings, clusters = cluster_listings(
+        [normalize_amazon(df_amazon), normalize_shopee(df_shopee)],
+        target_currency='USD',
+        exchange_manager=manager
+    )
+    assert listings['cluster_id'].nunique() == 1
+    rates = manager.get_rates()
+    expected_eur = 9.99 / rates['EUR'] * rates['USD']
+    np.testing.assert_allclose(listings['price_USD'].iloc[0], expected_eur)
+    row = clusters.iloc[0]
+    assert row['listings'] == 3 and row['platforms'] == 2 and row['markets'] == 3
+    np.testing.assert_allclose(row['min_price'], expected_eur)
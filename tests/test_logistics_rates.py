@@ -0,0 +1,72 @@
+'''
+@Desc:   LogisticsRateEngine 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.logistics_rates import LogisticsRateEngine, shipments_from_orders
+
+
+@pytest.fixture
+def engine():
+    rate_card = pd.DataFrame({
+        'ID': ['LS001'] * 3 + ['LS002'] * 2 + ['LS003'],
+        '区域': ['US'] * 5 + ['DE'],
+        '起始重量(kg)': [0, 0.5, 2, 0, 1, 0],
+        '每kg运费(CNY)': [90, 80, 70, 60, 55, 40],
+        '挂号费(CNY)': [18, 18, 15, 25, 25, 10],
+        '最低收费(CNY)': [30, 30, 30, 40, 40, 0],
+        '区域附加费(CNY)': [0, 0, 0, 5, 5, 0],
+        '体积重系数': [8000, 8000, 8000, 6000, 6000, 6000],
+        '计费单位(kg)': [0.1, 0.1, 0.1, 0.5, 0.5, 0],
+        '最高重量(kg)': [30, 30, 30, 30, 30, 2],
+    })
+    logistics = pd.DataFrame({'ID': ['LS001', 'LS002'], '物流公司': ['顺丰', '云途'], '运输方式': ['空运', '海运']})
+    return LogisticsRateEngine(rate_card, logistics)
+
+
+def _expected(weight, volume, per_kg_steps, fee_steps, starts, divisor, step, minimum, surcharge):
+    """逐个货件按规则计算，作为对照"""
+    chargeable = max(weight, volume / divisor)
+    if step > 0:
+        chargeable = np.ceil(round(chargeable / step, 9)) * step
+    tier = max(i for i, s in enumerate(starts) if s <= chargeable)
+    return round(max(chargeable * per_kg_steps[tier] + fee_steps[tier], minimum) + surcharge, 2), chargeable
+
+
+def test_quote_matches_rules(engine):
+    shipments = pd.DataFrame({'重量(kg)': [0.3, 1.2, 5.0, 0.01], '体积(cm3)': [1000, 12000, 20000, 0]})
+    quotes = engine.quote(shipments, zone='US').set_index(['shipment_idx', 'ID'])
+    for i, row in shipments.iterrows():
+        price, chargeable = _expected(row['重量(kg)'], row['体积(cm3)'], [90, 80, 70], [18, 18, 15],
+                                      [0, 0.5, 2], 8000, 0.1, 30, 0)
+        assert quotes.loc[(i, 'LS001'), '运费(CNY)'] == pytest.approx(price)
+        assert quotes.loc[(i, 'LS001'), '计费重量(kg)'] == pytest.approx(chargeable)
+        price, _ = _expected(row['重量(kg)'], row['体积(cm3)'], [60, 55], [25, 25], [0, 1], 6000, 0.5, 40, 5)
+        assert quotes.loc[(i, 'LS002'), '运费(CNY)'] == pytest.approx(price)
+    assert quotes.loc[(0, 'LS001'), '物流公司'] == '顺丰'
+    # DE 方案不报给 US 货件
+    assert 'LS003' not in quotes.index.get_level_values('ID')
+
+
+def test_max_weight_and_cheapest(engine):
+    shipments = pd.DataFrame({'重量(kg)': [1.0, 3.0, 0.5], '区域': ['DE', 'DE', 'FR']})
+    quotes = engine.quote(shipments)
+    # 3kg 超出 LS003 的最高重量，FR 没有方案
+    assert quotes['shipment_idx'].tolist() == [0]
+    best = engine.cheapest(shipments)
+    assert best['ID'].tolist()[0] == 'LS003'
+    assert best['运费(CNY)'].iloc[0] == 50.0
+    assert best['ID'].isna().tolist() == [False, True, True]
+
+
+def test_shipments_from_orders_scale_with_quantity():
+    products = pd.DataFrame({
+        'SKU': ['A', 'B'], '重量(kg)': [0.4, 1.5], '长(cm)': [10, 20], '宽(cm)': [10, 20], '高(cm)': [5, 10]
+    })
+    shipments = shipments_from_orders(pd.DataFrame({'SKU': ['A', 'B'], '数量': [10, 2]}), products)
+    np.testing.assert_allclose(shipments['重量(kg)'], [4.0, 3.0])
+    np.testing.assert_allclose(shipments['体积(cm3)'], [5000, 8000])
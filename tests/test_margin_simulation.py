@@ -0,0 +1,111 @@
+'''
+@Desc:   MarginSimulator 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+from source.financial_analysis_system.fx_history import FXHistoryStore
+from source.financial_analysis_system.margin_simulation import MarginSimulator
+
+
+@pytest.fixture
+def manager(tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    pd.DataFrame({'Currency': ['CNY', 'USD', 'EUR'], 'Rate': [1.0, 0.14, 0.12]}).to_csv(file_csv, index=False)
+    return ExchangeRateManager(csv_path=file_csv)
+
+
+@pytest.fixture
+def df_input():
+    return pd.DataFrame({
+        'SKU': ['FAN', 'FAN', 'SPK', 'CUP', 'X'],
+        '市场': ['US', 'DE', 'CN', 'US', 'ZZ'],
+        '售价': [19.99, 18.99, 200.0, 5.0, 10.0],
+        '币种': ['USD', 'eur', 'CNY', 'USD', 'XXX'],
+        '单件成本(CNY)': [35.0, 35.0, 120.0, 20.36, 1.0],
+        '单件运费(CNY)': [28.0, 32.0, 18.0, 10.0, 1.0],
+        '费率': [0.15, 0.15, 0.1, 0.15, 0.0],
+    })
+
+
+def _deterministic_margin(df, rates):
+    revenue = df['售价'] / df['币种'].str.upper().map(rates)
+    profit = revenue * (1 - df['费率']) - df['单件成本(CNY)'] - df['单件运费(CNY)']
+    return (profit / revenue).to_numpy(), profit.to_numpy()
+
+
+def test_zero_volatility_is_deterministic(manager, df_input):
+    simulator = MarginSimulator(manager, n_scenarios=200, freight_vol=0.0, default_fx_vol=0.0)
+    result = simulator.simulate(df_input)
+    margin, profit = _deterministic_margin(df_input.iloc[:4], {'CNY': 1.0, 'USD': 0.14, 'EUR': 0.12})
+    for col in ['毛利率_p5', '毛利率_p50', '毛利率_p95', '毛利率_均值']:
+        np.testing.assert_allclose(result[col].iloc[:4], margin)
+    np.testing.assert_allclose(result['期望毛利(CNY)'].iloc[:4], profit)
+    np.testing.assert_array_equal(result['亏损概率'].iloc[:4], (profit < 0).astype(float))
+    # 不支持的币种结果为空
+    assert result.iloc[4][['毛利率_p50', '亏损概率']].isna().all()
+
+
+def test_seed_and_chunking_are_reproducible(manager, df_input):
+    a = MarginSimulator(manager, n_scenarios=500, seed=7).simulate(df_input, chunk_rows=2)
+    b = MarginSimulator(manager, n_scenarios=500, seed=7).simulate(df_input, chunk_rows=1000)
+    pd.testing.assert_frame_equal(a, b)
+    c = MarginSimulator(manager, n_scenarios=500, seed=8).simulate(df_input)
+    assert not np.allclose(a['毛利率_p5'].iloc[:2], c['毛利率_p5'].iloc[:2])
+
+
+def test_default_chunks_stay_within_memory_budget(manager, df_input):
+    df = pd.concat([df_input.iloc[:4]] * 500, ignore_index=True)
+    simulator = MarginSimulator(manager, n_scenarios=2000)
+    tracemalloc.start()
+    try:
+        result = simulator.simulate(df, memory_mb=8)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # 2000 行一次算完需要数百 MB，按预算分块后峰值与预算同一量级
+    assert peak < 24 * 2 ** 20
+    pd.testing.assert_frame_equal(result, simulator.simulate(df, chunk_rows=len(df)))
+
+
+def test_volatility_spreads_margins(manager, df_input):
+    result = MarginSimulator(manager, n_scenarios=5000, default_fx_vol=0.01, freight_vol=0.3).simulate(df_input)
+    margin, _ = _deterministic_margin(df_input.iloc[:4], {'CNY': 1.0, 'USD': 0.14, 'EUR': 0.12})
+    assert (result['毛利率_p5'].iloc[:4] < result['毛利率_p50'].iloc[:4]).all()
+    assert (result['毛利率_p50'].iloc[:4] < result['毛利率_p95'].iloc[:4]).all()
+    np.testing.assert_allclose(result['毛利率_p50'].iloc[:4], margin, atol=0.03)
+    # CUP 的确定性毛利接近 0，亏损概率介于 0 与 1 之间；FAN 毛利充足不会亏损
+    assert 0.2 < result['亏损概率'].iloc[3] < 0.8
+    assert result['亏损概率'].iloc[0] == 0
+
+
+def test_fx_covariance_from_history(manager, tmp_path):
+    fx = FXHistoryStore(str(tmp_path / 'fx.npz'))
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2024-01-01', periods=200, freq='D')
+    log_usd = np.cumsum(rng.normal(0, 0.005, size=200))
+    fx.add_rates(pd.DataFrame({
+        'Date': np.concatenate([dates, dates]),
+        'Currency': ['USD'] * 200 + ['EUR'] * 200,
+        'Rate': np.concatenate([0.14 * np.exp(log_usd), 0.12 * np.exp(2 * log_usd)]),
+    }))
+    simulator = MarginSimulator(manager, fx_history=fx, default_fx_vol=0.004)
+    cov = simulator.fx_covariance(['USD', 'EUR', 'CNY', 'JPY'])
+    var_usd = np.var(np.diff(log_usd), ddof=1)
+    np.testing.assert_allclose(cov[0, 0], var_usd)
+    # EUR 对数收益为 USD 的 2 倍
+    np.testing.assert_allclose(cov[1, 1], 4 * var_usd)
+    np.testing.assert_allclose(cov[0, 1], 2 * var_usd)
+    assert (cov[2] == 0).all() and (cov[:, 2] == 0).all()
+    assert cov[3, 3] == pytest.approx(0.004 ** 2)
+    assert cov[0, 3] == 0
+
+
+def test_missing_columns(manager, df_input):
+    with pytest.raises(ValueError, match='售价'):
+        MarginSimulator(manager).simulate(df_input.drop(columns=['售价']))
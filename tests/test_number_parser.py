@@ -0,0 +1,35 @@
+'''
+@Desc:   number_parser 测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from source.utils.number_parser import decimal_separators, parse_numbers
+
+
+def test_decimal_point_markets():
+    values = pd.Series(['$11.99', '1,300', 'US$1,234.50', '', None, 'n/a'], dtype='str')
+    np.testing.assert_allclose(parse_numbers(values), [11.99, 1300, 1234.5, np.nan, np.nan, np.nan])
+
+
+def test_decimal_comma_markets():
+    values = ['9,99 €', '1.300', '1.234,50 €', '1 300,00 €', 'R$ 49,90']
+    np.testing.assert_allclose(parse_numbers(values, decimal=','), [9.99, 1300, 1234.5, 1300, 49.9])
+
+
+def test_per_row_separator_and_numeric_passthrough():
+    df = pd.DataFrame({
+        'marketplace': ['com', 'de', 'fr', 'co.uk', 'com.br'],
+        'price': ['$9.99', '9,99 €', 12.5, '£1,299.00', 'R$ 1.299,90'],
+    }, index=[10, 11, 12, 13, 14])
+    parsed = parse_numbers(df['price'], decimal_separators(df['marketplace']))
+    # 已经是数值的值不按文本重新解析
+    assert parsed.index.tolist() == [10, 11, 12, 13, 14]
+    np.testing.assert_allclose(parsed, [9.99, 9.99, 12.5, 1299, 1299.9])
+    assert decimal_separators(['DE', 'com', 'es']).tolist() == [',', '.', ',']
+
+
+def test_numeric_series_unchanged():
+    pd.testing.assert_series_equal(parse_numbers(pd.Series([1, 2, 3])), pd.Series([1.0, 2.0, 3.0]))
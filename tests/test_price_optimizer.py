@@ -0,0 +1,89 @@
+'''
+@Desc:   售价优化测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+from source.financial_analysis_system.exchange_rate import ExchangeRateManager
+from source.financial_analysis_system.price_optimizer import (
+    PriceOptimizer,
+    estimate_elasticity,
+    unit_costs_from_landed,
+)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    file_csv = str(tmp_path / 'rates.csv')
+    pd.DataFrame({'Currency': ['CNY', 'USD'], 'Rate': [1.0, 0.14]}).to_csv(file_csv, index=False)
+    return ExchangeRateManager(csv_path=file_csv)
+
+
+def test_estimate_elasticity_recovers_slope():
+    rng = np.random.default_rng(0)
+    price = np.exp(rng.uniform(0, 3, size=200))
+    group = np.repeat(['a', 'b'], 100)
+    slope = np.where(group == 'a', -1.2, -2.5)
+    units = 50 * price ** slope * np.exp(rng.normal(0, 0.01, size=200))
+    df = pd.DataFrame({'price': price, 'units_per_day': units, 'kw': group})
+    result = estimate_elasticity(df, group_col='kw').set_index('kw')
+    np.testing.assert_allclose(result.loc[['a', 'b'], '弹性'], [-1.2, -2.5], atol=0.01)
+    assert result['样本数'].tolist() == [100, 100]
+
+
+def test_estimate_elasticity_fallbacks():
+    df = pd.DataFrame({
+        'price': [1.0, 2.0, 3.0, 1.0, 2.0, 0.0],
+        'units_per_day': [10.0, 1.0, 0.1, 5.0, 5.0, 3.0],
+        'kw': ['steep', 'steep', 'steep', 'few', 'few', 'few'],
+    })
+    result = estimate_elasticity(df, group_col='kw', min_obs=3, default=-1.1, bounds=(-3.0, -0.2)).set_index('kw')
+    # 样本不足 (价格为 0 的行被剔除) 用默认值，过陡的斜率被截断
+    assert result.loc['few', '弹性'] == -1.1
+    assert result.loc['steep', '弹性'] == -3.0
+    # 没有有效样本时返回空表
+    assert estimate_elasticity(df.assign(units_per_day=0.0)).empty
+
+
+def test_optimize_matches_analytic_optimum(manager):
+    # 常弹性 e、无费率时，日毛利最大的售价满足 售价(CNY) = 成本 * e / (1 + e)
+    df = pd.DataFrame({
+        'SKU': ['A', 'B'], '市场': ['US', 'CN'], '币种': ['USD', 'CNY'],
+        '单件成本(CNY)': [50.0, 10.0], '参考售价': [14.0, 20.0], '参考日销量': [10.0, 5.0], '弹性': [-2.0, -3.0],
+    })
+    optimizer = PriceOptimizer(manager, grid_size=3001, min_multiplier=0.5, max_multiplier=2.0)
+    result = optimizer.optimize(df)
+    np.testing.assert_allclose(result['最优售价'], [100 * 0.14, 15.0], atol=0.01)
+    np.testing.assert_allclose(result['毛利率'], [0.5, 1 / 3], atol=1e-3)
+    grid = optimizer.evaluate(df)
+    np.testing.assert_allclose(result['日毛利(CNY)'], grid['profit'].max(axis=1))
+
+
+def test_optimize_constraints(manager):
+    df = pd.DataFrame({
+        'SKU': ['A', 'B', 'C'], '市场': ['US', 'US', 'ZZ'], '币种': ['USD', 'USD', 'XXX'],
+        '单件成本(CNY)': [50.0, 500.0, 1.0], '参考售价': [14.0, 14.0, 1.0], '参考日销量': [10.0, 10.0, 1.0],
+        '费率': [0.15, 0.15, 0.0],
+    })
+    optimizer = PriceOptimizer(manager)
+    result = optimizer.optimize(df, min_margin=0.3)
+    assert result.loc[0, '毛利率'] >= 0.3
+    # B 成本过高、C 币种未知：无可行价格
+    assert result.loc[[1, 2], '最优售价'].isna().all()
+    by_margin = optimizer.optimize(df.iloc[:1], objective='margin', min_units=8)
+    assert by_margin.loc[0, '预计日销量'] >= 8
+    assert by_margin.loc[0, '最优售价'] < optimizer.optimize(df.iloc[:1], objective='margin').loc[0, '最优售价']
+    with pytest.raises(ValueError):
+        optimizer.optimize(df, objective='revenue')
+
+
+def test_unit_costs_from_landed():
+    df_landed = pd.DataFrame({
+        'SKU': ['A', 'A', 'A'], '国家': ['US', 'US', 'DE'], '数量': [10, 30, 5], '到岸成本(CNY)': [100.0, 380.0, 60.0],
+    })
+    result = unit_costs_from_landed(df_landed).set_index('市场')
+    assert result.loc['US', '单件成本(CNY)'] == 12.0
+    assert result.loc['DE', '单件成本(CNY)'] == 12.0
@@ -0,0 +1,164 @@
+'''
+@Desc:   ShopeeScraper 并发模式测试 (本地 aiohttp 服务模拟搜索接口)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import asyncio
+import pytest
+import pandas as pd
+from aiohttp import web
+from source.product_research.shopee import ShopeeScraper
+
+
+def _item(itemid, shopid=1, price=1.5):
+    return {'item_basic': {
+        'itemid': itemid, 'shopid': shopid, 'name': f'item {itemid}', 'price': int(price * 100000),
+        'historical_sold': 10, 'item_rating': {'rating_star': 4.5, 'rating_count': [3, 1, 1]},
+    }}
+
+
+def _run_with_server(handler, scraper_kwargs, run=None):
+    """
+    启动本地搜索接口，scraper 的 base_url 指向 /search，各站点指向 /{region}/search
+    :param run: 接收 scraper 的协程函数，默认执行一次 scrape_async
+    :return: (scraper, run 的返回值)
+    """
+    async def main():
+        app = web.Application()
+        app.router.add_get('/search', handler)
+        app.router.add_get('/{region}/search', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            scraper = ShopeeScraper(**scraper_kwargs)
+            scraper.base_url = f'http://127.0.0.1:{port}/search'
+            scraper._region_url = lambda region: (
+                scraper.base_url if region is None else f'http://127.0.0.1:{port}/{region}/search'
+            )
+            return scraper, await (run or ShopeeScraper.scrape_async)(scraper)
+        finally:
+            await runner.cleanup()
+    return asyncio.run(main())
+
+
+def test_concurrent_pages_are_parsed():
+    async def handler(request):
+        page = int(request.query['newest']) // 50
+        return web.json_response({'items': [_item(page * 10 + i) for i in range(3)]})
+
+    _, results = _run_with_server(handler, dict(keyword='fan', pages=4, rate_limit=0))
+    assert sorted(r['itemid'] for r in results) == [0, 1, 2, 10, 11, 12, 20, 21, 22, 30, 31, 32]
+    assert results[0]['price'] == 1.5
+    assert results[0]['rating_count'] == 5
+
+
+def test_non_json_page_does_not_discard_other_pages():
+    async def handler(request):
+        page = int(request.query['newest']) // 50
+        if page == 1:
+            return web.Response(text='<html>captcha</html>', content_type='text/html')
+        return web.json_response({'items': [_item(page)]})
+
+    _, results = _run_with_server(handler, dict(keyword='fan', pages=3, rate_limit=0, max_retries=0))
+    assert sorted(r['itemid'] for r in results) == [0, 2]
+
+
+def test_transient_errors_are_retried():
+    calls = {'n': 0}
+
+    async def handler(request):
+        calls['n'] += 1
+        if calls['n'] <= 2:
+            return web.Response(status=503)
+        return web.json_response({'items': [_item(1)]})
+
+    _, results = _run_with_server(handler, dict(keyword='fan', pages=1, rate_limit=0, max_retries=3, backoff=0.01))
+    assert [r['itemid'] for r in results] == [1]
+    assert calls['n'] == 3
+
+
+def test_client_errors_fail_fast():
+    calls = {'n': 0}
+
+    async def handler(request):
+        calls['n'] += 1
+        return web.Response(status=404)
+
+    _, results = _run_with_server(handler, dict(keyword='fan', pages=1, rate_limit=0, max_retries=3, backoff=0.01))
+    assert results == []
+    assert calls['n'] == 1
+
+
+def test_regions_are_tagged_with_region_and_currency():
+    async def handler(request):
+        region = request.match_info['region']
+        shopid = {'SG': 1, 'MY': 2, 'BR': 3}[region]
+        return web.json_response({'items': [_item(100, shopid=shopid)]})
+
+    _, results = _run_with_server(handler, dict(keyword='fan', pages=1, rate_limit=0, regions=['sg', 'MY', 'BR']))
+    tagged = sorted((r['region'], r['currency'], r['shopid']) for r in results)
+    assert tagged == [('BR', 'BRL', 3), ('MY', 'MYR', 2), ('SG', 'SGD', 1)]
+
+
+def test_unknown_region_is_rejected():
+    with pytest.raises(ValueError):
+        ShopeeScraper(keyword='fan', regions=['XX'])
+
+
+def _run_twice(handler, output, output_format, pages_first, pages_second):
+    """同一个 scraper 连续两次流式爬取 (第二次页数不同)，返回两次的结果"""
+    async def run(scraper):
+        first = list(await scraper.scrape_async())
+        scraper.results = []
+        scraper.pages = pages_second
+        second = list(await scraper.scrape_async())
+        return first, second
+
+    _, results = _run_with_server(handler, dict(
+        keyword='fan', pages=pages_first, rate_limit=0, output=output, output_format=output_format, keep_results=True
+    ), run)
+    return results
+
+
+async def _overlapping_pages(request):
+    # 相邻页有重叠商品
+    page = int(request.query['newest']) // 50
+    return web.json_response({'items': [_item(page), _item(page + 1)]})
+
+
+def test_streaming_dedups_within_run_and_resets_between_runs(tmp_path):
+    output = str(tmp_path / 'out.csv')
+    first, second = _run_twice(_overlapping_pages, output, 'csv', 3, 2)
+    assert sorted(r['itemid'] for r in first) == [0, 1, 2, 3]
+    # 第二次爬取不能因为第一次已见过而丢弃商品
+    assert sorted(r['itemid'] for r in second) == [0, 1, 2]
+    assert sorted(pd.read_csv(output)['itemid']) == [0, 1, 2]
+
+
+def test_parquet_rerun_replaces_old_parts(tmp_path):
+    output = str(tmp_path / 'out_parquet')
+    _, second = _run_twice(_overlapping_pages, output, 'parquet', 5, 1)
+    assert sorted(r['itemid'] for r in second) == [0, 1]
+    assert sorted(pd.read_parquet(output)['itemid']) == [0, 1]
+
+
+def test_without_streaming_results_are_deduplicated():
+    _, results = _run_with_server(_overlapping_pages, dict(keyword='fan', pages=3, rate_limit=0))
+    assert sorted(r['itemid'] for r in results) == [0, 1, 2, 3]
+
+    # 不同店铺的同一 itemid 不是重复商品
+    async def handler(request):
+        return web.json_response({'items': [_item(1, shopid=1), _item(1, shopid=2)]})
+
+    _, results = _run_with_server(handler, dict(keyword='fan', pages=2, rate_limit=0))
+    assert sorted((r['itemid'], r['shopid']) for r in results) == [(1, 1), (1, 2)]
+
+
+def test_default_rate_limit_finishes_200_pages_in_seconds():
+    # 20 个关键词 x 10 页，每个站点限速下的最短耗时
+    scraper = ShopeeScraper(keyword='fan')
+    assert 20 * 10 / scraper.rate_limit <= 10
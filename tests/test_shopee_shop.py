@@ -0,0 +1,85 @@
+'''
+@Desc:   ShopeeShopEnricher 测试 (本地 aiohttp 服务模拟店铺接口)
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import asyncio
+from aiohttp import web
+from source.product_research.shopee_shop import ShopeeShopEnricher
+
+
+async def _serve_shops(calls):
+    async def handler(request):
+        shopid = int(request.query['shopid'])
+        calls.append(shopid)
+        if shopid == 99:
+            return web.Response(text='<html>captcha</html>', content_type='text/html')
+        return web.json_response({'data': {'name': f'shop {shopid}', 'follower_count': shopid * 10}})
+
+    app = web.Application()
+    app.router.add_get('/shop', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/shop"
+
+
+def _enricher(tmp_path, url):
+    enricher = ShopeeShopEnricher(file_cache=str(tmp_path / 'cache.sqlite'), rate_limit=0, backoff=0.01)
+    enricher._shop_url = lambda region: url
+    return enricher
+
+
+def test_enrich_async_inside_running_loop_uses_cache(tmp_path):
+    records = [
+        {'region': 'SG', 'itemid': 1, 'shopid': 5},
+        {'region': 'SG', 'itemid': 2, 'shopid': 5},
+        {'region': 'MY', 'itemid': 3, 'shopid': 7},
+        {'region': 'MY', 'itemid': 4, 'shopid': 99},
+    ]
+
+    async def main():
+        calls = []
+        runner, url = await _serve_shops(calls)
+        try:
+            enricher = _enricher(tmp_path, url)
+            first = await enricher.enrich_async(records)
+            second = await enricher.enrich_async(records)
+            return calls, first, second
+        finally:
+            await runner.cleanup()
+
+    calls, first, second = asyncio.run(main())
+    assert first['shop_name'].tolist()[:3] == ['shop 5', 'shop 5', 'shop 7']
+    assert first['follower_count'].tolist()[:3] == [50, 50, 70]
+    # 非 JSON 响应的店铺没有详情，也不写入缓存
+    assert first['shop_name'].isna().tolist() == [False, False, False, True]
+    # 第一次每个店铺请求一次，第二次只重试失败的店铺
+    assert sorted(calls) == [5, 7, 99, 99]
+    assert second['shop_name'].tolist()[:3] == first['shop_name'].tolist()[:3]
+
+
+def test_enrich_sync_entry(tmp_path):
+    async def start():
+        return await _serve_shops([])
+
+    loop = asyncio.new_event_loop()
+    runner, url = loop.run_until_complete(start())
+    try:
+        # 服务运行在另一个线程的事件循环中，enrich 内部的 asyncio.run 才能访问
+        import threading
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        df = _enricher(tmp_path, url).enrich([{'itemid': 1, 'shopid': 3}])
+        assert df['shop_name'].tolist() == ['shop 3']
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+
+def test_enrich_empty_records(tmp_path):
+    assert _enricher(tmp_path, 'http://127.0.0.1:1/shop').enrich([]).empty
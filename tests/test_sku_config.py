@@ -0,0 +1,119 @@
+'''
+@Desc:   SKU编码测试
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+from source.utils.sku_config import SKUCodec
+
+SKUS = ['VC-S-BLK', 'VC-S-WHT', 'VC-M-BLK', 'VCL-STD', 'VCL', 'A1-B2-C3']
+
+
+def test_encode_decode_round_trip():
+    codec = SKUCodec()
+    skus = np.array(SKUS * 3, dtype=object)
+    ids = codec.encode(skus)
+    assert ids.dtype == np.int64
+    assert (ids > 0).all()
+    assert codec.decode(ids).tolist() == skus.tolist()
+    # 同一 SKU 编号一致，不同 SKU 编号不同
+    assert len(np.unique(ids)) == len(SKUS)
+    # 系列在高位：按 SKU_ID 排序即按系列聚集
+    families = codec.attributes(np.sort(ids))['family']
+    assert (families != families.shift()).sum() == 3
+    # 大小写与空白归一化
+    assert codec.encode([' vc-s-blk ']).tolist() == [ids[0]]
+
+
+def test_validation():
+    codec = SKUCodec(vocabularies={'colour': ['BLK', 'WHT']})
+    skus = ['VC-S-BLK', 'VC-S-BLK-X', 'VC--BLK', 'VC-S-PNK', '', None, 'VC-S', 'VC_S']
+    assert codec.validate(skus).tolist() == [True, False, False, False, False, False, True, False]
+    parsed = codec.parse(skus)
+    assert parsed.loc[0, ['family', 'variant', 'colour']].tolist() == ['VC', 'S', 'BLK']
+    assert parsed.loc[6, 'colour'] == ''
+
+    with pytest.raises(ValueError):
+        codec.encode(skus)
+    ids = codec.encode(skus, errors='coerce')
+    assert (ids[1:6] == -1).all() and (ids[[0, 6]] >= 0).all()
+    assert codec.decode(ids)[1] is None
+    # grow=False 时字典外的取值无效，字典不变
+    assert codec.encode(['XX-S-BLK'], grow=False, errors='coerce').tolist() == [-1]
+    assert 'XX' not in codec.attributes(codec.encode(SKUS[:1]))['family'].tolist()
+
+
+def test_field_capacity():
+    codec = SKUCodec(fields={'family': 2, 'variant': 2})
+    codec.encode(['A', 'B', 'C'])
+    with pytest.raises(ValueError):
+        codec.encode(['D'])
+    with pytest.raises(ValueError):
+        SKUCodec(fields={'family': 40, 'variant': 24})
+
+
+def test_failed_encode_leaves_dictionaries_unchanged():
+    codec = SKUCodec(fields={'family': 2, 'variant': 2})
+    codec.encode(['A-X'])
+    before = {f: list(v) for f, v in codec._values.items()}
+    # 含无效 SKU 时先报错，不把同批有效 SKU 的新取值写入字典
+    with pytest.raises(ValueError):
+        codec.encode(['B-Y', 'B-Y-Z'])
+    assert codec._values == before
+    # 后面字段超出容量时，前面字段也不扩充
+    with pytest.raises(ValueError):
+        codec.encode(['C-P', 'C-Q', 'C-R'])
+    assert codec._values == before
+
+
+def test_decode_unknown_codes_as_none():
+    codec = SKUCodec()
+    ids = codec.encode(SKUS[:2])
+    shift = codec._shifts['family']
+    unknown = np.array([len(codec._values['family']) << shift, 1 << 62, -1], dtype=np.int64)
+    assert codec.decode(np.concatenate([ids, unknown])).tolist() == SKUS[:2] + [None] * 3
+    assert codec.field_codes(unknown, 'family').tolist() == [-1, -1, -1]
+    assert codec.attributes(unknown)['family'].isna().all()
+
+def test_save_load_keeps_ids(tmp_path):
+    file_store = str(tmp_path / 'sku' / 'codec.json')
+    codec = SKUCodec(file_store=file_store)
+    ids = codec.encode(SKUS)
+    codec.save()
+    # 新进程按不同顺序编码，编号不变
+    reloaded = SKUCodec(file_store=file_store)
+    assert reloaded.encode(SKUS[::-1]).tolist() == ids[::-1].tolist()
+    with pytest.raises(ValueError):
+        SKUCodec(fields={'family': 20, 'variant': 16}, file_store=file_store)
+
+
+def test_rollup_matches_groupby():
+    codec = SKUCodec()
+    rng = np.random.default_rng(0)
+    skus = rng.choice(SKUS, size=500)
+    values = rng.uniform(0, 100, size=500)
+    values[::50] = np.nan
+    ids = codec.encode(skus)
+    ids[::70] = -1
+    result = codec.rollup(ids, values, 'colour').set_index('colour')
+
+    ok = (ids >= 0) & ~np.isnan(values)
+    expected = pd.Series(values[ok]).groupby(codec.parse(skus)['colour'].to_numpy()[ok]).agg(['size', 'sum', 'mean'])
+    assert sorted(result.index) == sorted(expected.index)
+    result = result.loc[expected.index]
+    assert result['行数'].tolist() == expected['size'].tolist()
+    np.testing.assert_allclose(result['合计'], expected['sum'])
+    np.testing.assert_allclose(result['均值'], expected['mean'])
+
+
+def test_lookup_table_and_encode_frame():
+    codec = SKUCodec()
+    products = pd.DataFrame({'SKU': ['VC-S-BLK', 'VCL-STD'], '单价(CNY)': [35.0, 120.0]})
+    orders = pd.DataFrame({'SKU': ['vcl-std', 'VC-S-BLK', 'VCL-STD'], '数量': [1, 2, 3]})
+    table = codec.lookup_table(products['SKU'])
+    assert table.columns.tolist() == ['SKU_ID', 'SKU', 'family', 'variant', 'colour']
+    df = codec.encode_frame(orders).merge(codec.encode_frame(products).drop(columns=['SKU']), on='SKU_ID')
+    assert df['单价(CNY)'].tolist() == [120.0, 35.0, 120.0]
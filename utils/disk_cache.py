@@ -0,0 +1,132 @@
+'''
+@Desc:   带过期时间 (TTL) 的本地磁盘缓存
+         基于 sqlite3 (WAL 模式)，值以 JSON 保存，并记录抓取时间 fetched_at
+         - 多线程/多进程可同时读取
+         - 支持按命名空间隔离 (例如 shopee_shop、amazon_asin)
+         - 批量读写，避免逐条查询
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+
+class DiskTTLCache:
+    # sqlite 单条语句的参数个数上限较低，批量查询按此分批
+    batch_size = 500
+
+    def __init__(self, file_db: str, namespace: str, ttl_seconds: float = 24 * 3600):
+        """
+        :param file_db: sqlite 数据库文件路径
+        :param namespace: 命名空间
+        :param ttl_seconds: 过期时间 (秒)，超过该时间的缓存视为过期
+        """
+        self.file_db = file_db
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(file_db)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, "
+                "key TEXT NOT NULL, "
+                "value TEXT NOT NULL, "
+                "fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作使用独立连接，线程之间互不影响；with 块正常结束时提交，异常时回滚，最后关闭连接
+        # (sqlite3.Connection 自身的 with 只提交/回滚，不会关闭连接)
+        conn = sqlite3.connect(self.file_db, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _select(self, keys: List[str]) -> Dict[str, tuple]:
+        """批量读取 key -> (value, fetched_at)"""
+        rows = {}
+        with self._connect() as conn:
+            for i in range(0, len(keys), self.batch_size):
+                batch = keys[i:i + self.batch_size]
+                placeholders = ",".join("?" * len(batch))
+                cursor = conn.execute(
+                    f"SELECT key, value, fetched_at FROM cache "
+                    f"WHERE namespace = ? AND key IN ({placeholders})",
+                    [self.namespace] + batch
+                )
+                for key, value, fetched_at in cursor:
+                    rows[key] = (json.loads(value), fetched_at)
+        return rows
+
+    def get_many(self, keys: Iterable, include_stale: bool = False) -> Dict[str, Dict]:
+        """
+        批量读取缓存
+        :param keys: 键列表
+        :param include_stale: 是否返回已过期的缓存
+        :return: key -> value (value 中附带 fetched_at)
+        """
+        keys = list(dict.fromkeys(str(k) for k in keys))
+        now = time.time()
+        result = {}
+        for key, (value, fetched_at) in self._select(keys).items():
+            if include_stale or now - fetched_at <= self.ttl_seconds:
+                value["fetched_at"] = fetched_at
+                result[key] = value
+        return result
+
+    def get(self, key) -> Optional[Dict]:
+        """读取单个未过期的缓存"""
+        return self.get_many([key]).get(str(key))
+
+    def stale_keys(self, keys: Iterable) -> List[str]:
+        """返回缺失或已过期的键"""
+        keys = list(dict.fromkeys(str(k) for k in keys))
+        fresh = self.get_many(keys)
+        return [k for k in keys if k not in fresh]
+
+    def set_many(self, values: Dict, fetched_at: Optional[float] = None):
+        """
+        批量写入缓存
+        :param values: key -> value (可 JSON 序列化的字典)
+        :param fetched_at: 抓取时间戳，默认当前时间
+        """
+        if not values:
+            return
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = [
+            (
+                self.namespace,
+                str(key),
+                json.dumps({k: v for k, v in value.items() if k != "fetched_at"}, ensure_ascii=False),
+                fetched_at
+            )
+            for key, value in values.items()
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, fetched_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def set(self, key, value: Dict, fetched_at: Optional[float] = None):
+        """写入单个缓存"""
+        self.set_many({key: value}, fetched_at)
+
+    def purge_expired(self) -> int:
+        """删除已过期的缓存，返回删除条数"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND fetched_at < ?",
+                (self.namespace, time.time() - self.ttl_seconds)
+            )
+            return cursor.rowcount
@@ -0,0 +1,47 @@
+'''
+@Desc:   跨进程文件锁
+         对一个 <文件>.lock 加排他锁 (POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking)，
+         用于多个进程对同一个索引文件做 "读取 -> 合并 -> 写回"，避免互相覆盖
+         锁文件本身不删除，进程退出时操作系统自动释放锁
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(file_path: str):
+    """
+    对 file_path 对应的锁文件加排他锁，with 块结束后释放
+    :param file_path: 需要保护的文件路径，锁文件为 file_path + '.lock'
+    """
+    file_lock_path = file_path + '.lock'
+    os.makedirs(os.path.dirname(os.path.abspath(file_lock_path)), exist_ok=True)
+    with open(file_lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt 锁定的是字节区间，固定锁第 1 个字节；LK_LOCK 最多重试 10 秒，这里循环直到拿到锁
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
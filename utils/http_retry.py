@@ -0,0 +1,68 @@
+'''
+@Desc:   HTTP 重试相关的公共常量与异步请求
+         ShopeeScraper / ShopeeShopEnricher / ImageStore 共用，修改后各处保持一致
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import random
+import asyncio
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+# 可重试的 HTTP 状态码（限流 / 服务端临时错误），其它 4xx 属于请求本身的问题，不重试
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+async def get_json_with_retry(
+        session: aiohttp.ClientSession,
+        url: str,
+        params: Optional[Dict],
+        semaphore: asyncio.Semaphore,
+        limiter,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        tag: str = ''
+) -> Optional[Any]:
+    """
+    异步 GET 并解析 JSON，超时/连接失败/RETRY_STATUS 按指数退避 + 随机抖动重试
+    :param session: aiohttp 会话 (连接池复用)
+    :param semaphore: 限制并发请求数
+    :param limiter: 限速器，需提供 async wait() (如 AsyncRateLimiter)
+    :param max_retries: 最大重试次数
+    :param backoff: 指数退避的基础等待时间 (秒)
+    :param tag: 日志中标识该请求的文字
+    :return: 解析后的 JSON；其它 4xx、非 JSON 内容或重试用尽时返回 None
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            async with semaphore:
+                await limiter.wait()
+                async with session.get(url, params=params) as response:
+                    if response.status in RETRY_STATUS:
+                        raise aiohttp.ClientResponseError(
+                            response.request_info,
+                            response.history,
+                            status=response.status,
+                            message=response.reason or ""
+                        )
+                    if response.status >= 400:
+                        # 其它 4xx 属于请求本身的问题，重试没有意义
+                        print(f"[WARN] {tag} 获取失败: HTTP {response.status}")
+                        return None
+                    return await response.json(content_type=None)
+
+        except ValueError as e:
+            # 返回 HTML / 验证码页等非 JSON 内容，重试通常也一样，直接放弃
+            print(f"[WARN] {tag} 返回内容不是 JSON: {e}")
+            return None
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt >= max_retries:
+                print(f"[WARN] {tag} 获取失败 (已重试 {attempt} 次): {e}")
+                return None
+            # 指数退避 + 随机抖动，避免所有请求同时重试
+            delay = backoff * (2 ** attempt) + random.uniform(0, backoff)
+            await asyncio.sleep(delay)
+    return None
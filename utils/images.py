@@ -1,13 +1,24 @@
 '''
 @Desc:   图片工具类
+         ImageUtils: 单张图片下载
+         ImageStore: 批量并发下载，按内容哈希去重存储
 @Author: Dysin
 @Date:   2025/11/23
 '''
 
 import os.path
+import json
+import shutil
+import time
+import hashlib
+import threading
 from PIL import Image
 import requests
+import tempfile
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from source.utils.http_retry import RETRY_STATUS
+from source.utils.file_lock import file_lock
 
 class ImageUtils:
     def __init__(
@@ -18,15 +29,16 @@ class ImageUtils:
         self.path_target = path_target
         self.name_target = name_target
 
-    def download(self, url, img_type='.png'):
+    def download(self, url, img_type='.png', timeout=10):
         """
         下载图片并转换为 png 格式保存
         :param url: 图片 URL
         :param img_type: 保存图片格式，默认 '.png'
+        :param timeout: 请求超时时间 (秒)
         """
         file_img = os.path.join(self.path_target, self.name_target + img_type)
         try:
-            response = requests.get(url, stream=True)
+            response = requests.get(url, stream=True, timeout=timeout)
             response.raise_for_status()  # 如果请求失败，会抛出异常
             # 将内容读取到内存
             img_data = BytesIO(response.content)
@@ -39,3 +51,274 @@ class ImageUtils:
         except Exception as e:
             print(f"下载失败: {e}")
 
+class ImageStore:
+    """
+    内容寻址的图片库
+    - 图片按内容 SHA-256 存储一次：objects/<hash[:2]>/<hash>.<ext>
+      默认保持原格式，原图直接保存下载的原始内容，不重新编码
+    - 缩略图与原图同目录：<hash>_<w>x<h>.<ext>，与原图在同一次解码中生成，
+      JPEG 只需要缩略图时按缩略图尺寸做 draft 解码 (解码阶段直接降采样)
+    - 别名索引 index.json：key (例如 asin_B0XXXX) -> 内容哈希，相同图片只存一份
+      多个进程共用同一图片库时，写回索引前加文件锁并合并磁盘上其它进程写入的条目
+    """
+
+    extensions = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+    def __init__(
+            self,
+            path_store,
+            img_format=None,
+            thumb_sizes=((120, 120),),
+            quality=90
+    ):
+        """
+        :param path_store: 图片库目录
+        :param img_format: 保存格式 ('JPEG' / 'PNG' / 'WEBP' / 'GIF')，None 保持原格式 (其它格式转为 PNG)
+        :param thumb_sizes: 需要生成的缩略图尺寸列表 (最大宽, 最大高)
+        :param quality: JPEG / WEBP 质量
+        """
+        if img_format is not None and img_format.upper() not in self.extensions:
+            raise ValueError(f'不支持的图片格式: {img_format}')
+        self.path_store = path_store
+        self.path_objects = os.path.join(path_store, 'objects')
+        self.file_index = os.path.join(path_store, 'index.json')
+        self.img_format = img_format.upper() if img_format is not None else None
+        # 内容哈希 -> 扩展名 (保持原格式时各对象扩展名不同)
+        self._exts = {}
+        self.thumb_sizes = [tuple(size) for size in thumb_sizes]
+        self.quality = quality
+        os.makedirs(self.path_objects, exist_ok=True)
+        self._lock = threading.Lock()
+        self.index = self._load_index()
+        # 本进程新增/修改、尚未写回的 key
+        self._dirty = set()
+
+    def _load_index(self):
+        if not os.path.exists(self.file_index):
+            return {}
+        with open(self.file_index, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_index(self):
+        """
+        原子写入别名索引
+        加文件锁后重新读取磁盘上的索引，只用本进程修改过的 key 覆盖，其它进程写入的条目保留
+        """
+        with self._lock, file_lock(self.file_index):
+            index = self._load_index()
+            index.update({key: self.index[key] for key in self._dirty})
+            file_tmp = f'{self.file_index}.{os.getpid()}.tmp'
+            with open(file_tmp, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(file_tmp, self.file_index)
+            self.index = index
+            self._dirty.clear()
+
+    def object_path(self, digest, size=None):
+        """
+        返回内容哈希对应的文件路径
+        :param digest: 内容哈希
+        :param size: 缩略图尺寸，None 表示原图
+        """
+        name = digest if size is None else f'{digest}_{size[0]}x{size[1]}'
+        return os.path.join(self.path_objects, digest[:2], name + self._ext(digest))
+
+    def _ext(self, digest):
+        """对象的扩展名：指定了保存格式时固定，否则按磁盘上已有的原图确定 (尚未存储时为空)"""
+        if self.img_format is not None:
+            return self.extensions[self.img_format]
+        ext = self._exts.get(digest)
+        if ext is None:
+            prefix = os.path.join(self.path_objects, digest[:2], digest)
+            ext = next((e for e in self.extensions.values() if os.path.exists(prefix + e)), None)
+            if ext is None:
+                return ''
+            self._exts[digest] = ext
+        return ext
+
+    def path(self, key, size=None):
+        """按别名返回图片路径，不存在时返回 None"""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        return self.object_path(entry['sha256'], size)
+
+    def _save_image(self, im, file_img, img_format):
+        """先写临时文件再重命名，并发写入同一对象时互不干扰"""
+        file_tmp = f'{file_img}.{threading.get_ident()}.tmp'
+        if img_format in ('JPEG', 'WEBP'):
+            im.save(file_tmp, format=img_format, quality=self.quality)
+        else:
+            im.save(file_tmp, format=img_format)
+        os.replace(file_tmp, file_img)
+
+    @staticmethod
+    def _save_raw(source, file_img):
+        """原样保存原始内容 (文件路径或 BytesIO)"""
+        file_tmp = f'{file_img}.{threading.get_ident()}.tmp'
+        if isinstance(source, BytesIO):
+            with open(file_tmp, 'wb') as f:
+                f.write(source.getbuffer())
+        else:
+            shutil.copyfile(source, file_tmp)
+        os.replace(file_tmp, file_img)
+
+    def _write_object(self, digest, source):
+        """
+        写入原图与缺失的缩略图
+        :param source: 图片文件路径或 BytesIO
+        """
+        with Image.open(source) as im:
+            if self.img_format is not None:
+                img_format = self.img_format
+            else:
+                img_format = im.format if im.format in self.extensions else 'PNG'
+            self._exts[digest] = self.extensions[img_format]
+            file_img = self.object_path(digest)
+            os.makedirs(os.path.dirname(file_img), exist_ok=True)
+            missing = [size for size in self.thumb_sizes if not os.path.exists(self.object_path(digest, size))]
+            # 格式不变时原图直接保存原始内容，只为缩略图解码
+            keep_raw = im.format == img_format
+            if keep_raw and missing:
+                # JPEG 可在解码阶段直接降采样，省去大部分解码开销 (其它格式不受影响)
+                largest = max(missing, key=lambda size: size[0] * size[1])
+                im.draft(None, (largest[0] * 2, largest[1] * 2))
+            if missing or not keep_raw:
+                im.load()
+                if img_format == 'JPEG' and im.mode not in ('RGB', 'L', 'CMYK'):
+                    im = im.convert('RGB')
+            for size in missing:
+                thumb = im.copy()
+                thumb.thumbnail(size)
+                self._save_image(thumb, self.object_path(digest, size), img_format)
+            # 原图最后落盘，原图存在即代表该对象完整
+            if not os.path.exists(file_img):
+                if keep_raw:
+                    self._save_raw(source, file_img)
+                else:
+                    self._save_image(im, file_img, img_format)
+
+    def _is_complete(self, digest):
+        return all(
+            os.path.exists(self.object_path(digest, size))
+            for size in [None] + self.thumb_sizes
+        )
+
+    def store_bytes(self, content):
+        """
+        存储图片内容，内容哈希已存在时只补齐缺失的缩略图
+        :return: 内容哈希
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        if not self._is_complete(digest):
+            self._write_object(digest, BytesIO(content))
+        return digest
+
+    def store_file(self, file_src, digest=None):
+        """
+        存储磁盘上的图片文件 (例如流式下载的临时文件)，PIL 直接从文件解码，不把原始内容整体读入内存
+        :param file_src: 图片文件路径
+        :param digest: 文件内容的 SHA-256，None 时分块计算
+        :return: 内容哈希
+        """
+        if digest is None:
+            sha256 = hashlib.sha256()
+            with open(file_src, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 16), b''):
+                    sha256.update(block)
+            digest = sha256.hexdigest()
+        if not self._is_complete(digest):
+            self._write_object(digest, file_src)
+        return digest
+
+    def _download(self, session, url, timeout, chunk_size=1 << 16):
+        """流式下载到临时文件，边下载边计算 SHA-256，完成后存入图片库并删除临时文件"""
+        fd, file_tmp = tempfile.mkstemp(suffix='.download', dir=self.path_store)
+        try:
+            sha256 = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f, session.get(url, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                for block in response.iter_content(chunk_size=chunk_size):
+                    sha256.update(block)
+                    f.write(block)
+            return self.store_file(file_tmp, sha256.hexdigest())
+        finally:
+            if os.path.exists(file_tmp):
+                os.remove(file_tmp)
+
+    def _ensure_thumbnails(self, digest):
+        """已存储的对象按当前 thumb_sizes 补齐缩略图"""
+        if not self._is_complete(digest):
+            self._write_object(digest, self.object_path(digest))
+
+    def download_many(
+            self,
+            items,
+            max_workers=16,
+            timeout=10,
+            retries=3,
+            backoff=0.5,
+            refresh=False
+    ):
+        """
+        批量并发下载
+        :param items: {key: url}
+        :param max_workers: 并发线程数 (同时也是连接池大小)
+        :param timeout: 单个请求超时时间 (秒)
+        :param retries: 超时/连接失败/429/5xx 的重试次数
+        :param backoff: 指数退避的基础等待时间 (秒)
+        :param refresh: 是否重新下载已在索引中的 key
+        :return: {key: 内容哈希}，下载失败的 key 不在结果中
+        """
+        result = {}
+        tasks = {}
+        for key, url in items.items():
+            entry = self.index.get(key)
+            if not refresh and entry is not None and os.path.exists(self.object_path(entry['sha256'])):
+                self._ensure_thumbnails(entry['sha256'])
+                result[key] = entry['sha256']
+            elif isinstance(url, str) and url:
+                tasks[key] = url
+        print(f'[INFO] 图片索引命中 {len(result)} 张，需下载 {len(tasks)} 张')
+        if not tasks:
+            return result
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        def fetch(url):
+            for attempt in range(retries + 1):
+                try:
+                    return self._download(session, url, timeout)
+                except requests.exceptions.HTTPError as e:
+                    # 其它 4xx 属于请求本身的问题，重试没有意义
+                    if e.response.status_code not in RETRY_STATUS or attempt >= retries:
+                        raise
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt >= retries:
+                        raise
+                time.sleep(backoff * (2 ** attempt))
+
+        # 同一 URL 只下载一次
+        url_keys = {}
+        for key, url in tasks.items():
+            url_keys.setdefault(url, []).append(key)
+        with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch, url): url for url in url_keys}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    digest = future.result()
+                except Exception as e:
+                    print(f'[Error] 图片下载失败 {url}: {e}')
+                    continue
+                with self._lock:
+                    for key in url_keys[url]:
+                        self.index[key] = {'sha256': digest, 'url': url}
+                        self._dirty.add(key)
+                        result[key] = digest
+        self.save_index()
+        print(f'[INFO] 共 {len(result)} 个 key，对应 {len(set(result.values()))} 张不同图片')
+        return result
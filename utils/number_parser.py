@@ -0,0 +1,61 @@
+'''
+@Desc:   按站点格式解析价格 / 数量文本
+         不同站点的数字格式不同：amazon.com 为 "1,300" / "$11.99"，amazon.de 为 "1.300" / "9,99 €"。
+         简单去掉非数字字符会把 "9,99" 解析为 999，这里按站点的小数点符号解析：
+           1. 去掉货币符号、空格等，只保留数字、'.'、','、'-'
+           2. 小数点为 ',' 的站点先去掉千分位 '.'，再把 ',' 换成 '.'；否则去掉千分位 ','
+         已经是数值的值原样保留
+@Author: Dysin
+@Date:   2026/10/18
+'''
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+# 以 ',' 为小数点的 Amazon 站点
+DECIMAL_COMMA_MARKETS = {
+    'de',
+    'fr',
+    'it',
+    'es',
+    'nl',
+    'be',
+    'pl',
+    'se',
+    'com.be',
+    'com.br',
+    'com.tr',
+}
+
+
+def decimal_separators(markets) -> np.ndarray:
+    """站点 -> 小数点符号 (',' 或 '.')"""
+    markets = pd.Series(np.asarray(markets, dtype=object)).astype(str).str.lower()
+    return np.where(markets.isin(DECIMAL_COMMA_MARKETS).to_numpy(), ',', '.')
+
+
+def parse_numbers(values, decimal='.') -> pd.Series:
+    """
+    解析带千分位、货币符号的数字文本
+    :param values: 值序列 (文本或数值混合)，为 Series 时保留其索引
+    :param decimal: 小数点符号，单个值或与 values 等长的数组 (如 decimal_separators(df['marketplace']))
+    :return: float Series，无法解析的为 NaN
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if is_numeric_dtype(s):
+        return pd.to_numeric(s, errors='coerce').astype(float)
+    decimal = np.broadcast_to(np.asarray(decimal, dtype=object), len(s))
+    is_text = s.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    result = pd.to_numeric(s.where(~is_text).astype(object), errors='coerce').astype(float)
+
+    text = s[is_text].astype(str).str.replace(r'[^\d.,\-]', '', regex=True).to_numpy(dtype=object)
+    text = pd.Series(text, dtype=object)
+    comma = decimal[is_text] == ','
+    parsed = np.where(
+        comma,
+        text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
+        text.str.replace(',', '', regex=False)
+    )
+    result[is_text] = pd.to_numeric(pd.Series(parsed, dtype=object), errors='coerce').to_numpy(dtype=float)
+    return result
@@ -1,5 +1,263 @@
 '''
 @Desc:   SKU编码
+         SKU 形如 VC-S-BLK / VCL-STD，按 '-' 分段，依次为 系列(family)、规格(variant)、颜色(colour)，
+         末尾的段可以省略。SKUCodec：
+         1. 解析与校验：只对唯一 SKU 做向量化拆分，段须为大写字母或数字，可按字段限定取值范围
+         2. 每个字段维护一个 取值 <-> 编号 的字典 (编号 0 表示缺省)，
+            按位拼接为一个 int64 的 SKU_ID (系列在高位，按 SKU_ID 排序即按系列聚集)
+         3. SKU_ID 与 SKU 字符串双向转换，目录与订单可在整数键上连接
+         4. 属性汇总 (如按颜色汇总成本) 直接对 SKU_ID 移位取字段编号后 bincount
+         字典可保存为 JSON，保证不同批次、不同进程得到的 SKU_ID 一致
 @Author: Dysin
 @Date:   2025/11/24
 '''
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+SEPARATOR = '-'
+# 字段及其位宽 (顺序即 SKU 中的段顺序，合计不超过 63 位)
+SKU_FIELDS = {'family': 20, 'variant': 16, 'colour': 16}
+# 段的合法字符
+SEGMENT_PATTERN = r'[A-Z0-9]+'
+
+
+class SKUCodec:
+    def __init__(
+            self,
+            fields: Optional[Dict[str, int]] = None,
+            vocabularies: Optional[Dict[str, List[str]]] = None,
+            file_store: Optional[str] = None
+    ):
+        """
+        :param fields: 字段名 -> 位宽，默认 SKU_FIELDS
+        :param vocabularies: 字段允许的取值 (可选)，如 {'colour': ['BLK', 'WHT']}，用于校验
+        :param file_store: 字典 JSON 路径 (可选)，存在时加载，save() 写回
+        """
+        self.fields = dict(fields or SKU_FIELDS)
+        if sum(self.fields.values()) > 63:
+            raise ValueError('字段位宽合计不能超过 63 位')
+        self.vocabularies = {f: set(v) for f, v in (vocabularies or {}).items()}
+        self.file_store = file_store
+        # 每个字段的位移 (第一个字段在最高位)
+        self._shifts = {}
+        shift = sum(self.fields.values())
+        for field, bits in self.fields.items():
+            shift -= bits
+            self._shifts[field] = shift
+        # 字段取值字典，编号 0 为缺省值 ''
+        self._values: Dict[str, List[str]] = {f: [''] for f in self.fields}
+        self._index: Dict[str, pd.Index] = {f: pd.Index(['']) for f in self.fields}
+        if file_store and os.path.exists(file_store):
+            self.load(file_store)
+
+    # -----------------------------
+    # 字典持久化
+    # -----------------------------
+    def save(self, file_store: Optional[str] = None):
+        """保存字段字典 (先写临时文件再原子替换)"""
+        file_store = file_store or self.file_store
+        if not file_store:
+            raise ValueError('未指定 file_store')
+        os.makedirs(os.path.dirname(os.path.abspath(file_store)), exist_ok=True)
+        file_tmp = f'{file_store}.{os.getpid()}.tmp'
+        with open(file_tmp, 'w', encoding='utf-8') as f:
+            json.dump({'fields': self.fields, 'values': self._values}, f, ensure_ascii=False)
+        os.replace(file_tmp, file_store)
+        print(f'[INFO] SKU 编码字典已保存至：{file_store}')
+
+    def load(self, file_store: str):
+        """加载字段字典，字段定义须与当前一致"""
+        with open(file_store, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data['fields'] != self.fields:
+            raise ValueError(f'SKU 编码字典的字段定义不一致: {data["fields"]}')
+        self._values = {f: list(v) for f, v in data['values'].items()}
+        self._index = {f: pd.Index(v) for f, v in self._values.items()}
+
+    # -----------------------------
+    # 解析与校验
+    # -----------------------------
+    @staticmethod
+    def normalize(skus) -> pd.Series:
+        """去掉首尾空白并转为大写"""
+        return pd.Series(np.asarray(skus, dtype=object)).fillna('').astype(str).str.strip().str.upper()
+
+    def _parse_unique(self, uniques: pd.Series) -> pd.DataFrame:
+        """拆分唯一 SKU 并校验，返回 [字段..., valid]"""
+        n_fields = len(self.fields)
+        parts = uniques.str.split(SEPARATOR, n=n_fields, expand=True)
+        parts = parts.reindex(columns=range(n_fields + 1)).fillna('')
+        valid = (parts[n_fields] == '').to_numpy() & (uniques != '').to_numpy()
+        result = pd.DataFrame(index=uniques.index)
+        for i, field in enumerate(self.fields):
+            values = parts[i].astype(str)
+            # 段数不足的部分为缺省，出现的段必须非空且字符合法
+            has_segment = (uniques.str.count(SEPARATOR) >= i).to_numpy()
+            ok = values.str.fullmatch(SEGMENT_PATTERN).to_numpy()
+            valid &= ~has_segment | ok
+            if field in self.vocabularies:
+                valid &= ~has_segment | values.isin(self.vocabularies[field]).to_numpy()
+            result[field] = values.to_numpy()
+        result['valid'] = valid
+        return result
+
+    def parse(self, skus) -> pd.DataFrame:
+        """
+        解析 SKU
+        :param skus: SKU 数组
+        :return: DataFrame[SKU, 各字段..., valid]，与输入等长
+        """
+        normalized = self.normalize(skus)
+        codes, uniques = pd.factorize(normalized)
+        parsed = self._parse_unique(pd.Series(uniques, dtype=object))
+        result = parsed.iloc[codes].reset_index(drop=True)
+        result.insert(0, 'SKU', normalized.to_numpy())
+        return result
+
+    def validate(self, skus) -> np.ndarray:
+        """返回每个 SKU 是否合法的布尔数组"""
+        return self.parse(skus)['valid'].to_numpy()
+
+    # -----------------------------
+    # 编码与解码
+    # -----------------------------
+    def _grow(self, parsed: pd.DataFrame, valid: np.ndarray):
+        """
+        把新出现的字段取值追加到字典：先检查全部字段的容量再一起追加，超出容量时字典保持不变
+        :param parsed: _parse_unique 的结果
+        :param valid: 参与编码的行
+        """
+        added = {}
+        for field, bits in self.fields.items():
+            values = parsed[field].to_numpy(dtype=object)[valid]
+            new = pd.unique(values[self._index[field].get_indexer(values) < 0])
+            limit = (1 << bits) - 1
+            if len(self._values[field]) + len(new) - 1 > limit:
+                raise ValueError(f'字段 {field} 的取值超过 {limit} 个，请增大位宽')
+            added[field] = new
+        for field, new in added.items():
+            if len(new):
+                self._values[field].extend(new.tolist())
+                self._index[field] = pd.Index(self._values[field])
+
+    def encode(self, skus, grow: bool = True, errors: str = 'raise') -> np.ndarray:
+        """
+        SKU -> SKU_ID
+        :param skus: SKU 数组
+        :param grow: 是否把新出现的字段取值加入字典 (False 时未知取值视为无效)
+        :param errors: 'raise' 遇到无效 SKU 抛出 ValueError；'coerce' 无效 SKU 编码为 -1
+        :return: int64 数组
+        """
+        normalized = self.normalize(skus)
+        codes, uniques = pd.factorize(normalized)
+        parsed = self._parse_unique(pd.Series(uniques, dtype=object))
+        valid = parsed['valid'].to_numpy().copy()
+        # 先校验再扩充字典，抛出异常时字典不被修改
+        if errors == 'raise' and not valid.all():
+            raise ValueError(f'无效的 SKU: {list(uniques[~valid][:10])}')
+        if grow:
+            self._grow(parsed, valid)
+        ids = np.zeros(len(uniques), dtype=np.int64)
+        for field in self.fields:
+            values = parsed[field].to_numpy(dtype=object)
+            field_codes = np.zeros(len(values), dtype=np.int64)
+            # grow=False 时字典外的取值为 -1，视为无效
+            field_codes[valid] = self._index[field].get_indexer(values[valid])
+            valid &= field_codes >= 0
+            ids |= np.maximum(field_codes, 0) << self._shifts[field]
+        ids[~valid] = -1
+        if errors == 'raise' and not valid.all():
+            raise ValueError(f'无效的 SKU: {list(uniques[~valid][:10])}')
+        return ids[codes]
+
+    def decode(self, ids) -> np.ndarray:
+        """SKU_ID -> SKU 字符串 (无效编号、字段编号不在字典中的编号返回 None)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        codes, uniques = pd.factorize(ids)
+        attributes = self.attributes(uniques)
+        columns = [attributes[f].fillna('') for f in self.fields]
+        skus = columns[0].str.cat(columns[1:], sep=SEPARATOR).str.rstrip(SEPARATOR).to_numpy(dtype=object, copy=True)
+        skus[attributes[list(self.fields)].isna().any(axis=1).to_numpy()] = None
+        return skus[codes]
+
+    def field_codes(self, ids, field: str) -> np.ndarray:
+        """从 SKU_ID 中取出某字段的编号 (无效编号、超出位宽或不在字典中的编号返回 -1)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        codes = (ids >> self._shifts[field]) & ((1 << self.fields[field]) - 1)
+        invalid = (ids < 0) | (ids >> sum(self.fields.values()) != 0) | (codes >= len(self._values[field]))
+        return np.where(invalid, -1, codes)
+
+    def attributes(self, ids) -> pd.DataFrame:
+        """SKU_ID -> 各字段取值 (缺省为 '')"""
+        result = pd.DataFrame({'SKU_ID': np.asarray(ids, dtype=np.int64)})
+        for field in self.fields:
+            labels = np.asarray(self._values[field] + [None], dtype=object)
+            # -1 取到末尾的 None
+            result[field] = labels[self.field_codes(result['SKU_ID'], field)]
+        return result
+
+    def lookup_table(self, skus) -> pd.DataFrame:
+        """SKU 与 SKU_ID 的对照表 (每个唯一 SKU 一行)，用于与其它表在整数键上连接"""
+        uniques = pd.unique(self.normalize(skus))
+        table = self.attributes(self.encode(uniques))
+        table.insert(1, 'SKU', uniques)
+        return table
+
+    def encode_frame(self, df: pd.DataFrame, col: str = 'SKU', out_col: str = 'SKU_ID', **kwargs) -> pd.DataFrame:
+        """在表中附加 SKU_ID 列 (kwargs 传给 encode)"""
+        df = df.copy()
+        df[out_col] = self.encode(df[col].to_numpy(), **kwargs)
+        return df
+
+    # -----------------------------
+    # 属性汇总
+    # -----------------------------
+    def rollup(self, ids, values, field: str) -> pd.DataFrame:
+        """
+        按字段取值汇总 (如按颜色汇总成本)，对字段编号做 bincount，不需要 groupby 字符串
+        :param ids: SKU_ID 数组 (无效编号 -1 忽略)
+        :param values: 与 ids 等长的数值数组
+        :param field: 字段名
+        :return: DataFrame[field, 行数, 合计, 均值]，按字段字典顺序，只保留出现过的取值
+        """
+        codes = self.field_codes(ids, field)
+        values = np.asarray(values, dtype=float)
+        ok = (codes >= 0) & ~np.isnan(values)
+        size = len(self._values[field])
+        count = np.bincount(codes[ok], minlength=size)
+        total = np.bincount(codes[ok], weights=values[ok], minlength=size)
+        present = count > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / count
+        return pd.DataFrame({
+            field: np.asarray(self._values[field], dtype=object)[present],
+            '行数': count[present],
+            '合计': total[present],
+            '均值': mean[present],
+        })
+
+
+# ========== 使用示例 ==========
+if __name__ == '__main__':
+    codec = SKUCodec(vocabularies={'colour': ['BLK', 'WHT', 'RED']})
+    print(codec.parse(['VC-S-BLK', 'vcl-std', 'VC-S-BLK-X', 'VC--BLK', 'VC-M-PNK']))
+
+    products = pd.DataFrame({
+        'SKU': ['VC-S-BLK', 'VC-S-WHT', 'VC-M-BLK', 'VCL-STD'],
+        '单价(CNY)': [35.0, 36.0, 42.0, 120.0],
+    })
+    orders = pd.DataFrame({'SKU': ['VC-S-BLK', 'VCL-STD', 'VC-M-BLK', 'VC-S-BLK'], '数量': [100, 20, 50, 30]})
+    table = codec.lookup_table(products['SKU'])
+    print(table)
+
+    # 目录与订单在整数键上连接
+    df = codec.encode_frame(orders).merge(
+        codec.encode_frame(products).drop(columns=['SKU']), on='SKU_ID', how='left'
+    )
+    df['成本(CNY)'] = df['单价(CNY)'] * df['数量']
+    print(codec.rollup(df['SKU_ID'], df['成本(CNY)'], 'colour'))
+    print(codec.decode(df['SKU_ID']))